@@ -1,10 +1,13 @@
 import time
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
 
+import numpy as np
 from dotenv import load_dotenv
 
 from client import Client
 from config import Settings
+from llm_agent.llm_router import IVFRouteMatcher, RouteMatcher
 from text_processing import TextProcessing as tp
 
 # Loads environment variables
@@ -48,6 +51,110 @@ def benchmark_prompts(prompts: List[str]) -> Dict[str, float]:
     return stats
 
 
+def benchmark_batch(prompts: List[str]) -> Dict[str, float]:
+    """Sends all prompts in one batch request and benchmarks total throughput."""
+    total_tokens = 0
+    successful_requests = 0
+
+    t_0 = time.perf_counter()
+    for result in Client.generate_batch(prompts):
+        if "text" in result:
+            total_tokens += tp.num_tokens(result["text"])
+            successful_requests += 1
+        else:
+            print(f"Failed to get response: {result.get('detail')}")
+    t_1 = time.perf_counter()
+
+    stats = {}
+    if successful_requests > 0:
+        stats = {
+            "total_tps": total_tokens / (t_1 - t_0),
+            "total_time": t_1 - t_0,
+        }
+
+    return stats
+
+
+def benchmark_mixed(
+    short_prompts: List[str], long_prompts: List[str], long_tokens: int = 512
+) -> Dict[str, float]:
+    """Sends short and long requests at once and reports latency per kind.
+
+    Short requests ask for a few tokens at interactive priority, long ones for
+    `long_tokens` at batch priority. Compare runs across SCHEDULING_POLICY
+    settings, e.g. against BACKEND=simulated.
+    """
+
+    def timed_request(prompt: str, max_tokens: int, priority: str) -> float:
+        t_0 = time.perf_counter()
+        Client.generate_text(prompt, max_tokens=max_tokens, priority=priority)
+        return time.perf_counter() - t_0
+
+    requests = [(p, long_tokens, "batch") for p in long_prompts]
+    requests += [(p, 16, "interactive") for p in short_prompts]
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        latencies = list(pool.map(lambda r: timed_request(*r), requests))
+
+    stats = {}
+    for kind, times in [
+        ("long", latencies[: len(long_prompts)]),
+        ("short", latencies[len(long_prompts) :]),
+    ]:
+        times = sorted(times)
+        if times:
+            stats[f"{kind}_p50"] = times[len(times) // 2]
+            stats[f"{kind}_p95"] = times[min(len(times) - 1, int(len(times) * 0.95))]
+    return stats
+
+
+def synthetic_catalog(
+    num_routes: int, utterances: int = 20, dim: int = 384, spread: float = 0.8
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns utterance embeddings and route names for a made-up tool catalog.
+
+    Each route's utterances scatter around a random direction, like paraphrases.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(num_routes, 1, dim))
+    embeddings = centers + spread * rng.normal(size=(num_routes, utterances, dim))
+    categories = np.repeat([f"route_{i}" for i in range(num_routes)], utterances)
+    return embeddings.reshape(-1, dim).astype(np.float32), categories
+
+
+def benchmark_route_recall(
+    embeddings: np.ndarray,
+    categories: np.ndarray,
+    probes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    num_queries: int = 500,
+    spread: float = 0.8,
+) -> Dict[str, Dict[str, float]]:
+    """Compares IVF route matching against exact search, offline.
+
+    Queries are perturbed utterances. For each `num_probes` setting it reports
+    recall (how often the top route matches exact search's) and the mean
+    lookup time in milliseconds.
+    """
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(embeddings), num_queries)
+    noise = spread * rng.normal(size=(num_queries, embeddings.shape[1]))
+    queries = embeddings[picks] + noise.astype(np.float32)
+
+    def timed_top_routes(matcher: RouteMatcher) -> Tuple[List[str], float]:
+        t_0 = time.perf_counter()
+        names = [matcher.top_routes(query)[0].name for query in queries]
+        return names, (time.perf_counter() - t_0) * 1000 / num_queries
+
+    exact, exact_ms = timed_top_routes(RouteMatcher(embeddings, categories))
+    stats = {"exact": {"recall": 1.0, "ms": exact_ms}}
+    ivf = IVFRouteMatcher(embeddings, categories)
+    for num_probes in probes:
+        ivf.num_probes = num_probes
+        names, ms = timed_top_routes(ivf)
+        recall = float(np.mean([a == b for a, b in zip(names, exact)]))
+        stats[f"ivf_{num_probes}"] = {"recall": recall, "ms": ms}
+    return stats
+
+
 if __name__ == "__main__":
     prompts = [
         "What is the square root of 1024?",
@@ -72,3 +179,14 @@ if __name__ == "__main__":
     stats = benchmark_prompts(prompts)
     print(f"Average Tokens per Second (TPS): {stats['avg_tps']:.2f}")
     print(f"Average Total Time Elapsed Per Response: {stats['avg_time']:.2f}")
+
+    batch_stats = benchmark_batch(prompts)
+    print(f"Batched Tokens per Second (TPS): {batch_stats['total_tps']:.2f}")
+    print(f"Batched Total Time Elapsed: {batch_stats['total_time']:.2f}")
+
+    mixed_stats = benchmark_mixed(prompts[:6], prompts[6:] * 4)
+    print(f"Short Requests p95 Under Mixed Load: {mixed_stats['short_p95']:.2f}")
+    print(f"Long Requests p95 Under Mixed Load: {mixed_stats['long_p95']:.2f}")
+
+    for name, r in benchmark_route_recall(*synthetic_catalog(2000)).items():
+        print(f"Route Matching {name}: {r['ms']:.3f} ms, recall {r['recall']:.3f}")
@@ -1,5 +1,7 @@
+import json
 import logging
 import time
+from typing import Dict, Iterator, List, Optional
 
 import requests
 from dotenv import load_dotenv
@@ -15,17 +17,60 @@ class Client:
     """Client for interacting with LLM server."""
 
     @staticmethod
-    def generate_text(prompt: str):
-        """Sends text generation request to LLM server."""
+    def generate_text(prompt: str, timeout: Optional[float] = None, **params):
+        """Sends text generation request to LLM server.
+
+        With a `timeout`, the server also stops generating once it expires.
+        Sampling `params` (max_tokens, temperature, top_p, stop, n) apply to this
+        request only.
+        """
         prompt = tp.preprocess_prompt(prompt)
-        payload = {"text": prompt}
+        payload = {"text": prompt, **params}
+        if timeout is not None:
+            payload["timeout"] = timeout
         try:
-            response = requests.post(f"{settings.API_URL}/generate", json=payload)
+            response = requests.post(
+                f"{settings.API_URL}/generate", json=payload, timeout=timeout
+            )
             return response.json()
         except requests.exceptions.RequestException as e:
             logging.error(f"API request failed: {e}")
             raise
 
+    @staticmethod
+    def generate_batch(
+        prompts: List[str], timeout: Optional[float] = None, **params
+    ) -> Iterator[Dict]:
+        """Sends many prompts in one request, yielding results as they finish.
+
+        Each result carries the `index` of its prompt within `prompts`. With a
+        `timeout`, the server gives up on each prompt once it expires. Sampling
+        `params` (max_tokens, temperature, top_p, stop) apply to every prompt.
+
+        Raises:
+            requests.HTTPError: If the server rejects the batch (e.g. 400, 429).
+        """
+        payload = {
+            "texts": [tp.preprocess_prompt(prompt) for prompt in prompts],
+            **params,
+        }
+        if timeout is not None:
+            payload["timeout"] = timeout
+        try:
+            response = requests.post(
+                f"{settings.API_URL}/generate/batch",
+                json=payload,
+                stream=True,
+                timeout=timeout,
+            )
+            response.raise_for_status()  # Rejected before streaming
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"API request failed: {e}")
+            raise
+
 
 def main():
     """Conversation loop with LLM server."""
@@ -1,5 +1,7 @@
 """Config settings for LLMs and server parameters."""
 
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +9,7 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # ----- LLM -----
     DEFAULT_MODEL: str = "TheBloke/OpenHermes-2.5-Mistral-7B-GPTQ"
+    QUANTIZATION: Optional[str] = "gptq"
 
     # ----- Constants -----
     NUM_GPUS: int = 1
@@ -23,6 +26,83 @@ class Settings(BaseSettings):
     GPTQ_GPU_UTIL: float = 0.25
     USE_AGENT: bool = True
 
+    # ----- Model Registry Settings -----
+    MODEL_GPU_BUDGET: float = 0.9  # GPU memory fraction for all loaded models
+
+    # ----- Serving Settings -----
+    BACKEND: str = "langchain"  # langchain, async_engine, simulated or fake
+    NUM_WORKERS: int = 8  # Threads running blocking LLM/router calls
+    MAX_IN_FLIGHT: int = 16  # Requests allowed on the worker pool at once
+    REQUEST_TIMEOUT: Optional[float] = None  # Default /generate timeout in seconds
+
+    # ----- Scheduling Settings -----
+    SCHEDULING_POLICY: str = "fifo"  # fifo, sjf, edf or priority; order of slots
+    PRIORITY_CLASSES: List[str] = ["interactive", "batch"]  # Highest first
+    DEFAULT_PRIORITY: str = "interactive"
+
+    # ----- Simulated Backend Settings -----
+    SIM_PREFILL_MS_PER_TOKEN: float = 0.2  # Per prompt token
+    SIM_DECODE_MS_PER_TOKEN: float = 12.0  # Per output token at batch size 1
+    SIM_BATCH_EXPONENT: float = 0.1  # Decode step time grows as batch_size**exp
+    SIM_JITTER: float = 0.05  # Random +/- fraction applied to each step
+    SIM_SEED: int = 0  # Seeds the jitter so runs are reproducible
+
+    # ----- Admission Control Settings -----
+    MAX_QUEUE_DEPTH: int = 128  # Requests admitted but unfinished; beyond -> 429
+    MAX_QUEUED_TOKENS: int = 131072  # Prompt + max new tokens across those requests
+
+    # ----- Startup Settings -----
+    WARMUP_ON_STARTUP: bool = True  # Run WARMUP_PROMPTS before reporting ready
+    WARMUP_PROMPTS: List[str] = ["Hello!", "what is the time in london?"]
+    WARMUP_MAX_TOKENS: int = 16  # Per warm-up generation
+
+    # ----- Shutdown Settings -----
+    DRAIN_GRACE_SECONDS: float = 30.0  # Max wait for in-flight work when draining
+    ADMIN_TOKEN: Optional[str] = None  # If set, required by /admin endpoints
+
+    # ----- Sampling Settings -----
+    MAX_TOKENS_LIMIT: int = 2048  # Cap on per-request max_tokens
+    MAX_N: int = 4  # Cap on completions per /generate request
+    MAX_STOP_SEQUENCES: int = 4
+
+    # ----- Batching Settings -----
+    MAX_BATCH_SIZE: int = 8  # Prompts per VLLM call
+    BATCH_WAIT_MS: float = 10.0  # Max wait for a batch to fill after 1st prompt
+    ENCODER_BATCH_SIZE: int = 32  # Routing prompts per encoder call; 1 disables
+    ENCODER_BATCH_WAIT_MS: float = 2.0  # Max wait for an encoder batch to fill
+    # Prompts accepted per /generate/batch request; at most MAX_QUEUE_DEPTH
+    MAX_BATCH_PROMPTS: int = 128
+
+    # ----- Response Cache Settings -----
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTL_SECONDS: float = 600.0
+    CACHE_NONDETERMINISTIC: bool = False  # Also cache when TEMPERATURE > 0
+
+    # ----- Coalescing Settings -----
+    COALESCE_ENABLED: bool = True  # Identical in-flight requests share a generation
+    COALESCE_NONDETERMINISTIC: bool = False  # Also when TEMPERATURE > 0 (opt-in)
+
+    # ----- Router Settings -----
+    # Route embeddings file, memory-mapped; rebuilt when routes or encoder change
+    ROUTE_INDEX_PATH: Optional[str] = "route_index.bin"
+    ROUTE_MATCHER: str = "exact"  # exact or ivf (approximate, for large catalogs)
+    ROUTE_IVF_LISTS: Optional[int] = None  # Partitions; sqrt(utterances) if None
+    ROUTE_IVF_PROBES: int = 8  # Partitions searched per query; more = better recall
+
+    # ----- Embedding Cache Settings -----
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 4096  # Prompt embeddings kept; 0 disables
+
+    # ----- Semantic Cache Settings -----
+    SEMANTIC_CACHE_ENABLED: bool = False  # Reuse answers for paraphrased prompts
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 512
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity for a hit
+
+    # ----- Session Memory Settings -----
+    MAX_SESSIONS: int = 1024  # Conversations held in memory, least recent evicted
+    SESSION_MAX_TOKENS: int = 2048  # History per session; oldest turns dropped
+    SESSION_SPILL_PATH: Optional[str] = None  # SQLite file keeping evicted sessions
+
     # ----- Hugging Face Hub Settings -----
     HF_HUB_OFFLINE: bool = False
 
@@ -58,6 +138,6 @@ class LLM:
     YARN_128K = "NousResearch/Yarn-Mistral-7b-128k"
     PHI_2 = "microsoft/phi-2"
     PHI_2_GPTQ = "TheBloke/phi-2-GPTQ"
-    DOLPHIN_26_PHI = "cognitivecomputations/dolphin-2_6-phi-2" # doesn't work with vLLM
+    DOLPHIN_26_PHI = "cognitivecomputations/dolphin-2_6-phi-2"  # doesn't work with vLLM
     DOLPHIN_26_PHI_GPTQ = "TheBloke/dolphin-2_6-phi-2-GPTQ"  # doesn't work with vLLM
-    PHI_2_ORANGE = "rhysjones/phi-2-orange" # doesn't work with vLLM
+    PHI_2_ORANGE = "rhysjones/phi-2-orange"  # doesn't work with vLLM
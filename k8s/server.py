@@ -22,3 +22,15 @@ async def generate(generate: GenerateRequest) -> GenerateResponse:
     """Endpoint to generate text using LLM."""
     print(os.listdir(os.path.expanduser("~/.cache/huggingface")))
     return GenerateResponse(text=generate.text)
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe."""
+    return {"status": "ready"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe."""
+    return {"status": "ready"}
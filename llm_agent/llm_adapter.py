@@ -1,20 +1,25 @@
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from langchain.llms import VLLM
 from semantic_router.llms import BaseLLM
 from semantic_router.schema import Message
 from semantic_router.utils.logger import logger
 
+from serving.metrics import time_stage
+
 
 class VLLMAdapter(BaseLLM):
     """Adapter class that integrates VLLM instance with semantic router's BaseLLM.
 
-    Allows VLLM instances to be used wherever a BaseLLM is expected.
+    Allows VLLM instances to be used wherever a BaseLLM is expected. The vLLM
+    engine is not thread-safe, so a `generate_fn` (e.g. the micro-batcher that
+    owns the engine) can take over generation from the wrapped VLLM.
     """
 
     name: str
     vllm: VLLM = None
+    generate_fn: Optional[Callable[[str], str]] = None
 
     class Config:
         """Defines config settings for VLLMAdapter Pydantic model.
@@ -25,9 +30,16 @@ class VLLMAdapter(BaseLLM):
 
         arbitrary_types_allowed = True
 
-    def __init__(self, vllm_instance: VLLM, name: str, **kwargs):
+    def __init__(
+        self,
+        vllm_instance: VLLM,
+        name: str,
+        generate_fn: Optional[Callable[[str], str]] = None,
+        **kwargs,
+    ):
         """Initializes VLLMAdapter."""
         kwargs["vllm"] = vllm_instance
+        kwargs["generate_fn"] = generate_fn
         super().__init__(name=name, **kwargs)
 
     def __call__(self, messages: List[Message]) -> Optional[str]:
@@ -37,6 +49,8 @@ class VLLMAdapter(BaseLLM):
             return None
 
         prompts = [message.content for message in messages]
+        if self.generate_fn is not None:  # Only the first prompt's text is used
+            return self.generate_fn(prompts[0])
         result = self.vllm._generate(prompts=prompts)
         if result.generations:
             return result.generations[0][0].text
@@ -67,6 +81,13 @@ class VLLMAdapter(BaseLLM):
         self, query: str, function_schema: dict[str, Any]
     ) -> dict:
         """Adapted from semantic router BaseLLM."""
+        with time_stage("argument_extraction"):
+            return self._extract_function_inputs(query, function_schema)
+
+    def _extract_function_inputs(
+        self, query: str, function_schema: dict[str, Any]
+    ) -> dict:
+        """Prompts VLLM for the function's arguments and validates them."""
         logger.info("Extracting function input using VLLM...")
 
         prompt = f"""
@@ -1,39 +1,74 @@
+from typing import Any, List
+
 from langchain.agents import AgentExecutor, LLMSingleActionAgent
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferWindowMemory
-
-from tools.custom_tools import (get_planet_distance_tool,
-                                get_skyfield_planets_tool,
-                                get_latitude_longitude_tool,
-                                get_skyfield_satellites_tool,
-                                get_next_visible_time_for_satellite_tool)
-from tools.prompts import (CustomOutputParser, CustomPromptTemplate,
-                           mistral_template_1, mistral_template_2,
-                           mistral_template_3, mistral_template_4,
-                           mistral_template_5, mistral_template_6,
-                           mistral_template_7, mistral_template_8,
-                           mistral_1, mistral_2, mistral_3,
-                           mistral_4, mistral_5, open_hermes_mistral_1,
-                           open_hermes_mistral_2, open_hermes_mistral_3)
+
+from tools.custom_tools import (
+    get_planet_distance_tool,
+    get_skyfield_planets_tool,
+    get_latitude_longitude_tool,
+    get_skyfield_satellites_tool,
+    get_next_visible_time_for_satellite_tool,
+)
+from tools.prompts import (
+    CustomOutputParser,
+    CustomPromptTemplate,
+    mistral_template_1,
+    mistral_template_2,
+    mistral_template_3,
+    mistral_template_4,
+    mistral_template_5,
+    mistral_template_6,
+    mistral_template_7,
+    mistral_template_8,
+    mistral_1,
+    mistral_2,
+    mistral_3,
+    mistral_4,
+    mistral_5,
+    open_hermes_mistral_1,
+    open_hermes_mistral_2,
+    open_hermes_mistral_3,
+)
+
+
+class ThoughtRecorder(BaseCallbackHandler):
+    """Collects the thoughts and observations of a single agent run."""
+
+    def __init__(self):
+        """Initializes an empty thought buffer."""
+        self.thoughts: List[str] = []
+
+    def on_agent_action(self, action, **kwargs: Any):
+        """Records the LLM's reasoning for the action it chose."""
+        self.thoughts.append(str(action.log))
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        """Attaches the tool's output to the latest thought."""
+        if self.thoughts:
+            self.thoughts[-1] += "\nObservation: " + str(output)
 
 
 class LLMAgent:
-    """LLM Agent server that performs user tasks."""
+    """LLM Agent server that performs user tasks.
+
+    The prompt template, chain and executor are built once, in the constructor.
+    Each run keeps its scratchpad and thoughts to itself, so one agent can serve
+    concurrent runs, e.g. from a worker pool.
+    """
+
     def __init__(self, llm):
         self.llm = llm
         self.output_parser = CustomOutputParser()
 
         self.custom_template = None
         self.agent = None
-        self.memory = None
         self.tools = None
         self.agent_executor = None
 
-        self.queries = []
-        self.agent_thoughts = []
-
-    def add_query(self, query):
-        self.queries.append(query)
+        self.init_agent()
+        self.validate_agent()
 
     def init_agent(self):
         custom_tools = []
@@ -58,13 +93,12 @@ class LLMAgent:
         # TODO: Open-hermes 2.5 function calling testing
         """open_hermes_mistral_1 - 3 ... testing here"""
         # api_template = open_hermes_mistral_1
-        api_template = mistral_2 # 2 seems most stable
-        
+        api_template = mistral_2  # 2 seems most stable
+
         self.custom_template = CustomPromptTemplate(
             template=api_template,
             tools=custom_tools,
-            agent_thoughts=self.agent_thoughts,
-            input_variables=["input", "intermediate_steps", "history"]
+            input_variables=["input", "intermediate_steps", "history"],
         )
 
         llm_chain = LLMChain(llm=self.llm, prompt=self.custom_template)
@@ -74,26 +108,23 @@ class LLMAgent:
             llm_chain=llm_chain,
             output_parser=self.output_parser,
             stop=["\nObservation:"],
-            allowed_tools=tool_names
+            allowed_tools=tool_names,
         )
-
-        num_memories = 3 # keep small, at most <=10
-        self.memory = ConversationBufferWindowMemory(k=num_memories)
         self.tools = custom_tools
 
-        max_iterations = 5 # changed from 8 -> 5
+        # No executor memory: it would be shared by every run. Callers pass a
+        # run's conversation history instead.
+        max_iterations = 5  # changed from 8 -> 5
         self.agent_executor = AgentExecutor.from_agent_and_tools(
             agent=self.agent,
             tools=self.tools,
             verbose=True,
-            memory=self.memory,
-            max_iterations=max_iterations
+            max_iterations=max_iterations,
         )
 
     def validate_agent(self):
         assert self.custom_template is not None
         assert self.agent is not None
-        assert self.memory is not None
         assert self.tools is not None
         assert self.agent_executor is not None
 
@@ -102,44 +133,32 @@ class LLMAgent:
         prefix = "[INST] "
         suffix = " [/INST]"
         # template = f'''Given the following user task: `{prompt}`, Use your Skyfield tools for planets to answer the user question'''
-        template_agostic = f'''Given the following user task: `{prompt}`, Use your tools to answer the user question'''
+        template_agostic = f"""Given the following user task: `{prompt}`, Use your tools to answer the user question"""
         new_prompt = prefix + template_agostic + suffix
         return new_prompt
 
-    def reset_thoughts(self):
-        self.agent_thoughts = []
-
-    def get_responses(self, prompt, responses):
+    def get_responses(self, prompt: str, history: str = "") -> List[str]:
+        """Runs the agent on a prompt, falling back to its thoughts on failure."""
         task = self.get_task(prompt)
+        recorder = ThoughtRecorder()
 
         response = ""
         try:
-            response = self.agent_executor.run(task)
+            result = self.agent_executor.invoke(
+                {"input": task, "history": history},
+                config={"callbacks": [recorder]},
+            )
+            response = result["output"]
         except ValueError as e:
             print(f"agent_executor error: {e}")
 
-        agent_thoughts = self.custom_template.agent_thoughts
-
         if response == "":
-            responses += agent_thoughts
-            responses += ["I don't know."]
-            self.reset_thoughts()
-            return responses
-        
-        responses += [response]
-        
-        return responses
-    
-    def run(self, prompt: str):
-        responses = []
-
-        self.init_agent()
-        self.validate_agent()
+            return recorder.thoughts + ["I don't know."]
+        return [response]
 
-        responses = self.get_responses(prompt, responses)
+    def run(self, prompt: str, history: str = "") -> List[str]:
+        """Answers a prompt, given the conversation so far as `history`."""
+        return self.get_responses(prompt, history)
 
-        self.reset_thoughts()
-        return responses
-    
-    def __call__(self, prompt):
-        return self.run(prompt)
+    def __call__(self, prompt, **kwargs):
+        return self.run(prompt, **kwargs)
@@ -1,7 +1,9 @@
-from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferMemory
+from typing import List, Optional
+
 from langchain.prompts import PromptTemplate
 
+from serving.session_store import SessionStore, Turn
+
 
 template_1 = """<s>[INST] You are a helpful assistant.[/INST]</s> 
 {chat_history}
@@ -44,34 +46,50 @@ Assistant:"""
 
 
 class MemoryLLM:
-    """LLM with memory that responds to user prompts."""
+    """LLM with per-session memory that responds to user prompts."""
 
-    def __init__(self, llm):
-        """Initializes MemoryLLM with a specified LLM."""
-        self.llm = llm
-        self.llm_chain = None
+    def __init__(self, llm, store: Optional[SessionStore] = None, generate_fn=None):
+        """Initializes MemoryLLM with a specified LLM.
 
-    def setup_memory(self):
-        """Sets up the conversational memory for the LLM."""
-        prompt = PromptTemplate(
+        The prompt template is built once and reused for every turn; histories
+        live in `store`, keyed by session id. `generate_fn` defaults to calling
+        the LLM directly but can be e.g. a batcher in front of it.
+        """
+        self.llm = llm
+        self.generate_fn = generate_fn or llm
+        self.store = store if store is not None else SessionStore()
+        self.prompt = PromptTemplate(
             input_variables=["chat_history", "prompt"], template=template_1
         )
 
-        memory = ConversationBufferMemory(k=7, memory_key="chat_history")
-
-        self.llm_chain = LLMChain(
-            llm=self.llm,
-            prompt=prompt,
-            verbose=True,
-            memory=memory,
+    @staticmethod
+    def format_history(turns: List[Turn]) -> str:
+        """Renders turns the way ConversationBufferMemory does."""
+        return "\n".join(f"Human: {turn.human}\nAI: {turn.ai}" for turn in turns)
+
+    def build_prompt(self, prompt: str, session_id: str) -> str:
+        """Returns the full LLM prompt for a session's next turn."""
+        chat_history = self.format_history(self.store.history(session_id))
+        return self.prompt.format(chat_history=chat_history, prompt=prompt)
+
+    def remember(self, session_id: str, prompt: str, response: str):
+        """Records a finished turn in the session's history."""
+        self.store.append(session_id, prompt, response)
+
+    def run(self, prompt: str, session_id: str = "default", **generate_kwargs):
+        """Processes prompt using memory-augmented LLM and returns response.
+
+        Raises:
+            RuntimeError: If MemoryLLM was given no LLM and only builds prompts.
+        """
+        if self.generate_fn is None:
+            raise RuntimeError("MemoryLLM has no LLM to generate with")
+        response = self.generate_fn(
+            self.build_prompt(prompt, session_id), **generate_kwargs
         )
-
-    def run(self, prompt: str):
-        """Processes prompt using memory-augmented LLM and returns response."""
-        self.setup_memory() # TODO: Logic to avoid overwriting memory
-        response = self.llm_chain.predict(prompt=prompt)
+        self.remember(session_id, prompt, response)
         return response
 
-    def __call__(self, prompt):
+    def __call__(self, prompt, **kwargs):
         """Allows MemoryLLM to be called directly with a prompt."""
-        return self.run(prompt)
+        return self.run(prompt, **kwargs)
@@ -1,10 +1,16 @@
+import copy
 import json
 import random
+import threading
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
 
-from semantic_router import RouteLayer
+import numpy as np
+from semantic_router import Route, RouteLayer
 from semantic_router.encoders import HuggingFaceEncoder
 
 from llm_agent.llm_adapter import VLLMAdapter
+from llm_agent.route_index import load_or_build
+from serving.metrics import time_stage
 from tools.routes import routes
 
 
@@ -19,40 +25,460 @@ def load_used_tools_from_file():
         return list(routes.values())
 
 
+def build_route_layer(
+    tools=None, index_path: Optional[str] = None, matcher=None
+) -> RouteLayer:
+    """Loads the encoder and embeds every route utterance into a RouteLayer.
+
+    This is the slow part of router setup and does not need the LLM, so it can
+    run while the model loads; LLMRouter attaches its LLM afterwards. With an
+    `index_path`, the utterance embeddings of every registered route are read
+    from that file (see route_index) and only re-encoded when they change.
+    `matcher` overrides how queries are matched (see MatrixRouteLayer).
+    """
+    matcher = matcher or RouteMatcher
+    if tools is None:
+        tools = load_used_tools_from_file()
+    used_routes = [tool.route for tool in tools]
+    # used_routes += [general_route]
+    encoder = HuggingFaceEncoder()
+    if not index_path:
+        route_layer = MatrixRouteLayer(
+            encoder=encoder, routes=used_routes, matcher=matcher
+        )
+    else:
+        # Indexes the whole registry so any subset of tools reuses the same file
+        all_routes = [tool.route for tool in routes.values()]
+        route_layer = MatrixRouteLayer(encoder=encoder, matcher=matcher)
+        index = load_or_build(index_path, encoder, all_routes)
+        index.attach(route_layer, used_routes)
+    if route_layer.index is not None:
+        route_layer.build_matcher()  # E.g. trains IVF here, not on the 1st query
+    return route_layer
+
+
+class RouteMatch(NamedTuple):
+    """A route's score for a query."""
+
+    name: str
+    score: float  # Summed similarity of its utterances among the nearest
+    similarity: float  # Similarity of its nearest utterance
+
+
+class RouteMatcher:
+    """Scores a query against every route utterance with one matrix product.
+
+    The utterance embeddings are held as one contiguous matrix of unit-length
+    rows, so a query's cosine similarities are a single matrix-vector product.
+    Routes are ranked like semantic_router's RouteLayer does: by the summed
+    similarity of their utterances among the `num_neighbours` nearest.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        categories: np.ndarray,
+        dtype: str = "float32",
+        num_neighbours: int = 5,
+    ):
+        """Initializes the matcher, normalizing rows unless they already are.
+
+        Rows that are already unit-length and of `dtype` (e.g. a memory-mapped
+        route index) are used in place, without a copy. float16 halves the
+        matrix's memory, but NumPy multiplies it several times slower.
+        """
+        self.matrix = self._normalize(embeddings, dtype)
+        self.num_neighbours = num_neighbours
+        self._set_categories(np.asarray(categories))
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray, dtype) -> np.ndarray:
+        """Returns the embeddings as a contiguous matrix of unit-length rows."""
+        matrix = np.atleast_2d(np.asarray(embeddings))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        if not np.allclose(norms, 1.0, atol=1e-3):
+            matrix = matrix / np.maximum(norms, 1e-12)
+        return np.ascontiguousarray(matrix, dtype=dtype)
+
+    def _set_categories(self, categories: np.ndarray):
+        """Sets each row's route name and numbers the routes."""
+        self.categories = categories
+        self.route_names, self.route_ids = np.unique(categories, return_inverse=True)
+
+    def __len__(self) -> int:
+        """Returns the number of utterances."""
+        return len(self.matrix)
+
+    def copy(self) -> "RouteMatcher":
+        """Returns a matcher that can be added to without changing this one.
+
+        `add` replaces the arrays rather than writing into them, so they are
+        shared until then.
+        """
+        return copy.copy(self)
+
+    def add(self, embeddings: np.ndarray, categories: np.ndarray):
+        """Appends utterances to the matcher."""
+        rows = self._normalize(embeddings, self.matrix.dtype)
+        self.matrix = np.concatenate([self.matrix, rows])
+        self._set_categories(np.concatenate([self.categories, categories]))
+
+    def _query(self, vector) -> np.ndarray:
+        """Returns the query as a unit-length vector of the matrix's type."""
+        query = np.asarray(vector, dtype=self.matrix.dtype).ravel()
+        return query / max(float(np.linalg.norm(query)), 1e-12)
+
+    def candidates(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the rows worth scoring for a query and their similarities."""
+        return np.arange(len(self.matrix)), self.matrix @ query
+
+    def nearest(self, vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the indices and similarities of the k nearest utterances."""
+        rows, similarities = self.candidates(self._query(vector))
+        k = min(k, len(similarities))
+        if k == 0:
+            return rows[:0], similarities[:0]
+        idx = np.argpartition(-similarities, k - 1)[:k]
+        idx = idx[np.argsort(-similarities[idx])]
+        return rows[idx], similarities[idx]
+
+    def top_routes(self, vector, k: int = 1) -> List[RouteMatch]:
+        """Returns up to k routes near the query, best first."""
+        if len(self) == 0:
+            return []
+        idx, similarities = self.nearest(vector, self.num_neighbours)
+        ids = self.route_ids[idx]
+        scores = np.bincount(ids, weights=similarities, minlength=len(self.route_names))
+        nearest = np.full(len(self.route_names), -np.inf)
+        np.maximum.at(nearest, ids, similarities)
+
+        candidates = np.unique(ids)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+        return [
+            RouteMatch(str(self.route_names[i]), float(scores[i]), float(nearest[i]))
+            for i in ranked
+        ]
+
+
+class IVFRouteMatcher(RouteMatcher):
+    """RouteMatcher that only scores the partitions nearest to a query.
+
+    Utterances are clustered into `num_lists` partitions (by default the square
+    root of their number) with spherical k-means. A query is scored against the
+    partition centroids, then against the utterances of its `num_probes`
+    nearest partitions only. More probes trade speed for recall; probing every
+    partition is exact search. Added utterances join their nearest partition
+    without retraining.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        categories: np.ndarray,
+        dtype: str = "float32",
+        num_neighbours: int = 5,
+        num_lists: Optional[int] = None,
+        num_probes: int = 8,
+        iterations: int = 10,
+        seed: int = 0,
+    ):
+        """Initializes the matcher, training partitions over the embeddings."""
+        super().__init__(embeddings, categories, dtype, num_neighbours)
+        count = len(self.matrix)
+        num_lists = num_lists or int(np.sqrt(count))
+        self.num_lists = max(1, min(num_lists, count))
+        self.num_probes = num_probes
+        self._train(iterations, np.random.default_rng(seed))
+
+        self.lists: List[np.ndarray] = []  # Row ids in each partition
+        self.list_vectors: List[np.ndarray] = []  # Their rows, contiguous
+        assignments = self._assign(self.matrix)
+        for i in range(self.num_lists):
+            rows = np.flatnonzero(assignments == i)
+            self.lists.append(rows)
+            self.list_vectors.append(self.matrix[rows])
+
+    def _assign(self, rows: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """Returns the nearest centroid of each row, scoring rows in chunks."""
+        return np.concatenate(
+            [
+                np.argmax(rows[i : i + chunk] @ self.centroids.T, axis=1)
+                for i in range(0, len(rows), chunk)
+            ]
+            or [np.zeros(0, dtype=int)]
+        )
+
+    def _train(self, iterations: int, rng: np.random.Generator):
+        """Fits unit-length partition centroids by spherical k-means."""
+        if len(self.matrix) == 0:
+            self.centroids = np.zeros((1, self.matrix.shape[1]), self.matrix.dtype)
+            return
+        seeds = rng.choice(len(self.matrix), self.num_lists, replace=False)
+        self.centroids = self.matrix[seeds].astype(np.float32)
+        for _ in range(iterations):
+            assignments = self._assign(self.matrix)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, self.matrix)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0  # Empty partitions keep their centroid
+            self.centroids[filled] = sums[filled] / norms[filled]
+        self.centroids = self.centroids.astype(self.matrix.dtype)
+
+    def copy(self) -> "IVFRouteMatcher":
+        """Returns a matcher that can be added to without changing this one."""
+        matcher = super().copy()
+        matcher.lists = list(self.lists)
+        matcher.list_vectors = list(self.list_vectors)
+        return matcher
+
+    def add(self, embeddings: np.ndarray, categories: np.ndarray):
+        """Appends utterances, each to its nearest partition."""
+        start = len(self.matrix)
+        super().add(embeddings, categories)
+        new_rows = np.arange(start, len(self.matrix))
+        assignments = self._assign(self.matrix[start:])
+        for i in np.unique(assignments):
+            rows = new_rows[assignments == i]
+            self.lists[i] = np.concatenate([self.lists[i], rows])
+            self.list_vectors[i] = np.concatenate(
+                [self.list_vectors[i], self.matrix[rows]]
+            )
+
+    def candidates(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the rows of the partitions nearest to the query."""
+        num_probes = min(self.num_probes, self.num_lists)
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, num_probes - 1)[:num_probes]
+        rows = np.concatenate([self.lists[i] for i in probes])
+        similarities = np.concatenate([self.list_vectors[i] @ query for i in probes])
+        return rows, similarities
+
+
+class MatrixRouteLayer(RouteLayer):
+    """RouteLayer whose utterance retrieval goes through a RouteMatcher.
+
+    Route choice, thresholds and function-call extraction are RouteLayer's own.
+    """
+
+    def __init__(
+        self,
+        *args,
+        matcher: Callable[[np.ndarray, np.ndarray], RouteMatcher] = RouteMatcher,
+        **kwargs,
+    ):
+        """Initializes the layer.
+
+        `matcher` builds the matcher from the index and its route names, e.g.
+        RouteMatcher for exact search or IVFRouteMatcher for approximate.
+        """
+        self.make_matcher = matcher
+        # The index the matcher was built over, and the matcher
+        self._matched: Optional[Tuple[np.ndarray, RouteMatcher]] = None
+        self._matcher_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _current_matcher(self) -> Optional[RouteMatcher]:
+        """Returns the built matcher if it is over the current index."""
+        matched = self._matched
+        if matched is not None and matched[0] is self.index:
+            return matched[1]
+        return None
+
+    def build_matcher(self) -> RouteMatcher:
+        """Builds the matcher over the current index unless it is up to date.
+
+        Concurrent callers wait for one build rather than each building their
+        own.
+        """
+        matcher = self._current_matcher()
+        if matcher is None:
+            with self._matcher_lock:
+                matcher = self._current_matcher()
+                if matcher is None:
+                    matcher = self.make_matcher(self.index, self.categories)
+                    self._matched = (self.index, matcher)
+        return matcher
+
+    @property
+    def matcher(self) -> RouteMatcher:
+        """Returns the matcher over the current index, rebuilt if it changed."""
+        return self.build_matcher()
+
+    def add(self, route: Route):
+        """Adds a route, inserting its utterances into a copy of the matcher.
+
+        The copy replaces the built matcher once it is complete, so queries
+        already using the old one are not disturbed.
+        """
+        with self._matcher_lock:
+            matcher = self._current_matcher()
+            start = 0 if self.index is None else len(self.index)
+            super().add(route)
+            if matcher is not None:
+                matcher = matcher.copy()
+                matcher.add(self.index[start:], self.categories[start:])
+                self._matched = (self.index, matcher)
+
+    def top_routes(self, vector, k: int = 1) -> List[RouteMatch]:
+        """Returns up to k routes near the query vector, best first."""
+        if self.index is None:
+            return []
+        return self.matcher.top_routes(vector, k)
+
+    def _retrieve(self, xq: Any, top_k: int = 5) -> List[dict]:
+        """Returns the route and similarity of the top_k nearest utterances."""
+        if self.index is None:
+            return super()._retrieve(xq, top_k)
+        idx, similarities = self.matcher.nearest(xq, top_k)
+        return [
+            {"route": self.categories[i], "score": s.item()}
+            for i, s in zip(idx, similarities)
+        ]
+
+
+class RouteResult(NamedTuple):
+    """Outcome of routing a single prompt."""
+
+    response: Any
+    route: Optional[str] = None  # Tool route used, None for the general LLM
+    similarity: Optional[float] = None  # Set when served by the semantic cache
+
+
 class LLMRouter:
     """LLM with semantic routing."""
 
-    def __init__(self, llm):
-        """Initializes LLMRouter with a specified LLM."""
+    def __init__(
+        self,
+        llm,
+        generate_fn=None,
+        semantic_cache=None,
+        route_layer=None,
+        embedding_cache=None,
+        encoder_batcher=None,
+    ):
+        """Initializes LLMRouter with a specified LLM.
+
+        `generate_fn` handles every generation on the LLM: prompts that match no
+        tool route and tool argument extraction. The vLLM engine is not
+        thread-safe, so it defaults to calling the LLM under a lock; a batcher
+        in front of the LLM can take its place. An
+        optional `semantic_cache` reuses general-LLM answers for prompts whose
+        routing embeddings are near-duplicates. A prebuilt `route_layer` skips
+        the lazy setup_router on the first request. An `embedding_cache` keeps
+        prompt embeddings, which both routing and the semantic cache use, so
+        repeated prompts skip the encoder. An `encoder_batcher` (a MicroBatcher
+        around the route layer's encoder) embeds the prompts of concurrent
+        callers in one encoder call.
+        """
         self.llm = llm
-        self.vllm = VLLMAdapter(vllm_instance=llm, name="vllm")
+        self.generate_fn = generate_fn or self._locked(llm)
+        self.semantic_cache = semantic_cache
+        self.embedding_cache = embedding_cache
+        self.encoder_batcher = encoder_batcher
+        self.vllm = VLLMAdapter(
+            vllm_instance=llm, name="vllm", generate_fn=self.generate_fn
+        )
         self.tools = load_used_tools_from_file()
+        self.encoder = None
         self.route_layer = None
+        if route_layer is not None:
+            self.set_route_layer(route_layer)
+
+    @staticmethod
+    def _locked(llm):
+        """Returns a function calling the LLM from one thread at a time."""
+        lock = threading.Lock()
+
+        def generate(prompt, **generate_kwargs):
+            with lock:
+                return llm(prompt, **generate_kwargs)
+
+        return generate
 
-    def __call__(self, prompt):
+    def __call__(self, prompt, **generate_kwargs):
         """Allows LLMRouter to be called directly with a prompt."""
-        return self.run(prompt)
+        return self.run(prompt, **generate_kwargs)
 
     def setup_router(self):
         """Sets up the semantic router for the LLM."""
-        routes = [tool.route for tool in self.tools]
-        # routes += [general_route]
-        encoder = HuggingFaceEncoder()
+        self.set_route_layer(build_route_layer(self.tools))
 
-        self.route_layer = RouteLayer(encoder=encoder, routes=routes, llm=self.vllm)
+    def set_route_layer(self, route_layer: RouteLayer):
+        """Uses a built RouteLayer, extracting function inputs with this LLM."""
+        route_layer.llm = self.vllm
+        self.encoder = route_layer.encoder
+        self.route_layer = route_layer
 
-    def run(self, prompt: str):
-        """Processes prompt via semantic routing and returns LLM response."""
+    def encode(self, prompt: str) -> np.ndarray:
+        """Embeds a prompt with the router's encoder, or its embedding cache."""
+        encoder = self.encoder
+        if self.encoder_batcher is not None:
+            encoder = self.encoder_batcher.map
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode([prompt], encoder)[0]
+        return np.squeeze(np.array(encoder([prompt])))
+
+    def close(self):
+        """Stops the encoder batcher's thread, if there is one."""
+        if self.encoder_batcher is not None:
+            self.encoder_batcher.close()
+
+    def route(self, prompt: str):
+        """Chooses the route for a prompt without running it.
+
+        Returns the route layer's choice, including the function-call inputs
+        extracted for tool routes, and the prompt's embedding.
+        """
         if not self.route_layer:
             self.setup_router()
 
-        response = self.route_layer(prompt)
+        with time_stage("routing"):
+            vector = self.encode(prompt)
+            response = self.route_layer(text=prompt, vector=vector)
+        return response, vector
+
+    def run(self, prompt: str, **generate_kwargs):
+        """Processes prompt via semantic routing and returns LLM response."""
+        return self.run_with_route(prompt, **generate_kwargs)[0]
+
+    def run_with_route(self, prompt: str, **generate_kwargs) -> RouteResult:
+        """Processes prompt via semantic routing.
+
+        Returns the response along with the tool route that produced it and, for
+        semantic cache hits, the similarity to the cached prompt. Any
+        `generate_kwargs` (e.g. max_tokens, stop) apply to the general LLM.
+        """
+        response, vector = self.route(prompt)
         if response.function_call and response.name:
+            result = RouteResult(response=response, route=response.name)
             for tool in self.tools:
                 if tool.name in response.name:
-                    response = tool.function(**response.function_call)
+                    with time_stage("tool_execution"):
+                        output = tool.function(**response.function_call)
+                    result = result._replace(response=output)
                     break
         else:
-            response = self.llm(prompt)
-        print(f"LLM Router Response: {response}, dtype={type(response)}")
-        return response
+            result = self.generate_with_cache(prompt, vector, **generate_kwargs)
+        print(f"LLM Router Response: {result.response}, dtype={type(result.response)}")
+        return result
+
+    def generate_with_cache(
+        self, prompt: str, vector: np.ndarray, **generate_kwargs
+    ) -> RouteResult:
+        """Answers with the general LLM unless a similar prompt is cached.
+
+        The semantic cache holds answers generated with default parameters, so
+        it is skipped when `generate_kwargs` override them.
+        """
+        semantic_cache = None if generate_kwargs else self.semantic_cache
+        if semantic_cache is not None:
+            cached = semantic_cache.lookup(vector)
+            if cached is not None:
+                response, similarity = cached
+                return RouteResult(response=response, similarity=similarity)
+
+        with time_stage("generation"):
+            response = self.generate_fn(prompt, **generate_kwargs)
+        if semantic_cache is not None:
+            semantic_cache.add(vector, response)
+        return RouteResult(response=response)
@@ -0,0 +1,132 @@
+"""Route utterance embeddings kept in a file and memory-mapped at startup.
+
+Build the file ahead of time with `python -m llm_agent.route_index`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+from typing import Iterable, List, Optional
+
+import numpy as np
+from semantic_router import Route, RouteLayer
+
+MAGIC = b"RTIDX001"  # File format identifier and version
+ALIGNMENT = 64  # Embeddings start on a cache-line boundary
+
+
+def content_hash(encoder, routes: Iterable[Route]) -> str:
+    """Hashes everything the embeddings depend on: the encoder and utterances."""
+    payload = {
+        "encoder": [encoder.type, encoder.name],
+        "routes": [[route.name, list(route.utterances)] for route in routes],
+    }
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+
+class RouteIndex:
+    """Utterance embeddings, one row per utterance, and each row's route name."""
+
+    def __init__(self, embeddings: np.ndarray, categories: np.ndarray, hash: str):
+        """Initializes an index from its rows."""
+        self.embeddings = embeddings
+        self.categories = categories
+        self.hash = hash
+
+    def __len__(self) -> int:
+        """Returns the number of utterances."""
+        return len(self.categories)
+
+    @classmethod
+    def build(cls, encoder, routes: List[Route]) -> "RouteIndex":
+        """Embeds every route's utterances in one encoder call."""
+        utterances = [u for route in routes for u in route.utterances]
+        categories = [route.name for route in routes for _ in route.utterances]
+        embeddings = np.asarray(encoder(utterances), dtype=np.float32)
+        return cls(embeddings, np.array(categories), content_hash(encoder, routes))
+
+    def save(self, path: str):
+        """Writes the index atomically, so readers never see a partial file."""
+        header = json.dumps(
+            {
+                "hash": self.hash,
+                "shape": list(self.embeddings.shape),
+                "categories": self.categories.tolist(),
+            }
+        ).encode()
+        prefix = MAGIC + struct.pack("<Q", len(header)) + header
+        padding = -len(prefix) % ALIGNMENT
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(prefix + b"\0" * padding)
+            f.write(np.ascontiguousarray(self.embeddings, dtype="<f4").tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RouteIndex":
+        """Memory-maps an index file read-only, sharing its pages across processes.
+
+        Raises:
+            ValueError: If the file is not a route index.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a route index")
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+        offset = len(MAGIC) + 8 + header_size
+        offset += -offset % ALIGNMENT
+
+        shape = tuple(header["shape"])
+        embeddings = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=shape)
+        return cls(embeddings, np.array(header["categories"]), header["hash"])
+
+    def select(self, route_names: Iterable[str]) -> "RouteIndex":
+        """Returns the rows of the given routes (this index if that is all rows)."""
+        mask = np.isin(self.categories, list(route_names))
+        if mask.all():
+            return self
+        return RouteIndex(self.embeddings[mask], self.categories[mask], self.hash)
+
+    def attach(self, route_layer: RouteLayer, routes: List[Route]):
+        """Serves the routes from this index in a RouteLayer built without routes."""
+        for route in routes:
+            if route.score_threshold is None:
+                route.score_threshold = route_layer.score_threshold
+        index = self.select(route.name for route in routes)
+        route_layer.routes = list(routes)
+        route_layer.index = index.embeddings
+        route_layer.categories = index.categories
+
+
+def load_or_build(path: str, encoder, routes: List[Route]) -> RouteIndex:
+    """Memory-maps the index at `path`, rebuilding it if its hash is stale."""
+    expected = content_hash(encoder, routes)
+    index: Optional[RouteIndex] = None
+    try:
+        index = RouteIndex.load(path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Rebuilding unreadable route index {path}: {e}")
+
+    if index is not None and index.hash == expected:
+        return index
+    logging.info(f"Building route index {path} ({len(routes)} routes)")
+    RouteIndex.build(encoder, routes).save(path)
+    return RouteIndex.load(path)
+
+
+if __name__ == "__main__":
+    from semantic_router.encoders import HuggingFaceEncoder
+
+    from config import Settings
+    from tools.routes import routes
+
+    path = Settings().ROUTE_INDEX_PATH or "route_index.bin"
+    all_routes = [tool.route for tool in routes.values()]
+    index = load_or_build(path, HuggingFaceEncoder(), all_routes)
+    print(f"{path}: {len(index)} utterances, hash {index.hash[:12]}")
@@ -1,44 +1,238 @@
 """FastAPI server for handling Large Language Model (LLM) requests."""
 
+import asyncio
+import gc
+import json
+import logging
+import math
 import os
-from typing import Optional
+import secrets
+import signal
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from langchain.llms import VLLM
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 
-from config import Settings
+from config import LLM, Settings
 
 # from llm_agent.llm_agent import LLMAgent
-# from llm_agent.llm_memory import MemoryLLM
-from llm_agent.llm_router import LLMRouter
+from llm_agent.llm_memory import MemoryLLM
+from llm_agent.llm_router import (
+    IVFRouteMatcher,
+    LLMRouter,
+    RouteMatcher,
+    RouteResult,
+    build_route_layer,
+)
+from serving.admission import AdmissionController, AdmissionRejected, Ticket
+from serving.backends import AsyncEngineBackend, Backend
+from serving.batcher import MicroBatcher
+from serving.cache import ResponseCache
+from serving.coalescer import SingleFlight
+from serving.embedding_cache import EmbeddingCache
+from serving.executor import InferenceExecutor, await_future
+from serving.fake_engine import FakeEngine, LatencyModel, SimulatedLLM
+from serving.fake_engine import SamplingParams as FakeSamplingParams
+from serving.lifecycle import Drainer, EngineState
+from serving.metrics import (
+    BATCH_SIZE,
+    CACHE_HIT_RATIO,
+    CACHE_LOOKUPS,
+    CANCELLED,
+    COALESCED,
+    ENCODER_BATCH_SIZE,
+    GENERATED_TOKENS,
+    IN_FLIGHT,
+    QUEUE_TIME,
+    QUEUED,
+    QUEUED_TOKENS,
+    REGISTRY,
+    REQUEST_LATENCY,
+    REQUESTS,
+    TIME_TO_FIRST_TOKEN,
+)
+from serving.model_registry import ModelBudgetExceeded, ModelRegistry
+from serving.scheduler import Job, OutputLengthEstimator, scheduled_as
+from serving.semantic_cache import SemanticCache
+from serving.session_store import SessionStore
+from text_processing import TextProcessing as tp
 
 settings = Settings()
 
 
-class GenerateRequest(BaseModel):
+class SamplingRequest(BaseModel):
+    """Optional per-request overrides of the engine's sampling parameters."""
+
+    max_tokens: Optional[int] = Field(None, ge=1)
+    temperature: Optional[float] = Field(None, ge=0)
+    top_p: Optional[float] = Field(None, gt=0, le=1)
+    stop: Optional[List[str]] = None
+
+    def sampling_params(self) -> Dict[str, Any]:
+        """Returns the overrides that were set, checked against server caps."""
+        if self.max_tokens is not None and self.max_tokens > settings.MAX_TOKENS_LIMIT:
+            raise ValueError(
+                f"max_tokens {self.max_tokens} exceeds {settings.MAX_TOKENS_LIMIT}"
+            )
+        if self.stop is not None and len(self.stop) > settings.MAX_STOP_SEQUENCES:
+            raise ValueError(
+                f"Too many stop sequences: {len(self.stop)} > "
+                f"{settings.MAX_STOP_SEQUENCES}"
+            )
+        return self.model_dump(
+            include={"max_tokens", "temperature", "top_p", "stop"}, exclude_none=True
+        )
+
+
+class GenerateRequest(SamplingRequest):
     """Schema for LLM text generation request."""
 
     text: str
+    model: Optional[str] = None  # Defaults to DEFAULT_MODEL, see /models
+    # Seconds until generation is abandoned
+    timeout: Optional[float] = Field(None, gt=0)
+    n: int = Field(1, ge=1)  # Independent completions to return
+    priority: Optional[str] = None  # One of PRIORITY_CLASSES
+    session_id: Optional[str] = None  # Continues that conversation, see MemoryLLM
+
+
+class GenerateBatchRequest(SamplingRequest):
+    """Schema for batched LLM text generation request."""
+
+    texts: List[str]
+    model: Optional[str] = None  # Only DEFAULT_MODEL serves batches
+    # Seconds until each prompt's generation is abandoned
+    timeout: Optional[float] = Field(None, gt=0)
+    priority: Optional[str] = None  # One of PRIORITY_CLASSES
+
+
+def generate_vllm_batch(llm: VLLM, prompts: List[str], **params: Any) -> List[str]:
+    """Generates completions for a list of prompts in a single VLLM call.
+
+    `params` override the engine's default SamplingParams for this call only.
+    """
+    BATCH_SIZE.observe(len(prompts))
+    if isinstance(llm, SimulatedLLM):
+        return llm.generate_batch(prompts, **params)
+    result = llm._generate(prompts=prompts, **params)
+    return [generation[0].text for generation in result.generations]
+
+
+_batchers: Dict[int, MicroBatcher] = {}
+
+
+def get_batcher(llm: VLLM) -> MicroBatcher:
+    """Returns the micro-batcher feeding the given VLLM (or SimulatedLLM)."""
+    batcher = _batchers.get(id(llm))
+    if batcher is None:
+        batcher = MicroBatcher(
+            generate_fn=lambda prompts, **params: generate_vllm_batch(
+                llm, prompts, **params
+            ),
+            max_batch_size=settings.MAX_BATCH_SIZE,
+            max_wait_ms=settings.BATCH_WAIT_MS,
+        )
+        _batchers[id(llm)] = batcher
+    return batcher
+
+
+def stream_llm(llm, query: str, **params: Any) -> Iterator[str]:
+    """Yields completion chunks as the LLM decodes them.
+
+    LLMs without token streaming (e.g. LangChain's VLLM) yield a single chunk.
+    """
+    if isinstance(llm, VLLM):
+        yield get_batcher(llm)(query, **params)
+    elif hasattr(llm, "stream"):
+        yield from llm.stream(query, **params)
+    else:
+        yield llm(query, **params)
+
+
+def create_router(llm: VLLM, route_layer=None) -> LLMRouter:
+    """Wraps a VLLM instance in an LLMRouter that batches general-LLM prompts."""
+    semantic_cache = None
+    if settings.SEMANTIC_CACHE_ENABLED:
+        semantic_cache = SemanticCache(
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        )
+    embedding_cache = None
+    if settings.EMBEDDING_CACHE_MAX_ENTRIES > 0:
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    encoder_batcher = None
+    if route_layer is not None and settings.ENCODER_BATCH_SIZE > 1:
+        encoder_batcher = create_encoder_batcher(route_layer.encoder)
+    return LLMRouter(
+        llm=llm,
+        generate_fn=get_batcher(llm),
+        semantic_cache=semantic_cache,
+        route_layer=route_layer,
+        embedding_cache=embedding_cache,
+        encoder_batcher=encoder_batcher,
+    )
+
+
+def create_encoder_batcher(encoder) -> MicroBatcher:
+    """Returns a micro-batcher embedding concurrent routing prompts together."""
+
+    def encode_batch(prompts: List[str]) -> List[Any]:
+        ENCODER_BATCH_SIZE.observe(len(prompts))
+        return encoder(prompts)
+
+    return MicroBatcher(
+        generate_fn=encode_batch,
+        max_batch_size=settings.ENCODER_BATCH_SIZE,
+        max_wait_ms=settings.ENCODER_BATCH_WAIT_MS,
+        name="encoder-batcher",
+    )
+
+
+def model_quantization(model: str) -> Optional[str]:
+    """Returns the quantization method a model is served with."""
+    if model == settings.DEFAULT_MODEL:
+        return settings.QUANTIZATION
+    for method in ["awq", "gptq"]:
+        if method in model.lower():
+            return method
+    return None
+
+
+def gpu_utilization(quantization: Optional[str] = None) -> float:
+    """Returns the GPU memory fraction reserved for a model's engine."""
+    if quantization is None:
+        return settings.DEFAULT_GPU_UTIL
+    return getattr(
+        settings, f"{quantization.upper()}_GPU_UTIL", settings.DEFAULT_GPU_UTIL
+    )
 
 
 def create_llm(
-    quantization: Optional[str] = None, use_agent: Optional[bool] = False
+    quantization: Optional[str] = None,
+    use_agent: Optional[bool] = False,
+    model: Optional[str] = None,
 ) -> VLLM:
     """Creates and returns VLLM instance based on current configuration."""
     if quantization is None:
-        gpu_utilization = settings.DEFAULT_GPU_UTIL
         dtype_value = "bfloat16"
     else:
-        gpu_utilization = getattr(
-            settings, f"{quantization.upper()}_GPU_UTIL", settings.DEFAULT_GPU_UTIL
-        )
         dtype_value = "half" if quantization in ["awq", "gptq"] else "bfloat16"
 
     try:
         llm = VLLM(
-            model=settings.DEFAULT_MODEL,
+            model=model or settings.DEFAULT_MODEL,
             temperature=settings.TEMPERATURE,
             use_beam_search=False,
             max_new_tokens=settings.MAX_TOKENS,
@@ -47,25 +241,370 @@ def create_llm(
             dtype=dtype_value,
             vllm_kwargs={
                 "quantization": quantization,
-                "gpu_memory_utilization": gpu_utilization,
+                "gpu_memory_utilization": gpu_utilization(quantization),
                 # "max_model_len": settings.MAX_SEQ_LEN,
             },
         )
 
         if use_agent:
-            return LLMRouter(llm=llm)
+            return create_router(llm)
         return llm
     except Exception as e:
         raise RuntimeError(f"Failed to initialize LLM: {e}")
 
 
+def simulated_latency() -> LatencyModel:
+    """Returns the latency model configured for the simulated backends."""
+    return LatencyModel(
+        prefill_ms_per_token=settings.SIM_PREFILL_MS_PER_TOKEN,
+        decode_ms_per_token=settings.SIM_DECODE_MS_PER_TOKEN,
+        batch_exponent=settings.SIM_BATCH_EXPONENT,
+        jitter=settings.SIM_JITTER,
+        seed=settings.SIM_SEED,
+    )
+
+
+def create_backend(model: Optional[str] = None):
+    """Creates the configured BACKEND engine for a model (DEFAULT_MODEL if None).
+
+    "langchain" is LangChain's VLLM behind the micro-batcher; "async_engine" is
+    vLLM's AsyncLLMEngine with continuous batching. "simulated" and "fake" need
+    no GPU: they stand in for LangChain's VLLM and for AsyncLLMEngine
+    respectively, timed by the SIM_* latency model.
+    """
+    model = model or settings.DEFAULT_MODEL
+    quantization = model_quantization(model)
+    if settings.BACKEND == "langchain":
+        return create_llm(quantization, model=model)
+    if settings.BACKEND == "simulated":
+        return SimulatedLLM(simulated_latency(), max_tokens=settings.MAX_TOKENS)
+
+    defaults = {"temperature": settings.TEMPERATURE, "max_tokens": settings.MAX_TOKENS}
+    if settings.BACKEND == "fake":
+        return AsyncEngineBackend(
+            FakeEngine(simulated_latency()), FakeSamplingParams, defaults
+        )
+    if settings.BACKEND == "async_engine":
+        return AsyncEngineBackend.from_engine_args(
+            defaults=defaults,
+            model=model,
+            quantization=quantization,
+            gpu_memory_utilization=gpu_utilization(quantization),
+            dtype="half" if quantization in ["awq", "gptq"] else "bfloat16",
+            tensor_parallel_size=settings.NUM_GPUS,
+        )
+    raise ValueError(f"Unknown backend: {settings.BACKEND}")
+
+
 # Initialize configurations and dependencies
 # quantization = os.environ.get("QUANTIZATION", "None")
 # quantization = quantization if quantization != "None" else None
 
-llm = create_llm(quantization="gptq", use_agent=settings.USE_AGENT)
+llm = None  # Loaded by the app lifespan, see load_engine
+engine_state = EngineState()
+executor = InferenceExecutor(
+    num_workers=settings.NUM_WORKERS,
+    max_in_flight=settings.MAX_IN_FLIGHT,
+    policy=settings.SCHEDULING_POLICY,
+    priorities=settings.PRIORITY_CLASSES,
+)
+output_lengths = OutputLengthEstimator()
+single_flight = SingleFlight()
+session_store = SessionStore(
+    max_sessions=settings.MAX_SESSIONS,
+    max_tokens=settings.SESSION_MAX_TOKENS,
+    spill_path=settings.SESSION_SPILL_PATH,
+)
+# Builds session prompts; generation goes through the usual batching and caches
+memory_llm = MemoryLLM(llm=None, store=session_store)  # Only builds prompts
+response_cache = ResponseCache(
+    max_entries=settings.CACHE_MAX_ENTRIES, ttl_seconds=settings.CACHE_TTL_SECONDS
+)
+
+
+def available_models() -> List[str]:
+    """Returns the models requests may name: DEFAULT_MODEL and config.LLM."""
+    models = [settings.DEFAULT_MODEL]
+    for name, value in vars(LLM).items():
+        if name.isupper() and value not in models:
+            models.append(value)
+    return models
 
-app = FastAPI()
+
+async def load_model(model: str):
+    """Loads an extra model for the registry on the worker pool.
+
+    The load takes no in-flight slot, so requests are not queued behind it.
+    """
+    return await executor.run_unscheduled(create_backend, model)
+
+
+def unload_model(model: str, model_llm):
+    """Releases an evicted model's batcher and, best effort, its GPU memory."""
+    batcher = _batchers.pop(id(model_llm), None)
+    if batcher is not None:
+        batcher.close()
+    if isinstance(model_llm, Backend):
+        model_llm.close()
+    gc.collect()
+    try:
+        import torch
+
+        torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+model_registry = ModelRegistry(
+    load_fn=load_model,
+    cost_fn=lambda model: gpu_utilization(model_quantization(model)),
+    budget=settings.MODEL_GPU_BUDGET,
+    unload_fn=unload_model,
+    reserved=gpu_utilization(settings.QUANTIZATION),  # The DEFAULT_MODEL engine
+)
+admission = AdmissionController(
+    max_queue_depth=settings.MAX_QUEUE_DEPTH,
+    max_queued_tokens=settings.MAX_QUEUED_TOKENS,
+    concurrency=settings.MAX_IN_FLIGHT,
+)
+unticketed_work = 0  # Warm-up and session history I/O, which hold no ticket
+
+
+@contextmanager
+def unticketed():
+    """Counts work that holds no admission ticket as busy for draining."""
+    global unticketed_work
+    unticketed_work += 1
+    try:
+        yield
+    finally:
+        unticketed_work -= 1
+
+
+def busy_count() -> int:
+    """Returns the amount of unfinished work a drain waits for.
+
+    An admission ticket covers a request from admission until it finishes,
+    queued or running, so the executor slots it holds are not counted again.
+    """
+    return admission.depth + unticketed_work
+
+
+drainer = Drainer(grace_seconds=settings.DRAIN_GRACE_SECONDS, busy_fn=busy_count)
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Returns the loaded router's semantic cache, if it has one."""
+    if isinstance(llm, LLMRouter):
+        return llm.semantic_cache
+    return None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Returns the loaded router's prompt embedding cache, if it has one."""
+    if isinstance(llm, LLMRouter):
+        return llm.embedding_cache
+    return None
+
+
+def router_caches() -> Dict[str, Any]:
+    """Returns the loaded router's caches by metrics label."""
+    caches = {"semantic": get_semantic_cache(), "embedding": get_embedding_cache()}
+    return {name: cache for name, cache in caches.items() if cache is not None}
+
+
+def cache_lookup_samples() -> Dict[Tuple[str, str], float]:
+    """Reads cache hit/miss counts for the metrics endpoint."""
+    samples = {
+        ("exact", "hit"): response_cache.hits,
+        ("exact", "miss"): response_cache.misses,
+    }
+    for name, cache in router_caches().items():
+        samples[(name, "hit")] = cache.hits
+        samples[(name, "miss")] = cache.misses
+    return samples
+
+
+def cache_hit_ratio_samples() -> Dict[Tuple[str], float]:
+    """Reads cache hit ratios for the metrics endpoint."""
+    samples = {("exact",): response_cache.stats()["hit_ratio"]}
+    for name, cache in router_caches().items():
+        samples[(name,)] = cache.stats()["hit_ratio"]
+    return samples
+
+
+IN_FLIGHT.set_function(
+    lambda: executor.in_flight + (llm.in_flight if isinstance(llm, Backend) else 0)
+)
+QUEUED.set_function(
+    lambda: executor.waiting + sum(b.pending for b in _batchers.values())
+)
+QUEUED_TOKENS.set_function(lambda: admission.tokens)
+COALESCED.set_function(
+    lambda: {
+        ("leader",): single_flight.leaders,
+        ("follower",): single_flight.followers,
+    }
+)
+executor.scheduler.on_wait = lambda priority, seconds: QUEUE_TIME.observe(
+    seconds, priority=priority
+)
+CACHE_LOOKUPS.set_function(cache_lookup_samples)
+CACHE_HIT_RATIO.set_function(cache_hit_ratio_samples)
+
+
+def record_request(
+    endpoint: str, outcome: str, t_0: float, response: Optional[str] = None
+):
+    """Records a finished request's outcome, latency and generated tokens."""
+    REQUESTS.inc(endpoint=endpoint, outcome=outcome)
+    REQUEST_LATENCY.observe(time.perf_counter() - t_0, endpoint=endpoint)
+    if isinstance(response, str):
+        GENERATED_TOKENS.inc(tp.estimate_tokens(response), endpoint=endpoint)
+
+
+def http_outcome(status_code: int) -> str:
+    """Maps an HTTP error status to a request outcome label."""
+    if status_code == 429:
+        return "rejected"
+    if status_code == 504:
+        return "timeout"
+    return "unavailable" if status_code == 503 else "error"
+
+
+def route_matcher():
+    """Returns the factory of the configured ROUTE_MATCHER."""
+    if settings.ROUTE_MATCHER == "exact":
+        return RouteMatcher
+    if settings.ROUTE_MATCHER == "ivf":
+        return partial(
+            IVFRouteMatcher,
+            num_lists=settings.ROUTE_IVF_LISTS,
+            num_probes=settings.ROUTE_IVF_PROBES,
+        )
+    raise ValueError(f"Unknown route matcher: {settings.ROUTE_MATCHER}")
+
+
+async def timed(stage: str, fn, *args, **kwargs):
+    """Runs a blocking startup stage on the worker pool, recording its duration."""
+    t_0 = time.perf_counter()
+    result = await executor.run(fn, *args, **kwargs)
+    engine_state.record(stage, time.perf_counter() - t_0)
+    return result
+
+
+async def load_engine():
+    """Loads the model and, concurrently, the router's encoder and route index."""
+    global llm
+    engine_state.set(EngineState.LOADING)
+    try:
+        if settings.USE_AGENT and settings.BACKEND != "langchain":
+            raise ValueError("USE_AGENT requires BACKEND=langchain")
+        stages = [timed("load_model", create_backend)]
+        if settings.USE_AGENT:
+            index_path, matcher = settings.ROUTE_INDEX_PATH, route_matcher()
+            stages.append(
+                timed("load_router", build_route_layer, None, index_path, matcher)
+            )
+        vllm, *route_layer = await asyncio.gather(*stages)
+        engine = create_router(vllm, *route_layer) if settings.USE_AGENT else vllm
+    except Exception as e:
+        logging.exception("Failed to load LLM engine")
+        engine_state.set(EngineState.FAILED, error=str(e))
+        return
+
+    if settings.WARMUP_ON_STARTUP:
+        engine_state.set(EngineState.WARMING_UP)
+        with unticketed():
+            await warm_up(engine)
+    llm = engine  # Requests are served from here on
+    if not drainer.draining:
+        engine_state.set(EngineState.READY)
+
+
+async def warm_up(engine):
+    """Runs WARMUP_PROMPTS through each serving stage before the engine is ready.
+
+    Routing (encoder and route index) and generation are timed separately and
+    recorded as warm_up:<stage>. A failed stage is logged and skipped, since the
+    engine can still serve; it only means that stage starts cold.
+    """
+    t_0 = time.perf_counter()
+    stages = []
+    generator = engine
+    if isinstance(engine, LLMRouter):
+        stages.append(("routing", lambda prompt: executor.run(engine.route, prompt)))
+        generator = engine.llm  # Tools are not run, only the general LLM
+    stages.append(
+        (
+            "generation",
+            lambda prompt: run_llm(
+                generator, prompt, max_tokens=settings.WARMUP_MAX_TOKENS
+            ),
+        )
+    )
+    for stage, run_stage in stages:
+        t_stage = time.perf_counter()
+        try:
+            for prompt in settings.WARMUP_PROMPTS:
+                await run_stage(prompt)
+        except Exception as e:
+            logging.warning(f"Warm-up {stage} failed: {e}")
+        engine_state.record(f"warm_up:{stage}", time.perf_counter() - t_stage)
+    engine_state.record("warm_up", time.perf_counter() - t_0)
+
+
+def start_drain(reason: str) -> asyncio.Task:
+    """Stops taking requests and waits for in-flight ones, see Drainer."""
+    if not drainer.draining:
+        logging.info(f"Draining ({reason}) for up to {drainer.grace_seconds}s")
+        engine_state.set(EngineState.DRAINING)
+    return drainer.start()
+
+
+def exit_after_drain(finished: bool):
+    """Asks uvicorn to shut down once draining is over."""
+    if not finished:
+        logging.warning(f"Drain grace period over with {drainer.busy_fn()} unfinished")
+    os.kill(os.getpid(), signal.SIGINT)  # uvicorn's graceful shutdown
+
+
+def install_drain_handler():
+    """Makes SIGTERM drain the server before uvicorn shuts it down.
+
+    Signal handlers can only be installed from the main thread, so this does
+    nothing when the app is not run by uvicorn (e.g. under a test client).
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, start_drain, "SIGTERM"
+        )
+    except NotImplementedError:  # Windows
+        return
+    drainer.on_drained = exit_after_drain
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts loading the engine in the background, then cleans up on shutdown.
+
+    The server accepts connections immediately; /health/ready reports when the
+    engine is loaded and warmed up and can take requests.
+    """
+    install_drain_handler()
+    load_task = asyncio.create_task(load_engine())
+    yield
+    load_task.cancel()
+    for batcher in _batchers.values():
+        batcher.close()
+    if isinstance(llm, (Backend, LLMRouter)):
+        llm.close()
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def get_llm_instance():
@@ -73,6 +612,22 @@ def get_llm_instance():
     return llm
 
 
+def require_llm(llm):
+    """Raises 503 if the engine has not finished loading or is draining."""
+    if drainer.draining:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is shutting down",
+            headers={"Retry-After": "1"},
+        )
+    if llm is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"LLM engine not ready: {engine_state.status}",
+        )
+    return llm
+
+
 def get_llm():
     """Dependency injector for the LLM.
 
@@ -85,15 +640,605 @@ def get_llm():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def admit(queries: List[str], max_tokens: Optional[int] = None) -> Ticket:
+    """Admits prompts for generation or raises 429 if the server is overloaded.
+
+    Each prompt is costed at its token count plus the tokens it may generate:
+    `max_tokens`, or MAX_TOKENS if the request did not set it. Work that exceeds
+    the admission limits on its own would only be admitted by an idle server,
+    so it is refused with 400 rather than a 429 that retrying cannot clear.
+    """
+    max_tokens = max_tokens or settings.MAX_TOKENS
+    tokens = sum(tp.estimate_tokens(query) + max_tokens for query in queries)
+    oversized = admission.oversized(tokens, requests=len(queries))
+    if oversized is not None:
+        raise HTTPException(
+            status_code=400, detail=f"Request exceeds admission limits: {oversized}"
+        )
+    try:
+        return admission.admit(tokens, requests=len(queries))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server overloaded: {e.reason}",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def admit_or_record(
+    endpoint: str, queries: List[str], max_tokens: Optional[int] = None
+) -> Ticket:
+    """Admits a streamed request, recording it as rejected if it is shed."""
+    t_0 = time.perf_counter()
+    try:
+        return admit(queries, max_tokens)
+    except HTTPException as e:
+        for _ in queries:
+            record_request(endpoint, http_outcome(e.status_code), t_0)
+        raise
+
+
+def route_key(llm, model: Optional[str] = None) -> str:
+    """Returns the key output lengths are tracked under for an LLM."""
+    if isinstance(llm, LLMRouter):
+        return "router"
+    return model or settings.DEFAULT_MODEL
+
+
+def make_job(
+    llm,
+    query: str,
+    params: Dict[str, Any],
+    model: Optional[str] = None,
+    priority: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Job:
+    """Describes a request to the scheduler.
+
+    Its expected cost is the prompt's tokens plus the route's average output
+    length so far, capped at the request's max_tokens.
+    """
+    priority = priority or settings.DEFAULT_PRIORITY
+    if priority not in settings.PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority: {priority}")
+    max_tokens = params.get("max_tokens", settings.MAX_TOKENS)
+    expected = output_lengths.estimate(route_key(llm, model), default=max_tokens)
+    return Job(
+        cost=tp.estimate_tokens(query) + min(expected, max_tokens),
+        deadline=time.monotonic() + timeout if timeout else math.inf,
+        priority=priority,
+    )
+
+
+def record_output(llm, response, model: Optional[str] = None):
+    """Updates the output length estimate with a generated response."""
+    output_lengths.record(route_key(llm, model), tp.estimate_tokens(str(response)))
+
+
+async def run_llm(llm, query: str, **params: Any) -> str:
+    """Generates a response off the event loop, batching VLLM prompts.
+
+    Async backends are awaited directly; they batch requests themselves. Every
+    call on a VLLM engine goes through its micro-batcher's thread, since the
+    engine is not thread-safe; other callables run on the worker pool.
+    """
+    if isinstance(llm, Backend):
+        return await llm.generate(query, **params)
+    if isinstance(llm, (VLLM, SimulatedLLM)):
+        async with executor.slot():
+            return await await_future(get_batcher(llm).submit(query, **params))
+    return await executor.run(llm, query, **params)
+
+
+def generation_key(query: str, model: Optional[str] = None, **params: Any) -> str:
+    """Returns a key identifying the generation requested for a query."""
+    model = model or settings.DEFAULT_MODEL
+    return ResponseCache.make_key(
+        query,
+        model=model,
+        quantization=model_quantization(model),
+        temperature=params.get("temperature", settings.TEMPERATURE),
+        max_tokens=params.get("max_tokens", settings.MAX_TOKENS),
+        top_p=params.get("top_p"),
+        stop=params.get("stop"),
+    )
+
+
+def get_cache_key(
+    query: str, model: Optional[str] = None, **params: Any
+) -> Optional[str]:
+    """Returns the response cache key for a query, or None to bypass the cache.
+
+    Sampling with temperature > 0 is non-deterministic, so those responses are
+    only cached if CACHE_NONDETERMINISTIC is set.
+    """
+    temperature = params.get("temperature", settings.TEMPERATURE)
+    if not settings.CACHE_ENABLED:
+        return None
+    if temperature > 0 and not settings.CACHE_NONDETERMINISTIC:
+        return None
+    return generation_key(query, model, **params)
+
+
+def get_coalesce_key(
+    query: str, model: Optional[str] = None, **params: Any
+) -> Optional[str]:
+    """Returns the key identical in-flight requests share a generation under.
+
+    Returns None to generate independently. Coalesced requests all get the same
+    sample, so with temperature > 0 this needs COALESCE_NONDETERMINISTIC.
+    """
+    temperature = params.get("temperature", settings.TEMPERATURE)
+    if not settings.COALESCE_ENABLED:
+        return None
+    if temperature > 0 and not settings.COALESCE_NONDETERMINISTIC:
+        return None
+    return generation_key(query, model, **params)
+
+
+async def run_llm_cached(
+    llm,
+    query: str,
+    admit_misses: bool = False,
+    model: Optional[str] = None,
+    **params: Any,
+) -> Tuple[str, Dict[str, str]]:
+    """Generates a response through the response caches.
+
+    Returns the response and cache headers: X-Cache is HIT, MISS, BYPASS or
+    SEMANTIC (answered by LLMRouter's semantic cache, with the similarity in
+    X-Cache-Similarity). Responses from LLMRouter tool routes are never cached
+    since tools can be time-varying. With `admit_misses`, exact cache hits are
+    served even under overload and only misses go through admission control.
+
+    Misses identical to a generation already in flight wait for its result
+    instead of being admitted and generated again.
+    """
+    key = get_cache_key(query, model, **params)
+    if key is not None:
+        response = response_cache.get(key)
+        if response is not None:
+            return response, {"X-Cache": "HIT"}
+
+    async def generate() -> RouteResult:
+        ticket = admit([query], params.get("max_tokens")) if admit_misses else None
+        with ticket or nullcontext():
+            if isinstance(llm, LLMRouter):
+                return await executor.run(llm.run_with_route, query, **params)
+            return RouteResult(response=await run_llm(llm, query, **params))
+
+    flight_key = get_coalesce_key(query, model, **params)
+    if flight_key is None:
+        result = await generate()
+    else:
+        result = await single_flight.run(flight_key, generate)
+
+    response, cacheable = result.response, result.route is None
+    headers = {"X-Cache": "MISS" if key is not None else "BYPASS"}
+    if result.similarity is not None:
+        headers = {
+            "X-Cache": "SEMANTIC",
+            "X-Cache-Similarity": f"{result.similarity:.4f}",
+        }
+    if key is not None and cacheable:
+        response_cache.put(key, response)
+    return response, headers
+
+
+async def run_llm_samples(llm, query: str, n: int, **params: Any) -> List[str]:
+    """Generates `n` independent completions, admitted together and uncached.
+
+    The copies are submitted concurrently so VLLM prompts share a batch.
+    """
+    with admit([query] * n, params.get("max_tokens")):
+        if isinstance(llm, LLMRouter):
+            samples = [executor.run(llm.run, query, **params) for _ in range(n)]
+        else:
+            samples = [run_llm(llm, query, **params) for _ in range(n)]
+        return list(await asyncio.gather(*samples))
+
+
+async def generate_response(
+    llm, generate_request: GenerateRequest
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Returns the /generate response body and headers for a request.
+
+    Requests naming a model other than DEFAULT_MODEL are served by that model
+    from the registry, loading it first if it is not resident.
+    """
+    model = generate_request.model
+    if model is None or model == settings.DEFAULT_MODEL:
+        return await generate_with(llm, generate_request)
+    if model not in available_models():
+        raise ValueError(f"Unknown model: {model}")
+    try:
+        async with model_registry.use(model) as model_llm:
+            return await generate_with(model_llm, generate_request, model)
+    except ModelBudgetExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def generate_with(
+    llm, generate_request: GenerateRequest, model: Optional[str] = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Generates the /generate response body and headers with the given LLM.
+
+    Requests with a `session_id` are answered by the general LLM (skipping any
+    LLMRouter tool routes) with the session's history in the prompt, and the
+    exchange is added to that history. History lookups may hit the session
+    spill file and count tokens, so they run off the event loop.
+    """
+    params = generate_request.sampling_params()
+    if generate_request.n > settings.MAX_N:
+        raise ValueError(f"n {generate_request.n} exceeds {settings.MAX_N}")
+    session_id, text = generate_request.session_id, generate_request.text
+    if session_id is not None:
+        if generate_request.n != 1:
+            raise ValueError("n > 1 is not supported with session_id")
+        with unticketed():
+            text = await executor.run_unscheduled(
+                memory_llm.build_prompt, text, session_id
+            )
+        if isinstance(llm, LLMRouter):
+            llm = llm.llm
+    job = make_job(
+        llm,
+        text,
+        params,
+        model,
+        generate_request.priority,
+        generate_request.timeout or settings.REQUEST_TIMEOUT,
+    )
+    with scheduled_as(job):
+        if generate_request.n == 1:
+            response, headers = await run_llm_cached(
+                llm, text, admit_misses=True, model=model, **params
+            )
+            if headers["X-Cache"] in ("MISS", "BYPASS"):
+                record_output(llm, response, model)
+            if session_id is not None:
+                with unticketed():
+                    await executor.run_unscheduled(
+                        memory_llm.remember, session_id, generate_request.text, response
+                    )
+            return {"text": response}, headers
+
+        texts = await run_llm_samples(llm, text, generate_request.n, **params)
+    for text in texts:
+        record_output(llm, text, model)
+    return {"text": texts[0], "texts": texts}, {"X-Cache": "BYPASS"}
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe: fails only if the engine could not be loaded."""
+    status_code = 200 if engine_state.alive else 503
+    return JSONResponse(engine_state.to_dict(), status_code=status_code)
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe: succeeds once the engine can accept requests."""
+    status_code = 200 if engine_state.ready else 503
+    return JSONResponse(engine_state.to_dict(), status_code=status_code)
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before its response is ready."""
+
+
+async def wait_for_disconnect(request: Request):
+    """Returns once the client has disconnected.
+
+    Only valid after the request body has been read.
+    """
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_cancellable(request: Request, coro, timeout: Optional[float] = None):
+    """Awaits `coro`, cancelling it if the client disconnects or time runs out.
+
+    Cancellation propagates to wherever the request is waiting: the admission
+    and worker slot queues, or the micro-batcher, which skips cancelled prompts.
+    Raises ClientDisconnected, or HTTPException(504) on timeout.
+    """
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        if task in done:
+            return task.result()
+        if watcher in done:
+            raise ClientDisconnected()
+        raise HTTPException(
+            status_code=504, detail=f"Generation timed out after {timeout}s"
+        )
+    finally:
+        task.cancel()
+        watcher.cancel()
+
+
 @app.post("/generate")
 async def generate(request: Request, llm: VLLM = Depends(get_llm)):
-    """Endpoint to generate text using LLM."""
+    """Endpoint to generate text using LLM.
+
+    Sampling fields (max_tokens, temperature, top_p, stop, n) override the
+    engine defaults for this request only. The optional `timeout` (or
+    REQUEST_TIMEOUT) bounds the whole request, including time spent queued;
+    generation is abandoned when it expires or the client disconnects.
+    """
+    t_0 = time.perf_counter()
     try:
         request_data = await request.json()
-        query = GenerateRequest(**request_data).text
-        response = llm(query)
-        return JSONResponse({"text": response})
+        generate_request = GenerateRequest(**request_data)
+        body, headers = await run_cancellable(
+            request,
+            generate_response(require_llm(llm), generate_request),
+            timeout=generate_request.timeout or settings.REQUEST_TIMEOUT,
+        )
+        texts = body.get("texts", [body["text"]])
+        record_request("generate", "success", t_0, "".join(texts))
+        return JSONResponse(body, headers=headers)
+    except ClientDisconnected:
+        CANCELLED.inc(endpoint="generate", reason="disconnect")
+        record_request("generate", "disconnected", t_0)
+        return Response(status_code=499)  # Nobody is left to read it
+    except HTTPException as e:
+        if e.status_code == 504:
+            CANCELLED.inc(endpoint="generate", reason="timeout")
+        record_request("generate", http_outcome(e.status_code), t_0)
+        raise
     except Exception as e:
+        record_request("generate", "error", t_0)
         raise HTTPException(
             status_code=400, detail=f"Error processing user request: {e}"
         )
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Formats a payload as a server-sent event."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+async def stream_events(
+    request: Request,
+    llm,
+    query: str,
+    ticket: Ticket,
+    params: Dict[str, Any],
+    job: Optional[Job] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Streams LLM chunks as SSE, ending with a timing summary event.
+
+    A stream still generating after `timeout` seconds is stopped with an error
+    event, which aborts its generation. The admission ticket is released when
+    the stream ends.
+    """
+    t_0 = time.perf_counter()
+    deadline = t_0 + timeout if timeout else None
+    ttft = None
+    text = ""
+    outcome = "disconnected"
+    if isinstance(llm, Backend):
+        chunks = llm.stream(query, **params)
+    else:
+        chunks = executor.stream(stream_llm, llm, query, **params)
+    try:
+        with scheduled_as(job or Job()):
+            while True:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                if await request.is_disconnected():
+                    return
+                if ttft is None:
+                    ttft = time.perf_counter() - t_0
+                    TIME_TO_FIRST_TOKEN.observe(ttft, endpoint="generate_stream")
+                text += str(chunk)
+                yield format_sse({"text": chunk})
+        outcome = "success"
+        record_output(llm, text)
+        yield format_sse(
+            {"time_to_first_token": ttft, "total_time": time.perf_counter() - t_0},
+            event="end",
+        )
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        yield format_sse({"detail": f"Generation timed out after {timeout}s"}, "error")
+    except Exception as e:
+        outcome = "error"
+        yield format_sse({"detail": f"Error processing user request: {e}"}, "error")
+    finally:
+        await chunks.aclose()
+        ticket.release()
+        if outcome in ("disconnected", "timeout"):
+            reason = "disconnect" if outcome == "disconnected" else "timeout"
+            CANCELLED.inc(endpoint="generate_stream", reason=reason)
+        record_request("generate_stream", outcome, t_0, text)
+
+
+@app.post("/generate/stream")
+async def generate_stream(request: Request, llm: VLLM = Depends(get_llm)):
+    """Endpoint to stream generated text using server-sent events."""
+    try:
+        request_data = await request.json()
+        generate_request = GenerateRequest(**request_data)
+        query, params = generate_request.text, generate_request.sampling_params()
+        if generate_request.n != 1:
+            raise ValueError("n > 1 is not supported when streaming")
+        if generate_request.model not in (None, settings.DEFAULT_MODEL):
+            raise ValueError("Only the default model supports streaming")
+        if generate_request.session_id is not None:
+            raise ValueError("session_id is not supported when streaming")
+        job = make_job(
+            llm,
+            query,
+            params,
+            priority=generate_request.priority,
+            timeout=generate_request.timeout or settings.REQUEST_TIMEOUT,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Error processing user request: {e}"
+        )
+    llm = require_llm(llm)
+    ticket = admit_or_record("generate_stream", [query], params.get("max_tokens"))
+    timeout = generate_request.timeout or settings.REQUEST_TIMEOUT
+    return StreamingResponse(
+        stream_events(request, llm, query, ticket, params, job, timeout),
+        media_type="text/event-stream",
+        background=BackgroundTask(ticket.release),  # If the stream never starts
+    )
+
+
+async def stream_batch(
+    llm,
+    queries: List[str],
+    ticket: Ticket,
+    params: Dict[str, Any],
+    jobs: Optional[List[Job]] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Streams NDJSON results in completion order, tagged with input index.
+
+    Prompts still generating after `timeout` seconds are abandoned and report
+    an error. The admission ticket covering the whole batch is released when it
+    ends.
+    """
+    jobs = jobs or [Job() for _ in queries]
+
+    async def run_one(index: int, query: str) -> dict:
+        t_0 = time.perf_counter()
+        try:
+            with scheduled_as(jobs[index]):
+                response, headers = await asyncio.wait_for(
+                    run_llm_cached(llm, query, **params), timeout
+                )
+            if headers["X-Cache"] in ("MISS", "BYPASS"):
+                record_output(llm, response)
+            record_request("generate_batch", "success", t_0, response)
+            return {"index": index, "text": response}
+        except asyncio.TimeoutError:
+            CANCELLED.inc(endpoint="generate_batch", reason="timeout")
+            record_request("generate_batch", "timeout", t_0)
+            return {"index": index, "detail": f"Generation timed out after {timeout}s"}
+        except Exception as e:
+            record_request("generate_batch", "error", t_0)
+            return {"index": index, "detail": f"Error processing user request: {e}"}
+
+    tasks = [asyncio.ensure_future(run_one(i, q)) for i, q in enumerate(queries)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done) + "\n"
+    finally:
+        abandoned = [task for task in tasks if not task.done()]
+        for task in abandoned:  # Abandons remaining prompts if the client went away
+            task.cancel()
+        if abandoned:
+            CANCELLED.inc(
+                len(abandoned), endpoint="generate_batch", reason="disconnect"
+            )
+        ticket.release()
+
+
+@app.post("/generate/batch")
+async def generate_batch(request: Request, llm: VLLM = Depends(get_llm)):
+    """Endpoint to generate text for many prompts, streamed back as NDJSON."""
+    try:
+        request_data = await request.json()
+        batch_request = GenerateBatchRequest(**request_data)
+        queries, params = batch_request.texts, batch_request.sampling_params()
+        if len(queries) > settings.MAX_BATCH_PROMPTS:
+            raise ValueError(
+                f"Too many prompts: {len(queries)} > {settings.MAX_BATCH_PROMPTS}"
+            )
+        if batch_request.model not in (None, settings.DEFAULT_MODEL):
+            raise ValueError("Only the default model supports batches")
+        timeout = batch_request.timeout or settings.REQUEST_TIMEOUT
+        jobs = [
+            make_job(
+                llm, query, params, priority=batch_request.priority, timeout=timeout
+            )
+            for query in queries
+        ]
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Error processing user request: {e}"
+        )
+    llm = require_llm(llm)
+    ticket = admit_or_record("generate_batch", queries, params.get("max_tokens"))
+    return StreamingResponse(
+        stream_batch(llm, queries, ticket, params, jobs, timeout),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(ticket.release),  # If the stream never starts
+    )
+
+
+@app.post("/admin/drain")
+async def admin_drain(x_admin_token: Optional[str] = Header(None)):
+    """Endpoint to drain the server, as on SIGTERM.
+
+    Readiness fails and new generation requests get 503 at once. The server
+    exits once in-flight requests finish or DRAIN_GRACE_SECONDS pass.
+    """
+    if settings.ADMIN_TOKEN and not secrets.compare_digest(
+        x_admin_token or "", settings.ADMIN_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    start_drain("admin request")
+    body = {**engine_state.to_dict(), "in_flight": drainer.busy_fn()}
+    return JSONResponse(body, status_code=202)
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Endpoint to end a conversation, forgetting its history."""
+    await executor.run_unscheduled(session_store.clear, session_id)
+    return {"session_id": session_id, "deleted": True}
+
+
+@app.get("/sessions/stats")
+async def session_stats():
+    """Endpoint to report conversation memory statistics."""
+    return await executor.run_unscheduled(session_store.stats)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Endpoint to report response cache statistics."""
+    stats = {"enabled": settings.CACHE_ENABLED, **response_cache.stats()}
+    for name, cache in router_caches().items():
+        stats[name] = cache.stats()
+    return stats
+
+
+@app.get("/models")
+async def list_models():
+    """Endpoint listing the models that can be requested and those resident."""
+    return {
+        "default": settings.DEFAULT_MODEL,
+        "available": available_models(),
+        "gpu_budget": model_registry.budget,
+        "gpu_used": model_registry.used,
+        "loaded": [{"name": settings.DEFAULT_MODEL, "status": engine_state.status}]
+        + model_registry.models(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Endpoint exposing serving metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -98,9 +98,9 @@ def run_docker_container(experiment_tests, model_name):
 
 
 def stop_docker_container():
-    """Stops the Docker container."""
+    """Stops the Docker container, giving the server time to drain requests."""
     try:
-        subprocess.run(["docker", "stop", "llm6"], check=True)
+        subprocess.run(["docker", "stop", "--time", "45", "llm6"], check=True)
     except subprocess.CalledProcessError as e:
         logging.warning(f"Failed to stop Docker container: {str(e)}")
                         
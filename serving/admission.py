@@ -0,0 +1,116 @@
+"""Admission control and load shedding for generation requests."""
+
+import math
+import time
+from typing import Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request would exceed the admission limits."""
+
+    def __init__(self, reason: str, retry_after: int):
+        """Initializes the rejection with a reason and retry delay in seconds."""
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Admission of one or more requests, held until their work finishes."""
+
+    def __init__(self, controller: "AdmissionController", requests: int, tokens: int):
+        """Initializes a ticket for admitted work."""
+        self.controller = controller
+        self.requests = requests
+        self.tokens = tokens
+        self.admitted_at = time.monotonic()
+        self.released = False
+
+    def release(self):
+        """Returns the ticket's capacity to the controller; safe to call twice."""
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    def __enter__(self) -> "Ticket":
+        """Returns the ticket for use as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Releases the ticket when the enclosed work finishes."""
+        self.release()
+
+
+class AdmissionController:
+    """Bounds the requests and tokens admitted but not yet finished.
+
+    Requests beyond `max_queue_depth` or `max_queued_tokens` are rejected up
+    front instead of queuing without bound, with a Retry-After estimated from
+    recent request latency and how much admitted work is ahead of the caller.
+    An idle server always admits, so an oversized request is never starved;
+    callers that cannot wait for an idle server can refuse it up front, see
+    `oversized`.
+    """
+
+    def __init__(
+        self,
+        max_queue_depth: int,
+        max_queued_tokens: int,
+        concurrency: int = 1,
+        initial_latency: float = 1.0,
+    ):
+        """Initializes the limits and the latency estimate used for Retry-After."""
+        if max_queue_depth < 1:
+            raise ValueError("max_queue_depth must be at least 1")
+        if max_queued_tokens < 1:
+            raise ValueError("max_queued_tokens must be at least 1")
+
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_tokens = max_queued_tokens
+        self.concurrency = max(1, concurrency)
+
+        self.depth = 0
+        self.tokens = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_latency = initial_latency
+
+    def admit(self, tokens: int, requests: int = 1) -> Ticket:
+        """Admits work or raises AdmissionRejected if it would exceed a limit."""
+        reason: Optional[str] = None
+        if self.depth > 0:
+            if self.depth + requests > self.max_queue_depth:
+                reason = f"queue depth {self.depth} at limit {self.max_queue_depth}"
+            elif self.tokens + tokens > self.max_queued_tokens:
+                reason = (
+                    f"{self.tokens} queued tokens at limit {self.max_queued_tokens}"
+                )
+
+        if reason is not None:
+            self.rejected += requests
+            raise AdmissionRejected(reason, self.retry_after())
+
+        self.depth += requests
+        self.tokens += tokens
+        self.admitted += requests
+        return Ticket(self, requests, tokens)
+
+    def oversized(self, tokens: int, requests: int = 1) -> Optional[str]:
+        """Returns why work exceeds the limits even when alone, or None."""
+        if requests > self.max_queue_depth:
+            return f"{requests} requests exceed the limit of {self.max_queue_depth}"
+        if tokens > self.max_queued_tokens:
+            return f"{tokens} tokens exceed the limit of {self.max_queued_tokens}"
+        return None
+
+    def retry_after(self) -> int:
+        """Estimates seconds until the admitted work has drained."""
+        waves = math.ceil(self.depth / self.concurrency)
+        return max(1, math.ceil(waves * self.avg_latency))
+
+    def _release(self, ticket: Ticket):
+        """Frees a ticket's capacity and updates the latency estimate."""
+        self.depth -= ticket.requests
+        self.tokens -= ticket.tokens
+        latency = time.monotonic() - ticket.admitted_at
+        self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
@@ -0,0 +1,91 @@
+"""Async generation backends that bypass LangChain's synchronous VLLM wrapper."""
+
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+
+class Backend:
+    """Interface for engines that generate text natively on the event loop.
+
+    Each request is submitted on its own and awaits only its own result, so an
+    engine with continuous batching can interleave concurrent requests without
+    server-side batching or worker threads.
+    """
+
+    in_flight = 0
+
+    async def generate(self, prompt: str, **params: Any) -> str:
+        """Returns the completion for a prompt."""
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """Yields completion chunks as they are decoded."""
+        yield await self.generate(prompt, **params)
+
+    def close(self):
+        """Releases engine resources."""
+
+
+class AsyncEngineBackend(Backend):
+    """Backend driving a vLLM `AsyncLLMEngine`, or anything with its interface.
+
+    The engine must provide `generate(prompt, sampling_params, request_id)` as
+    an async generator of cumulative outputs, and `abort(request_id)`. Requests
+    whose caller goes away are aborted so they stop holding engine capacity.
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        sampling_params_cls: Callable[..., Any],
+        defaults: Optional[Dict[str, Any]] = None,
+    ):
+        """Initializes the backend with default sampling parameters."""
+        self.engine = engine
+        self.sampling_params_cls = sampling_params_cls
+        self.defaults = defaults or {}
+        self.in_flight = 0
+
+    @classmethod
+    def from_engine_args(
+        cls, defaults: Optional[Dict[str, Any]] = None, **engine_args: Any
+    ) -> "AsyncEngineBackend":
+        """Starts a vLLM AsyncLLMEngine with the given AsyncEngineArgs fields."""
+        from vllm import SamplingParams
+        from vllm.engine.arg_utils import AsyncEngineArgs
+        from vllm.engine.async_llm_engine import AsyncLLMEngine
+
+        engine = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(**engine_args))
+        return cls(engine, SamplingParams, defaults)
+
+    async def _run(self, prompt: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yields the cumulative completion text after each engine step."""
+        request_id = uuid.uuid4().hex
+        sampling_params = self.sampling_params_cls(**{**self.defaults, **params})
+        finished = False
+        self.in_flight += 1
+        try:
+            async for output in self.engine.generate(
+                prompt, sampling_params, request_id
+            ):
+                finished = output.finished
+                yield output.outputs[0].text
+        finally:
+            self.in_flight -= 1
+            if not finished:
+                await self.engine.abort(request_id)
+
+    async def generate(self, prompt: str, **params: Any) -> str:
+        """Returns the completion for a prompt."""
+        text = ""
+        async for text in self._run(prompt, params):
+            pass
+        return text
+
+    async def stream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """Yields the new text decoded at each engine step."""
+        previous = ""
+        async for text in self._run(prompt, params):
+            if len(text) > len(previous):
+                yield text[len(previous) :]
+                previous = text
@@ -0,0 +1,150 @@
+"""Dynamic micro-batching of concurrent prompts into single engine calls."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_STOP = object()
+
+
+def _params_key(params: Dict[str, Any]) -> Tuple:
+    """Returns a hashable key identifying a set of generation parameters."""
+    return tuple(
+        sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())
+    )
+
+
+class MicroBatcher:
+    """Collects prompts from concurrent callers and generates them as one batch.
+
+    A batch is flushed once `max_batch_size` prompts are waiting or `max_wait_ms`
+    has passed since the first prompt arrived, whichever comes first. The batch
+    runs on a single background thread and each caller's future receives the
+    output at its own position. Prompts submitted with different generation
+    parameters are generated in separate calls, `generate_fn(prompts, **params)`.
+    """
+
+    def __init__(
+        self,
+        generate_fn: Callable[..., List[str]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "llm-batcher",
+    ):
+        """Initializes MicroBatcher around a batched generation function.
+
+        `name` names the batching thread. Any function mapping a list of inputs
+        to one output each can be batched, e.g. an embedding encoder.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be non-negative")
+
+        self.generate_fn = generate_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self.num_batches = 0
+        self.num_prompts = 0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, prompt: str, **params: Any) -> Future:
+        """Queues a prompt for the next batch and returns a future for its text."""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((prompt, params, future))
+        return future
+
+    @property
+    def pending(self) -> int:
+        """Number of prompts waiting for a batch to start."""
+        return self._queue.qsize()
+
+    def __call__(self, prompt: str, **params: Any) -> str:
+        """Blocks until the prompt's batch has been generated."""
+        return self.submit(prompt, **params).result()
+
+    def map(self, prompts: List[str], **params: Any) -> List[Any]:
+        """Queues several prompts at once and blocks until all are generated."""
+        futures = [self.submit(prompt, **params) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Flushes queued prompts and stops the batching thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        """Starts the batching thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def _loop(self):
+        """Gathers prompts into batches until stopped."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            groups: Dict[Tuple, Tuple[Dict[str, Any], List[Tuple[str, Future]]]] = {}
+            for prompt, params, future in batch:
+                group = groups.setdefault(_params_key(params), (params, []))
+                group[1].append((prompt, future))
+            for params, group in groups.values():
+                self._flush(group, params)
+
+    def _flush(self, batch: List[Tuple[str, Future]], params: Dict[str, Any]):
+        """Runs one batched generation and fans results back out to callers."""
+        # Drops prompts whose callers cancelled while waiting
+        batch = [(p, f) for p, f in batch if f.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        prompts = [prompt for prompt, _ in batch]
+        self.num_batches += 1
+        self.num_prompts += len(prompts)
+        try:
+            outputs = self.generate_fn(prompts, **params)
+            if len(outputs) != len(prompts):
+                raise RuntimeError(
+                    f"Batch returned {len(outputs)} outputs for {len(prompts)} prompts"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
@@ -0,0 +1,70 @@
+"""Single-flight coalescing of identical concurrent generations."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """A shared in-flight call and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, sharing its result.
+
+    Callers arriving while a call with the same key is running await that call
+    instead of starting their own. The call is cancelled only once every caller
+    awaiting it has been cancelled.
+    """
+
+    def __init__(self):
+        """Initializes an empty set of in-flight calls."""
+        self.leaders = 0  # Calls started
+        self.followers = 0  # Callers that joined a running call
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of calls in flight."""
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Returns whether a call with the key is in flight on this event loop."""
+        call = self._calls.get(key)
+        return call is not None and call.task.get_loop() is asyncio.get_running_loop()
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the result of `fn()`, shared with concurrent callers of `key`."""
+        if key in self:
+            call = self._calls[key]
+            self.followers += 1
+        else:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._calls[key] = call
+            self.leaders += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()  # Every caller went away
+
+    def _forget(self, key: Hashable, call: _Call):
+        """Removes a finished call so later callers start afresh."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns coalescing statistics."""
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_ratio": self.followers / total if total else 0.0,
+        }
@@ -0,0 +1,116 @@
+"""LRU cache of prompt embeddings in front of an encoder."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from serving.cache import ResponseCache
+
+Encoder = Callable[[List[str]], Any]
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of prompt embeddings keyed by the normalized prompt.
+
+    Prompts that differ only in whitespace share an entry. Cached vectors are
+    read-only float32 arrays, so one vector can be handed to routing and to the
+    semantic cache without copies.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """Initializes an empty cache."""
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str) -> str:
+        """Returns the cache key of a prompt."""
+        return ResponseCache.normalize_prompt(prompt)
+
+    def get(self, prompt: str) -> Optional[np.ndarray]:
+        """Returns the cached embedding of a prompt, or None on a miss."""
+        key = self.make_key(prompt)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, prompt: str, vector: Any) -> np.ndarray:
+        """Stores a prompt's embedding, evicting the least recently used if full."""
+        vector = np.array(vector, dtype=np.float32).ravel()
+        vector.setflags(write=False)
+        key = self.make_key(prompt)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def encode(self, prompts: List[str], encoder: Encoder) -> List[np.ndarray]:
+        """Returns each prompt's embedding, encoding the misses in one call.
+
+        A prompt that repeats within the call is encoded once, and its repeats
+        count as hits.
+        """
+        vectors: List[Optional[np.ndarray]] = []
+        missing: Dict[str, List[int]] = {}  # Key -> positions of its prompts
+        for i, prompt in enumerate(prompts):
+            key = self.make_key(prompt)
+            if key in missing:
+                with self._lock:
+                    self.hits += 1
+                missing[key].append(i)
+                vectors.append(None)
+                continue
+            vectors.append(self.get(prompt))
+            if vectors[i] is None:
+                missing[key] = [i]
+
+        if missing:
+            positions = list(missing.values())
+            encoded = encoder([prompts[p[0]] for p in positions])
+            for group, vector in zip(positions, encoded):
+                vector = self.put(prompts[group[0]], vector)
+                for i in group:
+                    vectors[i] = vector
+        return vectors
+
+    def clear(self):
+        """Removes all entries and resets statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        """Returns the number of cached embeddings."""
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns cache size and hit/miss statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
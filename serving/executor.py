@@ -0,0 +1,157 @@
+"""Bounded worker pool for running blocking LLM calls off the event loop."""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Sequence
+
+from serving.scheduler import Scheduler
+
+_DONE = object()
+
+
+async def await_future(future: Future) -> Any:
+    """Awaits a concurrent future, cancelling it if the caller is cancelled.
+
+    Work that has not started is skipped. Work already running cannot be
+    interrupted, so cancellation is deferred until it finishes; callers holding
+    an in-flight slot keep it until the worker is actually free.
+    """
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        if not future.cancel():
+            with suppress(Exception):
+                await asyncio.wrap_future(future)
+        raise
+
+
+class InferenceExecutor:
+    """Runs blocking inference calls on a dedicated, size-limited thread pool.
+
+    Calls beyond `max_in_flight` wait on the event loop (without holding a worker
+    thread) until a slot frees up, so the pool never accumulates unbounded work.
+    Waiting calls get slots in the order of the scheduling `policy`, see
+    `Scheduler`.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        max_in_flight: int,
+        policy: str = "fifo",
+        priorities: Sequence[str] = ("interactive", "batch"),
+    ):
+        """Initializes the worker pool, in-flight limit and scheduling policy."""
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.num_workers = num_workers
+        self.max_in_flight = max_in_flight
+        self.scheduler = Scheduler(max_in_flight, policy, priorities)
+        self.in_flight = 0
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Returns the worker pool, starting a new one after shutdown."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.num_workers, thread_name_prefix="llm-worker"
+            )
+        return self._pool
+
+    @property
+    def waiting(self) -> int:
+        """Returns the number of calls waiting for a slot."""
+        return self.scheduler.waiting
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds one in-flight slot for work that does not need a worker thread."""
+        async with self.scheduler.slot():
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs `fn(*args, **kwargs)` on the worker pool and awaits its result."""
+        async with self.slot():
+            call = functools.partial(fn, *args, **kwargs)
+            return await await_future(self._get_pool().submit(call))
+
+    async def run_unscheduled(
+        self, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """Runs `fn(*args, **kwargs)` on the worker pool without taking a slot.
+
+        Meant for long housekeeping (e.g. loading a model) that requests should
+        not queue behind.
+        """
+        call = functools.partial(fn, *args, **kwargs)
+        return await await_future(self._get_pool().submit(call))
+
+    async def stream(
+        self, fn: Callable[..., Iterable[Any]], *args: Any, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """Iterates `fn(*args, **kwargs)` on the worker pool, yielding each item.
+
+        Items are handed to the event loop as soon as the worker produces them.
+        Closing the async iterator early tells the worker to stop iterating; the
+        in-flight slot is held until the worker has actually stopped.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item: Any, error: Optional[BaseException] = None):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+            except RuntimeError:  # Event loop already closed
+                stop.set()
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    if stop.is_set():
+                        return
+                    put(item)
+            except Exception as e:
+                if stop.is_set():  # Nobody is reading, see the finally below
+                    raise
+                put(_DONE, e)
+            else:
+                put(_DONE)
+
+        async with self.slot():
+            future = self._get_pool().submit(produce)
+            try:
+                while True:
+                    item, error = await items.get()
+                    if item is _DONE:
+                        if error is not None:
+                            raise error
+                        return
+                    yield item
+            finally:
+                stop.set()
+                try:
+                    await await_future(future)
+                except Exception as e:
+                    logging.warning(f"Stream worker failed after it was closed: {e}")
+
+    def shutdown(self, wait: bool = True):
+        """Stops the worker pool, optionally waiting for running calls.
+
+        A later call starts a fresh pool.
+        """
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
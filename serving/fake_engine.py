@@ -0,0 +1,225 @@
+"""Simulated LLM engines with a configurable latency model.
+
+`FakeEngine` stands in for vLLM's AsyncLLMEngine and `SimulatedLLM` for
+LangChain's synchronous VLLM, so the serving stack (batching, queues, caches)
+can be tested and load-tested on machines without a GPU. Completions are
+deterministic: the prompt's words repeated, one word per token.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, List, NamedTuple, Optional, Set
+
+
+@dataclass
+class SamplingParams:
+    """The subset of vLLM's SamplingParams the simulated engines honour."""
+
+    n: int = 1
+    max_tokens: int = 16
+    temperature: float = 1.0
+    top_p: float = 1.0
+    stop: Optional[List[str]] = None
+
+
+class CompletionOutput(NamedTuple):
+    """Mirrors vllm.outputs.CompletionOutput."""
+
+    index: int
+    text: str
+
+
+class RequestOutput(NamedTuple):
+    """Mirrors vllm.outputs.RequestOutput."""
+
+    request_id: str
+    prompt: str
+    outputs: List[CompletionOutput]
+    finished: bool
+
+
+@dataclass
+class LatencyModel:
+    """Timing of a simulated engine; the default is instantaneous.
+
+    Prefill costs `prefill_ms_per_token` per prompt token. Each decode step
+    costs `decode_ms_per_token * batch_size ** batch_exponent`, so an exponent
+    of 0 is perfect batching and 1 is none. Every step is scaled by a random
+    factor within +/- `jitter`, drawn from a generator seeded with `seed` and
+    the prompt so runs are repeatable.
+    """
+
+    prefill_ms_per_token: float = 0.0
+    decode_ms_per_token: float = 0.0
+    batch_exponent: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+
+    def rng(self, prompt: str) -> random.Random:
+        """Returns the jitter generator for a prompt."""
+        return random.Random(f"{self.seed}:{prompt}")
+
+    def noise(self, rng: random.Random) -> float:
+        """Returns a multiplicative jitter factor."""
+        if not self.jitter:
+            return 1.0
+        return 1.0 + rng.uniform(-self.jitter, self.jitter)
+
+    def prefill_time(self, prompt_tokens: int) -> float:
+        """Returns the seconds to prefill a prompt."""
+        return prompt_tokens * self.prefill_ms_per_token / 1000.0
+
+    def step_time(self, batch_size: int) -> float:
+        """Returns the seconds for one decode step of a batch."""
+        batch_size = max(batch_size, 1)
+        return self.decode_ms_per_token * batch_size**self.batch_exponent / 1000.0
+
+
+def prompt_tokens(prompt: str) -> List[str]:
+    """Splits a prompt into the simulated engines' tokens (words)."""
+    return prompt.split()
+
+
+def completion_tokens(prompt: str, max_tokens: int) -> List[str]:
+    """Returns the tokens a simulated engine decodes for a prompt."""
+    words = prompt_tokens(prompt) or ["..."]
+    return [f" {words[i % len(words)]}" for i in range(max_tokens)]
+
+
+def apply_stop(text: str, stop: Optional[List[str]]) -> Optional[str]:
+    """Returns text truncated at the first stop string, or None if none occurs."""
+    positions = [text.index(s) for s in stop or [] if s in text]
+    return text[: min(positions)] if positions else None
+
+
+class FakeEngine:
+    """Simulated engine with AsyncLLMEngine's generate/abort interface.
+
+    Requests decode concurrently like under continuous batching: each step
+    takes `latency.step_time` of the number of requests currently running.
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        """Initializes the engine."""
+        self.latency = latency or LatencyModel()
+        self.running = 0
+        self.peak_running = 0
+        self.num_requests = 0
+        self.num_aborts = 0
+        self.aborted: Set[str] = set()  # Running requests to stop at their next step
+        self._running_ids: Set[str] = set()
+
+    async def generate(
+        self, prompt: str, sampling_params: SamplingParams, request_id: str
+    ) -> AsyncIterator[RequestOutput]:
+        """Yields the cumulative output after each decoded token."""
+        self.num_requests += 1
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        self._running_ids.add(request_id)
+        rng = self.latency.rng(prompt)
+        try:
+            prefill = self.latency.prefill_time(len(prompt_tokens(prompt)))
+            await asyncio.sleep(prefill * self.latency.noise(rng))
+
+            text = ""
+            tokens = completion_tokens(prompt, sampling_params.max_tokens)
+            for i, token in enumerate(tokens):
+                step = self.latency.step_time(self.running)
+                await asyncio.sleep(step * self.latency.noise(rng))
+                if request_id in self.aborted:
+                    return
+                text += token
+                stopped = apply_stop(text, sampling_params.stop)
+                finished = stopped is not None or i == len(tokens) - 1
+                yield RequestOutput(
+                    request_id,
+                    prompt,
+                    [CompletionOutput(0, text if stopped is None else stopped)],
+                    finished,
+                )
+                if finished:
+                    return
+        finally:
+            self.running -= 1
+            self._running_ids.discard(request_id)
+            self.aborted.discard(request_id)
+
+    async def abort(self, request_id: str):
+        """Stops a request at its next step; finished requests are ignored."""
+        self.num_aborts += 1
+        if request_id in self._running_ids:
+            self.aborted.add(request_id)
+
+
+class SimulatedLLM:
+    """Simulated stand-in for LangChain's VLLM, batched by the server.
+
+    `generate_batch` blocks for the whole batch the way a synchronous engine
+    call does: every prompt is prefilled, then the batch decodes until its
+    longest completion finishes.
+    """
+
+    def __init__(self, latency: Optional[LatencyModel] = None, max_tokens: int = 16):
+        """Initializes the simulated LLM with a default completion length."""
+        self.latency = latency or LatencyModel()
+        self.max_tokens = max_tokens
+        self.num_batches = 0
+
+    def complete(self, prompt: str, max_tokens: Optional[int] = None, stop=None):
+        """Returns a prompt's completion and the decode steps it took."""
+        tokens = completion_tokens(prompt, max_tokens or self.max_tokens)
+        text = ""
+        for steps, token in enumerate(tokens, start=1):
+            text += token
+            stopped = apply_stop(text, stop)
+            if stopped is not None:
+                return stopped, steps
+        return text, len(tokens)
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        **params: Any,
+    ) -> List[str]:
+        """Generates completions for a batch of prompts in one blocking call."""
+        self.num_batches += 1
+        rng = self.latency.rng("\n".join(prompts))
+        completions = [self.complete(p, max_tokens, stop) for p in prompts]
+
+        prefill = sum(self.latency.prefill_time(len(prompt_tokens(p))) for p in prompts)
+        steps = max(steps for _, steps in completions)
+        decode = steps * self.latency.step_time(len(prompts))
+        time.sleep((prefill + decode) * self.latency.noise(rng))
+        return [text for text, _ in completions]
+
+    def __call__(self, prompt: str, **params: Any) -> str:
+        """Generates a completion for a single prompt."""
+        return self.generate_batch([prompt], **params)[0]
+
+    def stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        **params: Any,
+    ) -> Iterator[str]:
+        """Yields a single prompt's completion token by token."""
+        rng = self.latency.rng(prompt)
+        text, steps = self.complete(prompt, max_tokens, stop)
+        time.sleep(
+            self.latency.prefill_time(len(prompt_tokens(prompt)))
+            * self.latency.noise(rng)
+        )
+        words = completion_tokens(prompt, steps)
+        emitted = ""
+        for token in words:
+            time.sleep(self.latency.step_time(1) * self.latency.noise(rng))
+            chunk = (emitted + token)[: len(text)][len(emitted) :]
+            if chunk:
+                yield chunk
+                emitted += chunk
@@ -0,0 +1,104 @@
+"""Lifecycle of the serving engine: startup state and graceful drain."""
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class EngineState:
+    """Tracks engine loading so liveness and readiness can be reported apart.
+
+    The process is live as soon as it serves HTTP and stays live unless loading
+    fails for good. It is ready only once the engine can take requests.
+    """
+
+    STARTING = "starting"
+    LOADING = "loading"
+    WARMING_UP = "warming_up"
+    READY = "ready"
+    DRAINING = "draining"
+    FAILED = "failed"
+
+    def __init__(self):
+        """Initializes the state as starting."""
+        self.status = self.STARTING
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set(self, status: str, error: Optional[str] = None):
+        """Moves to a new status, recording the elapsed time since startup."""
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.timings[status] = time.monotonic() - self._started_at
+
+    def record(self, stage: str, seconds: float):
+        """Records how long a startup stage took."""
+        with self._lock:
+            self.timings[stage] = seconds
+
+    @property
+    def alive(self) -> bool:
+        """Whether the process is healthy enough to keep running."""
+        return self.status != self.FAILED
+
+    @property
+    def ready(self) -> bool:
+        """Whether the engine can accept requests."""
+        return self.status == self.READY
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the state for health endpoint responses."""
+        with self._lock:
+            return {
+                "status": self.status,
+                "error": self.error,
+                "timings": dict(self.timings),
+            }
+
+
+class Drainer:
+    """Waits for in-flight work to finish before the server shuts down.
+
+    `busy_fn` returns the amount of unfinished work. Draining ends once it is
+    zero or `grace_seconds` have passed, whichever comes first, and then calls
+    `on_drained` with whether all work finished.
+    """
+
+    def __init__(
+        self,
+        grace_seconds: float,
+        busy_fn: Callable[[], int],
+        on_drained: Optional[Callable[[bool], None]] = None,
+        poll_interval: float = 0.1,
+    ):
+        """Initializes the drainer, not yet draining."""
+        self.grace_seconds = grace_seconds
+        self.busy_fn = busy_fn
+        self.on_drained = on_drained
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def draining(self) -> bool:
+        """Whether draining has started."""
+        return self._task is not None
+
+    def start(self) -> asyncio.Task:
+        """Starts draining, or returns the drain already under way."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._drain())
+        return self._task
+
+    async def _drain(self) -> bool:
+        """Polls until no work is left or the grace period is over."""
+        deadline = time.monotonic() + self.grace_seconds
+        while self.busy_fn() > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+        finished = self.busy_fn() == 0
+        if self.on_drained is not None:
+            self.on_drained(finished)
+        return finished
@@ -0,0 +1,352 @@
+"""Lightweight Prometheus-style metrics for the serving path.
+
+Metrics are plain in-process counters, gauges and histograms rendered in the
+Prometheus text exposition format by `REGISTRY.expose()`. Updates take a single
+uncontended lock, and values that already live elsewhere (queue depths, cache
+statistics) are read through callbacks at scrape time instead of being tracked
+on the hot path.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+SampleFunction = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Renders a label set as {name="value",...}."""
+    if not names:
+        return ""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Renders a sample value, using Prometheus spellings for infinities."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for a named metric family with optional labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initializes an empty metric family."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._function: Optional[SampleFunction] = None
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        """Returns label values in declaration order, validating the names."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set_function(self, fn: SampleFunction):
+        """Reads samples from `fn` at scrape time instead of stored values.
+
+        `fn` returns a number, or for labelled metrics a dict mapping label value
+        tuples to numbers.
+        """
+        self._function = fn
+
+    def _function_samples(self) -> Dict[LabelValues, float]:
+        """Evaluates the scrape-time callback into labelled samples."""
+        samples = self._function()
+        if isinstance(samples, dict):
+            return samples
+        return {(): samples}
+
+    def samples(self) -> List[str]:
+        """Returns the sample lines for this metric family."""
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        """Renders the metric family with its HELP and TYPE headers."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initializes a counter with no samples."""
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """Increments the counter for a label set."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Returns the current count for a label set."""
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        """Returns one sample line per label set."""
+        if self._function is not None:
+            values = self._function_samples()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """Increments the gauge for a label set."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        """Decrements the gauge for a label set."""
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        """Sets the gauge for a label set."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Initializes a histogram with sorted upper bucket bounds."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        """Records one observation for a label set."""
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        """Returns the number of observations for a label set."""
+        entry = self._values.get(self._label_values(labels))
+        return sum(entry[0]) if entry else 0
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the wall-clock duration of the enclosed block."""
+        t_0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t_0, **labels)
+
+    def samples(self) -> List[str]:
+        """Returns cumulative bucket, sum and count lines per label set."""
+        with self._lock:
+            values = {k: (list(c), s[0]) for k, (c, s) in self._values.items()}
+
+        lines = []
+        names = self.labelnames + ("le",)
+        bounds = self.buckets + (float("inf"),)
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families exposed together."""
+
+    def __init__(self):
+        """Initializes an empty registry."""
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds a metric family, rejecting duplicate names."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        """Creates and registers a counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        """Creates and registers a gauge."""
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Creates and registers a histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self) -> str:
+        """Renders every metric family in the Prometheus text format."""
+        return "\n".join(m.expose() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ----- Serving Metrics -----
+REQUESTS = REGISTRY.counter(
+    "llm_requests_total",
+    "Requests handled, by endpoint and outcome.",
+    ["endpoint", "outcome"],
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "llm_request_duration_seconds", "End-to-end request latency.", ["endpoint"]
+)
+CANCELLED = REGISTRY.counter(
+    "llm_requests_cancelled_total",
+    "Requests abandoned before finishing, by endpoint and reason.",
+    ["endpoint", "reason"],
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first chunk is sent.",
+    ["endpoint"],
+)
+GENERATED_TOKENS = REGISTRY.counter(
+    "llm_generated_tokens_total", "Tokens generated (tiktoken count).", ["endpoint"]
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "llm_requests_in_flight", "Requests holding a worker pool slot."
+)
+QUEUED = REGISTRY.gauge(
+    "llm_requests_queued", "Requests waiting for a slot or for their batch."
+)
+QUEUED_TOKENS = REGISTRY.gauge(
+    "llm_queued_tokens", "Estimated tokens of admitted, unfinished requests."
+)
+QUEUE_TIME = REGISTRY.histogram(
+    "llm_queue_time_seconds",
+    "Time requests waited for a worker pool slot, by priority class.",
+    ["priority"],
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "llm_batch_size",
+    "Prompts per batched engine call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+ENCODER_BATCH_SIZE = REGISTRY.histogram(
+    "llm_encoder_batch_size",
+    "Prompts per batched routing encoder call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "llm_cache_lookups_total",
+    "Response, semantic and embedding cache lookups, by cache and result.",
+    ["cache", "result"],
+)
+COALESCED = REGISTRY.counter(
+    "llm_coalesced_requests_total",
+    "Generations by role: leaders ran, followers joined an identical one.",
+    ["role"],
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "llm_cache_hit_ratio", "Fraction of cache lookups that hit.", ["cache"]
+)
+ROUTER_STAGE_SECONDS = REGISTRY.histogram(
+    "llm_router_stage_seconds", "Time spent in each LLMRouter stage.", ["stage"]
+)
+
+_stages = threading.local()
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Records the self time of a router stage in ROUTER_STAGE_SECONDS.
+
+    Time spent in stages nested inside this one (e.g. argument extraction that
+    runs within routing) is attributed only to the nested stage.
+    """
+    stack = getattr(_stages, "stack", None)
+    if stack is None:
+        stack = _stages.stack = []
+
+    now = time.perf_counter()
+    if stack:
+        parent = stack[-1]
+        parent[0] += now - parent[1]  # Pauses the enclosing stage
+    entry = [0.0, now]  # [accumulated seconds, resumed at]
+    stack.append(entry)
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        stack.pop()
+        ROUTER_STAGE_SECONDS.observe(entry[0] + now - entry[1], stage=stage)
+        if stack:
+            stack[-1][1] = now  # Resumes the enclosing stage
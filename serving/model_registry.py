@@ -0,0 +1,140 @@
+"""Registry of models loaded on demand within a GPU memory budget."""
+
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class ModelBudgetExceeded(RuntimeError):
+    """Raised when a model cannot fit in the GPU memory budget."""
+
+
+class ModelRegistry:
+    """Loads models lazily and evicts the least recently used ones.
+
+    Each model costs a fraction of GPU memory (`cost_fn`), and resident plus
+    loading models must fit within `budget`, less any `reserved` fraction held
+    by models managed elsewhere. Models in use by a request are never evicted.
+    Concurrent requests for a model that is still loading share one load.
+    """
+
+    def __init__(
+        self,
+        load_fn: Callable[[str], Awaitable[Any]],
+        cost_fn: Callable[[str], float],
+        budget: float,
+        unload_fn: Optional[Callable[[str, Any], None]] = None,
+        reserved: float = 0.0,
+    ):
+        """Initializes an empty registry."""
+        self.load_fn = load_fn
+        self.cost_fn = cost_fn
+        self.budget = budget
+        self.unload_fn = unload_fn
+        self.reserved = reserved
+
+        self.loads = 0
+        self.evictions = 0
+
+        self._models: OrderedDict[str, Any] = OrderedDict()  # LRU first
+        self._costs: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    @property
+    def used(self) -> float:
+        """GPU memory fraction held by reserved, resident and loading models."""
+        return self.reserved + sum(self._costs.values())
+
+    def __contains__(self, name: str) -> bool:
+        """Returns whether a model is resident."""
+        return name in self._models
+
+    async def acquire(self, name: str) -> Any:
+        """Returns a model, loading it first if needed, and pins it until release.
+
+        Raises ModelBudgetExceeded if it cannot fit even after evicting every
+        idle model.
+        """
+        while name not in self._models:
+            task = self._loading.get(name)
+            if task is None:
+                self._make_room(name)
+                task = asyncio.ensure_future(self._load(name))
+                self._loading[name] = task
+            # Shielded so a cancelled request does not abort a load others share
+            await asyncio.shield(task)
+
+        self._models.move_to_end(name)
+        self._in_use[name] = self._in_use.get(name, 0) + 1
+        return self._models[name]
+
+    def release(self, name: str):
+        """Unpins a model acquired with `acquire`."""
+        self._in_use[name] -= 1
+        if not self._in_use[name]:
+            del self._in_use[name]
+
+    @asynccontextmanager
+    async def use(self, name: str) -> AsyncIterator[Any]:
+        """Acquires a model for the duration of the block."""
+        model = await self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def evict(self, name: str):
+        """Unloads a resident model."""
+        model = self._models.pop(name)
+        del self._costs[name]
+        self.evictions += 1
+        if self.unload_fn is not None:
+            self.unload_fn(name, model)
+
+    def models(self) -> List[Dict[str, Any]]:
+        """Describes resident and loading models, least recently used first."""
+        names = list(self._models) + [n for n in self._loading if n not in self]
+        return [
+            {
+                "name": name,
+                "status": "resident" if name in self._models else "loading",
+                "gpu_util": self._costs[name],
+                "in_use": self._in_use.get(name, 0),
+            }
+            for name in names
+        ]
+
+    def _make_room(self, name: str):
+        """Reserves budget for a model, evicting idle models LRU-first.
+
+        Nothing is evicted if the model would not fit even with every idle
+        model gone.
+        """
+        cost = self.cost_fn(name)
+        idle = [m for m in self._models if not self._in_use.get(m)]
+        pinned = self.used - sum(self._costs[m] for m in idle)
+        if pinned + cost > self.budget:
+            raise ModelBudgetExceeded(
+                f"Model {name} needs {cost:.2f} of GPU memory but at most "
+                f"{self.budget - pinned:.2f} of {self.budget:.2f} can be freed"
+            )
+
+        for resident in idle:
+            if self.used + cost <= self.budget:
+                break
+            self.evict(resident)
+        self._costs[name] = cost
+
+    async def _load(self, name: str):
+        """Loads a model whose budget has been reserved."""
+        try:
+            model = await self.load_fn(name)
+        except BaseException:
+            del self._costs[name]
+            raise
+        finally:
+            del self._loading[name]
+        self._models[name] = model
+        self.loads += 1
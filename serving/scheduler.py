@@ -0,0 +1,156 @@
+"""Scheduling policies deciding which waiting request gets the next slot."""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+POLICIES = ("fifo", "sjf", "edf", "priority")
+
+
+@dataclass
+class Job:
+    """What the scheduler knows about a request waiting for a slot."""
+
+    cost: float = 0.0  # Expected tokens: prompt plus expected output
+    deadline: float = math.inf  # time.monotonic() by which it should finish
+    priority: str = "interactive"  # Priority class, see Scheduler.priorities
+
+
+# The job that slots requested by the current task are scheduled as
+current_job: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+
+@contextmanager
+def scheduled_as(job: Job) -> Iterator[Job]:
+    """Schedules slots requested within the block (and its tasks) as `job`."""
+    token = current_job.set(job)
+    try:
+        yield job
+    finally:
+        current_job.reset(token)
+
+
+class OutputLengthEstimator:
+    """Tracks a moving average of output tokens per route."""
+
+    def __init__(self, alpha: float = 0.2):
+        """Initializes the estimator; `alpha` weighs the newest observation."""
+        self.alpha = alpha
+        self._averages: Dict[str, float] = {}
+
+    def record(self, route: str, tokens: int):
+        """Records the output length of a finished request."""
+        average = self._averages.get(route)
+        if average is None:
+            self._averages[route] = float(tokens)
+        else:
+            self._averages[route] = (1 - self.alpha) * average + self.alpha * tokens
+
+    def estimate(self, route: str, default: float) -> float:
+        """Returns the expected output tokens for a route."""
+        return self._averages.get(route, default)
+
+
+class Scheduler:
+    """Limits concurrent work to `capacity` slots, granted in policy order.
+
+    - fifo: arrival order.
+    - sjf: shortest expected job (`Job.cost`) first.
+    - edf: earliest `Job.deadline` first; jobs without one go last.
+    - priority: by the job's position in `priorities`, FIFO within a class.
+
+    Ties are broken by arrival. `on_wait(priority, seconds)` is called with
+    each job's queue time once it gets a slot.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        policy: str = "fifo",
+        priorities: Sequence[str] = ("interactive", "batch"),
+        on_wait: Optional[Callable[[str, float], None]] = None,
+    ):
+        """Initializes the scheduler with all slots free."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+
+        self.capacity = capacity
+        self.policy = policy
+        self.priorities = list(priorities)
+        self.on_wait = on_wait
+        self.in_use = 0
+
+        self._waiters: List[tuple] = []
+        self._arrivals = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def waiting(self) -> int:
+        """Returns the number of jobs waiting for a slot."""
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _key(self, job: Job) -> tuple:
+        """Returns the sort key of a job under the policy."""
+        if self.policy == "sjf":
+            return (job.cost,)
+        if self.policy == "edf":
+            return (job.deadline,)
+        if self.policy == "priority":
+            if job.priority in self.priorities:
+                return (self.priorities.index(job.priority),)
+            return (len(self.priorities),)
+        return ()
+
+    def _bind_loop(self):
+        """Resets the slots when used from a new event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters = []
+            self.in_use = 0
+
+    async def acquire(self, job: Optional[Job] = None):
+        """Waits for a slot; the caller must call release() afterwards."""
+        self._bind_loop()
+        job = job or current_job.get() or Job()
+        t_0 = time.perf_counter()
+        if self.in_use < self.capacity and not self.waiting:
+            self.in_use += 1
+        else:
+            future = self._loop.create_future()
+            entry = (*self._key(job), next(self._arrivals), future)
+            heapq.heappush(self._waiters, entry)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()  # Handed a slot just as it was cancelled
+                raise
+        if self.on_wait is not None:
+            self.on_wait(job.priority, time.perf_counter() - t_0)
+
+    def release(self):
+        """Frees a slot, handing it to the next waiting job if there is one."""
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[-1]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    @asynccontextmanager
+    async def slot(self, job: Optional[Job] = None) -> AsyncIterator[None]:
+        """Holds a slot, scheduled as `job` or else the task's current job."""
+        await self.acquire(job)
+        try:
+            yield
+        finally:
+            self.release()
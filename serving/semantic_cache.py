@@ -0,0 +1,123 @@
+"""Semantic response cache keyed by prompt embeddings."""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """Bounded cache returning responses for prompts with similar embeddings.
+
+    Embeddings are stored unit-normalized in one preallocated float32 matrix, so
+    a lookup is a single matrix-vector product followed by an argmax. When full,
+    the least recently used entry is overwritten.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        """Initializes an empty cache with a cosine similarity threshold."""
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if not -1.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be a cosine similarity in [-1, 1]")
+
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._hit_similarity_total = 0.0
+
+        self._vectors: Optional[np.ndarray] = None  # Allocated on first add
+        self._responses: List[Any] = []
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Any) -> np.ndarray:
+        """Returns the vector as a unit-length float32 array."""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _touch(self, index: int):
+        """Marks an entry as most recently used."""
+        self._clock += 1
+        self._last_used[index] = self._clock
+
+    def lookup(self, vector: Any) -> Optional[Tuple[Any, float]]:
+        """Returns (response, similarity) for the nearest entry above threshold."""
+        query = self._normalize(vector)
+        with self._lock:
+            size = len(self._responses)
+            if size == 0 or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors[:size] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self._touch(best)
+            self.hits += 1
+            self._hit_similarity_total += similarity
+            return self._responses[best], similarity
+
+    def add(self, vector: Any, response: Any):
+        """Caches a response under the embedding of the prompt that produced it."""
+        query = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.max_entries, query.shape[0]), dtype=np.float32
+                )
+            elif self._vectors.shape[1] != query.shape[0]:
+                raise ValueError(
+                    f"Expected embedding of size {self._vectors.shape[1]}, "
+                    f"got {query.shape[0]}"
+                )
+
+            if len(self._responses) < self.max_entries:
+                index = len(self._responses)
+                self._responses.append(response)
+            else:
+                index = int(np.argmin(self._last_used))
+                self._responses[index] = response
+                self.evictions += 1
+
+            self._vectors[index] = query
+            self._touch(index)
+
+    def clear(self):
+        """Removes all entries and resets statistics."""
+        with self._lock:
+            self._responses = []
+            self._last_used[:] = 0
+            self.hits = self.misses = self.evictions = 0
+            self._hit_similarity_total = 0.0
+
+    def __len__(self) -> int:
+        """Returns the number of cached responses."""
+        return len(self._responses)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns cache size, hit/miss counts and mean hit similarity."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._responses),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "mean_hit_similarity": (
+                    self._hit_similarity_total / self.hits if self.hits else None
+                ),
+            }
@@ -0,0 +1,147 @@
+"""Bounded store of conversation histories keyed by session id."""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from text_processing import TextProcessing as tp
+
+
+class Turn(NamedTuple):
+    """One exchange of a conversation, with its token count cached."""
+
+    human: str
+    ai: str
+    tokens: int
+
+
+class Session:
+    """A conversation's turns and their running token total."""
+
+    def __init__(self, turns: Optional[List[Turn]] = None):
+        """Initializes a session, empty unless given its turns."""
+        self.turns = turns or []
+        self.tokens = sum(turn.tokens for turn in self.turns)
+
+
+class SessionStore:
+    """Thread-safe LRU of conversations with a token budget per session.
+
+    Each turn's tokens are counted once, when it is added, so trimming a
+    session to `max_tokens` (oldest turns first, always keeping the newest)
+    never re-tokenizes its history. Sessions beyond `max_sessions` are evicted
+    least recently used first: dropped, or with a `spill_path`, written to a
+    SQLite file and read back when the session is next used.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1024,
+        max_tokens: int = 2048,
+        spill_path: Optional[str] = None,
+        count_tokens: Callable[[str], int] = tp.estimate_tokens,
+    ):
+        """Initializes an empty store."""
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1")
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be at least 1")
+
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+
+        self.evictions = 0
+        self.spills = 0
+        self.restores = 0
+
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if spill_path is not None:
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, turns TEXT)"
+            )
+
+    def _get(self, session_id: str) -> Optional[Session]:
+        """Returns a session, restoring it from the spill file if needed."""
+        session = self._sessions.get(session_id)
+        if session is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT turns FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._db.commit()
+                session = Session([Turn(*turn) for turn in json.loads(row[0])])
+                self._sessions[session_id] = session
+                self.restores += 1
+                self._evict()
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self):
+        """Evicts least recently used sessions beyond max_sessions."""
+        while len(self._sessions) > self.max_sessions:
+            session_id, session = self._sessions.popitem(last=False)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?)",
+                    (session_id, json.dumps(session.turns)),
+                )
+                self._db.commit()
+                self.spills += 1
+
+    def history(self, session_id: str) -> List[Turn]:
+        """Returns a session's turns, oldest first (empty for a new session)."""
+        with self._lock:
+            session = self._get(session_id)
+            return list(session.turns) if session is not None else []
+
+    def append(self, session_id: str, human: str, ai: str):
+        """Adds a turn to a session, trimming its oldest turns to fit the budget."""
+        turn = Turn(human, ai, self.count_tokens(human) + self.count_tokens(ai))
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session()
+            session.turns.append(turn)
+            session.tokens += turn.tokens
+            while session.tokens > self.max_tokens and len(session.turns) > 1:
+                session.tokens -= session.turns.pop(0).tokens
+            self._evict()
+
+    def clear(self, session_id: str):
+        """Forgets a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._db.commit()
+
+    def __len__(self) -> int:
+        """Returns the number of sessions held in memory."""
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns session counts and eviction statistics."""
+        with self._lock:
+            spilled = 0
+            if self._db is not None:
+                (spilled,) = self._db.execute(
+                    "SELECT COUNT(*) FROM sessions"
+                ).fetchone()
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_tokens": self.max_tokens,
+                "tokens": sum(s.tokens for s in self._sessions.values()),
+                "spilled": spilled,
+                "evictions": self.evictions,
+                "restores": self.restores,
+            }
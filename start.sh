@@ -6,5 +6,6 @@ export $(grep -v '^#' .env | xargs)
 # Activate the virtual environment
 source /opt/venv/bin/activate
 
-# Run FastAPI server for llm_server
-uvicorn llm_server:app --host 0.0.0.0 --port 8888
+# Run FastAPI server for llm_server. exec makes uvicorn PID 1 so it receives
+# SIGTERM on container stop and can drain in-flight requests
+exec uvicorn llm_server:app --host 0.0.0.0 --port 8888
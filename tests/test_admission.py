@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+
+from serving.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    """Unit tests for AdmissionController."""
+
+    def setUp(self):
+        """Creates a small controller before each test."""
+        self.admission = AdmissionController(
+            max_queue_depth=2, max_queued_tokens=100, concurrency=1
+        )
+
+    def test_admit_and_release(self):
+        """Tests that tickets hold and then return their capacity."""
+        ticket = self.admission.admit(30)
+        self.assertEqual((self.admission.depth, self.admission.tokens), (1, 30))
+
+        ticket.release()
+        ticket.release()  # Releasing twice is harmless
+        self.assertEqual((self.admission.depth, self.admission.tokens), (0, 0))
+
+    def test_rejects_over_queue_depth(self):
+        """Tests that requests beyond the queue depth are rejected."""
+        self.admission.admit(1)
+        self.admission.admit(1)
+        with self.assertRaises(AdmissionRejected) as cm:
+            self.admission.admit(1)
+        self.assertIn("queue depth", cm.exception.reason)
+        self.assertEqual(self.admission.rejected, 1)
+
+    def test_rejects_over_queued_tokens(self):
+        """Tests that requests beyond the token budget are rejected."""
+        self.admission.admit(80)
+        with self.assertRaises(AdmissionRejected) as cm:
+            self.admission.admit(30)
+        self.assertIn("queued tokens", cm.exception.reason)
+
+    def test_idle_admits_oversized_request(self):
+        """Tests that a request larger than the budget is admitted when idle."""
+        with self.admission.admit(500, requests=5):
+            self.assertEqual(self.admission.depth, 5)
+        self.assertEqual(self.admission.depth, 0)
+
+    def test_oversized(self):
+        """Tests that work beyond the limits on its own is reported."""
+        self.assertIsNone(self.admission.oversized(100, requests=2))
+        self.assertIn("requests", self.admission.oversized(1, requests=3))
+        self.assertIn("tokens", self.admission.oversized(101))
+
+    def test_retry_after_scales_with_backlog(self):
+        """Tests that Retry-After grows with queued work and observed latency."""
+        self.admission.avg_latency = 3.0
+        self.admission.admit(1)
+        self.assertEqual(self.admission.retry_after(), 3)
+        self.admission.admit(1)
+        with self.assertRaises(AdmissionRejected) as cm:
+            self.admission.admit(1)
+        self.assertEqual(cm.exception.retry_after, 6)
+
+    @patch("serving.admission.time.monotonic")
+    def test_release_updates_latency(self, mock_monotonic):
+        """Tests that finished requests update the latency estimate."""
+        mock_monotonic.side_effect = [0.0, 6.0]
+        self.admission.admit(1).release()
+        self.assertAlmostEqual(self.admission.avg_latency, 0.8 * 1.0 + 0.2 * 6.0)
+
+    def test_invalid_limits(self):
+        """Tests that non-positive limits are rejected."""
+        with self.assertRaises(ValueError):
+            AdmissionController(max_queue_depth=0, max_queued_tokens=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from serving.backends import AsyncEngineBackend
+from serving.fake_engine import FakeEngine, LatencyModel, SamplingParams
+
+
+class TestAsyncEngineBackend(unittest.TestCase):
+    """Unit tests for AsyncEngineBackend driving the fake engine."""
+
+    def setUp(self):
+        """Creates a backend around a fake engine with a small token delay."""
+        self.engine = FakeEngine(LatencyModel(decode_ms_per_token=5))
+        self.backend = AsyncEngineBackend(
+            self.engine, SamplingParams, defaults={"max_tokens": 4}
+        )
+
+    def test_generate(self):
+        """Tests that generate returns the full completion."""
+        text = asyncio.run(self.backend.generate("one two"))
+        self.assertEqual(text, " one two one two")
+        self.assertEqual(self.backend.in_flight, 0)
+
+    def test_per_request_params(self):
+        """Tests that request parameters override the backend defaults."""
+        text = asyncio.run(self.backend.generate("a b c", max_tokens=6, stop=[" c"]))
+        self.assertEqual(text, " a b")
+
+    def test_stream(self):
+        """Tests that stream yields only the newly decoded text at each step."""
+
+        async def main():
+            return [chunk async for chunk in self.backend.stream("hi", max_tokens=3)]
+
+        self.assertEqual(asyncio.run(main()), [" hi", " hi", " hi"])
+
+    def test_concurrent_requests_interleave(self):
+        """Tests that concurrent requests run on the engine at the same time."""
+
+        async def main():
+            return await asyncio.gather(
+                *(self.backend.generate(f"p{i}") for i in range(5))
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual(results[3], " p3 p3 p3 p3")
+        self.assertEqual(self.engine.peak_running, 5)
+
+    def test_cancelled_request_is_aborted(self):
+        """Tests that a cancelled request is aborted on the engine."""
+
+        async def main():
+            task = asyncio.ensure_future(self.backend.generate("x", max_tokens=100))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.02)
+
+        asyncio.run(main())
+        self.assertEqual(self.engine.num_aborts, 1)
+        self.assertEqual(self.engine.aborted, set())
+        self.assertEqual(self.engine.running, 0)
+        self.assertEqual(self.backend.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from serving.batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Unit tests for MicroBatcher."""
+
+    def setUp(self):
+        """Creates a batcher that records every batch it generates."""
+        self.batches = []
+        self.batcher = MicroBatcher(
+            generate_fn=self.generate, max_batch_size=4, max_wait_ms=50
+        )
+
+    def tearDown(self):
+        """Stops the batching thread after each test."""
+        self.batcher.close()
+
+    def generate(self, prompts):
+        """Fake batched generation that echoes each prompt."""
+        self.batches.append(list(prompts))
+        return [f"out:{prompt}" for prompt in prompts]
+
+    def test_single_prompt(self):
+        """Tests that a lone prompt is flushed after the wait window."""
+        self.assertEqual(self.batcher("hello"), "out:hello")
+        self.assertEqual(self.batches, [["hello"]])
+
+    def test_concurrent_prompts_share_batch(self):
+        """Tests that concurrent prompts are generated in one batch."""
+        futures = [self.batcher.submit(f"p{i}") for i in range(3)]
+        results = [future.result(timeout=1) for future in futures]
+
+        self.assertEqual(results, ["out:p0", "out:p1", "out:p2"])
+        self.assertEqual(self.batches, [["p0", "p1", "p2"]])
+        self.assertEqual(self.batcher.num_batches, 1)
+        self.assertEqual(self.batcher.num_prompts, 3)
+
+    def test_map(self):
+        """Tests that map batches several prompts and keeps their order."""
+        self.assertEqual(self.batcher.map(["a", "b"]), ["out:a", "out:b"])
+        self.assertEqual(self.batches, [["a", "b"]])
+
+    def test_max_batch_size(self):
+        """Tests that batches never exceed max_batch_size."""
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(self.batcher, [f"p{i}" for i in range(10)]))
+
+        self.assertEqual(results, [f"out:p{i}" for i in range(10)])
+        self.assertTrue(all(len(batch) <= 4 for batch in self.batches))
+        self.assertEqual(sum(len(batch) for batch in self.batches), 10)
+
+    def test_batches_grouped_by_params(self):
+        """Tests that prompts with different parameters get separate calls."""
+        calls = []
+
+        def generate(prompts, **params):
+            calls.append((list(prompts), params))
+            return [f"{prompt}:{params.get('max_tokens')}" for prompt in prompts]
+
+        batcher = MicroBatcher(generate_fn=generate, max_batch_size=4, max_wait_ms=50)
+        futures = [
+            batcher.submit("a"),
+            batcher.submit("b", max_tokens=5, stop=["\n"]),
+            batcher.submit("c"),
+            batcher.submit("d", max_tokens=5, stop=["\n"]),
+        ]
+        results = [future.result(timeout=1) for future in futures]
+        batcher.close()
+
+        self.assertEqual(results, ["a:None", "b:5", "c:None", "d:5"])
+        self.assertEqual(
+            calls,
+            [(["a", "c"], {}), (["b", "d"], {"max_tokens": 5, "stop": ["\n"]})],
+        )
+
+    def test_exception_propagates_to_batch(self):
+        """Tests that a failed batch fails every caller in it."""
+        batcher = MicroBatcher(
+            generate_fn=lambda prompts: 1 / 0, max_batch_size=2, max_wait_ms=50
+        )
+        futures = [batcher.submit("a"), batcher.submit("b")]
+        for future in futures:
+            with self.assertRaises(ZeroDivisionError):
+                future.result(timeout=1)
+        batcher.close()
+
+    def test_output_count_mismatch(self):
+        """Tests that a batch returning the wrong number of outputs errors."""
+        batcher = MicroBatcher(generate_fn=lambda prompts: [], max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            batcher("a")
+        batcher.close()
+
+    def test_cancelled_prompts_skipped(self):
+        """Tests that prompts cancelled before their batch runs are dropped."""
+        gate = threading.Event()
+
+        def blocking_generate(prompts):
+            gate.wait(timeout=1)
+            return self.generate(prompts)
+
+        batcher = MicroBatcher(blocking_generate, max_batch_size=1, max_wait_ms=0)
+        first = batcher.submit("first")
+        time.sleep(0.05)  # lets the first batch start
+        second = batcher.submit("second")
+        second.cancel()
+        gate.set()
+
+        self.assertEqual(first.result(timeout=1), "out:first")
+        batcher.close()
+        self.assertEqual(self.batches, [["first"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from serving.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Unit tests for ResponseCache."""
+
+    def setUp(self):
+        """Creates a small cache before each test."""
+        self.cache = ResponseCache(max_entries=2, ttl_seconds=10)
+
+    def test_get_miss_then_hit(self):
+        """Tests that a stored response is returned on the next lookup."""
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.put("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used entry is evicted when full."""
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")  # "b" is now least recently used
+        self.cache.put("c", 3)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    @patch("serving.cache.time.monotonic")
+    def test_ttl_expiry(self, mock_monotonic):
+        """Tests that entries expire after ttl_seconds."""
+        mock_monotonic.return_value = 100.0
+        self.cache.put("key", "value")
+
+        mock_monotonic.return_value = 109.0
+        self.assertEqual(self.cache.get("key"), "value")
+
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_make_key_normalizes_prompt(self):
+        """Tests that keys ignore whitespace differences but not params."""
+        key = ResponseCache.make_key("What is  2+2?\n", temperature=0.0)
+        self.assertEqual(key, ResponseCache.make_key(" What is 2+2?", temperature=0.0))
+        self.assertNotEqual(key, ResponseCache.make_key("What is 2+2?", temperature=1))
+
+    def test_clear(self):
+        """Tests that clear drops entries and statistics."""
+        self.cache.put("key", "value")
+        self.cache.get("key")
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -55,6 +55,14 @@ class TestClient(unittest.TestCase):
         self.assertIn("Mocked LLM response", result["text"])
         self.assertIsInstance(result, dict)
 
+    @patch("requests.post", side_effect=mock_post)
+    def test_generate_text_timeout(self, mock_post):
+        """Tests that generate_text sends its timeout to the server too."""
+        client.Client.generate_text("Test prompt", timeout=5.0)
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs["json"]["timeout"], 5.0)
+        self.assertEqual(kwargs["timeout"], 5.0)
+
     @patch("requests.post", side_effect=Exception("API request failed"))
     def test_generate_text_failure(self, mock_post):
         """Tests generate_text method with a failed API request."""
@@ -62,6 +70,48 @@ class TestClient(unittest.TestCase):
             client.Client.generate_text("Test prompt")
         self.assertTrue("API request failed" in str(context.exception))
 
+    @patch("requests.post")
+    def test_generate_batch_success(self, mock_post):
+        """Tests generate_batch yields each NDJSON result as it streams in."""
+        mock_post.return_value.iter_lines.return_value = [
+            b'{"index": 1, "text": "second"}',
+            b"",
+            b'{"index": 0, "text": "first"}',
+        ]
+
+        results = list(client.Client.generate_batch(["Prompt one", "Prompt two"]))
+
+        self.assertEqual(
+            results,
+            [{"index": 1, "text": "second"}, {"index": 0, "text": "first"}],
+        )
+        self.assertEqual(
+            mock_post.call_args.kwargs["json"],
+            {"texts": ["Prompt one.", "Prompt two."]},
+        )
+
+    @patch("requests.post")
+    def test_generate_batch_params(self, mock_post):
+        """Tests that generate_batch sends its timeout and sampling params."""
+        mock_post.return_value.iter_lines.return_value = []
+        list(client.Client.generate_batch(["Prompt"], timeout=5.0, max_tokens=8))
+
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs["json"]["timeout"], 5.0)
+        self.assertEqual(kwargs["json"]["max_tokens"], 8)
+        self.assertEqual(kwargs["timeout"], 5.0)
+
+    @patch("requests.post")
+    def test_generate_batch_rejected(self, mock_post):
+        """Tests generate_batch raises when the server rejects the batch."""
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(
+            "429 Client Error: Too Many Requests"
+        )
+
+        with self.assertRaises(requests.HTTPError):
+            list(client.Client.generate_batch(["Prompt"]))
+        mock_post.return_value.iter_lines.assert_not_called()
+
     @patch("builtins.input")
     @patch("client.Client.generate_text")
     def test_main_loop(self, mock_generate_text, mock_input):
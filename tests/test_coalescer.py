@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from serving.coalescer import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Unit tests for SingleFlight."""
+
+    def setUp(self):
+        """Creates a coalescer and a slow call that counts its runs."""
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    async def work(self, result="done"):
+        """Slow call that records each time it runs."""
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return result
+
+    def test_identical_calls_share_one_run(self):
+        """Tests that concurrent calls with one key run once and share the result."""
+
+        async def main():
+            return await asyncio.gather(
+                *(self.flight.run("k", self.work) for _ in range(5)),
+                self.flight.run("other", lambda: self.work("other")),
+            )
+
+        results = asyncio.run(main())
+        self.assertEqual(results, ["done"] * 5 + ["other"])
+        self.assertEqual(self.calls, 2)
+        self.assertEqual((self.flight.leaders, self.flight.followers), (2, 4))
+        self.assertEqual(len(self.flight), 0)
+
+    def test_sequential_calls_run_again(self):
+        """Tests that a call arriving after the previous one finished runs anew."""
+
+        async def main():
+            await self.flight.run("k", self.work)
+            await self.flight.run("k", self.work)
+
+        asyncio.run(main())
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.flight.stats()["coalesced_ratio"], 0.0)
+
+    def test_errors_are_shared(self):
+        """Tests that every waiting caller sees the call's exception."""
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("engine failed")
+
+        async def main():
+            return await asyncio.gather(
+                *(self.flight.run("k", fail) for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    def test_cancelling_one_caller_keeps_the_call(self):
+        """Tests that the call continues while any caller still awaits it."""
+
+        async def main():
+            leader = asyncio.ensure_future(self.flight.run("k", self.work))
+            follower = asyncio.ensure_future(self.flight.run("k", self.work))
+            await asyncio.sleep(0.005)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), "done")
+        self.assertEqual(self.calls, 1)
+
+    def test_cancelling_every_caller_cancels_the_call(self):
+        """Tests that the call is cancelled once nobody awaits it."""
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.append(True)
+
+        async def main():
+            callers = [
+                asyncio.ensure_future(self.flight.run("k", work)) for _ in range(2)
+            ]
+            await asyncio.sleep(0.005)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.sleep(0.08)
+
+        asyncio.run(main())
+        self.assertEqual(finished, [])
+        self.assertEqual(len(self.flight), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
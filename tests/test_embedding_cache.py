@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from serving.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Unit tests for EmbeddingCache."""
+
+    def setUp(self):
+        """Creates a small cache and an encoder embedding texts by length."""
+        self.cache = EmbeddingCache(max_entries=2)
+        self.encoder = MagicMock(side_effect=lambda docs: [[len(d), 1] for d in docs])
+
+    def test_normalized_prompts_share_entry(self):
+        """Tests that prompts differing in whitespace are encoded once."""
+        first = self.cache.encode(["what time is it?"], self.encoder)[0]
+        second = self.cache.encode(["  what time\nis  it? "], self.encoder)[0]
+
+        self.assertIs(first, second)
+        self.encoder.assert_called_once_with(["what time is it?"])
+        self.assertEqual(self.cache.stats()["hit_ratio"], 0.5)
+
+    def test_misses_encoded_in_one_call(self):
+        """Tests that only uncached prompts reach the encoder, batched."""
+        self.cache.encode(["a"], self.encoder)
+        vectors = self.cache.encode(["a", "bb", "ccc"], self.encoder)
+
+        self.encoder.assert_called_with(["bb", "ccc"])
+        self.assertEqual([v[0] for v in vectors], [1, 2, 3])
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used embedding is evicted."""
+        self.cache.encode(["a", "b"], self.encoder)
+        self.cache.get("a")
+        self.cache.encode(["c"], self.encoder)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_cached_vectors_read_only(self):
+        """Tests that shared vectors cannot be modified in place."""
+        vector = self.cache.put("a", [1.0, 2.0])
+        self.assertEqual(vector.dtype, np.float32)
+        with self.assertRaises(ValueError):
+            vector[0] = 0.0
+
+
+if __name__ == "__main__":
+    unittest.main()
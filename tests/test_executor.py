@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from serving.executor import InferenceExecutor
+
+
+class TestInferenceExecutor(unittest.TestCase):
+    """Unit tests for InferenceExecutor."""
+
+    def setUp(self):
+        """Creates a small executor before each test."""
+        self.executor = InferenceExecutor(num_workers=2, max_in_flight=2)
+
+    def tearDown(self):
+        """Shuts down the worker pool after each test."""
+        self.executor.shutdown()
+
+    def test_run_returns_result(self):
+        """Tests that run returns the result of the blocking call."""
+        result = asyncio.run(self.executor.run(lambda x, y=1: x + y, 2, y=3))
+        self.assertEqual(result, 5)
+
+    def test_run_off_event_loop_thread(self):
+        """Tests that blocking calls do not run on the event loop thread."""
+
+        async def main():
+            loop_thread = threading.get_ident()
+            worker_thread = await self.executor.run(threading.get_ident)
+            return loop_thread, worker_thread
+
+        loop_thread, worker_thread = asyncio.run(main())
+        self.assertNotEqual(loop_thread, worker_thread)
+
+    def test_event_loop_stays_responsive(self):
+        """Tests that the event loop keeps ticking during a slow blocking call."""
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(ticker())
+            await self.executor.run(time.sleep, 0.2)
+            task.cancel()
+            return ticks
+
+        self.assertGreater(asyncio.run(main()), 5)
+
+    def test_in_flight_limit(self):
+        """Tests that no more than max_in_flight calls run concurrently."""
+        lock = threading.Lock()
+        active, peak = 0, 0
+
+        def work():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        async def main():
+            await asyncio.gather(*(self.executor.run(work) for _ in range(6)))
+
+        asyncio.run(main())
+        self.assertLessEqual(peak, 2)
+        self.assertEqual(self.executor.in_flight, 0)
+
+    def test_cancelled_queued_work_is_skipped(self):
+        """Tests that cancelling a call still waiting for a slot never runs it."""
+        release = threading.Event()
+        calls = []
+
+        async def main():
+            blockers = [
+                asyncio.ensure_future(self.executor.run(release.wait)) for _ in range(2)
+            ]
+            queued = asyncio.ensure_future(self.executor.run(calls.append, "ran"))
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.executor.waiting, 1)
+            queued.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.executor.waiting, 0)
+            release.set()
+            await asyncio.gather(*blockers)
+
+        asyncio.run(main())
+        self.assertEqual(calls, [])
+
+    def test_cancelled_running_work_keeps_slot(self):
+        """Tests that a cancelled call holds its slot until the worker finishes."""
+        release = threading.Event()
+
+        async def main():
+            task = asyncio.ensure_future(self.executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.executor.in_flight, 1)
+            release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertEqual(self.executor.in_flight, 0)
+
+        asyncio.run(main())
+
+    def test_run_unscheduled_takes_no_slot(self):
+        """Tests that run_unscheduled runs on the pool without a slot."""
+
+        async def main():
+            return await self.executor.run_unscheduled(
+                lambda: (threading.current_thread().name, self.executor.in_flight)
+            )
+
+        name, in_flight = asyncio.run(main())
+        self.assertTrue(name.startswith("llm-worker"))
+        self.assertEqual(in_flight, 0)
+
+    def test_stream_yields_items(self):
+        """Tests that stream yields each item produced by the worker."""
+
+        async def main():
+            return [item async for item in self.executor.stream(iter, "abc")]
+
+        self.assertEqual(asyncio.run(main()), ["a", "b", "c"])
+
+    def test_stream_raises_worker_error(self):
+        """Tests that stream re-raises errors from the worker iterator."""
+
+        def failing():
+            yield "a"
+            raise ValueError("boom")
+
+        async def main():
+            return [item async for item in self.executor.stream(failing)]
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+
+    def test_stream_stops_worker_when_closed(self):
+        """Tests that closing the stream early stops the worker iterating."""
+        produced = []
+
+        def counter():
+            for i in range(100):
+                produced.append(i)
+                time.sleep(0.01)
+                yield i
+
+        async def main():
+            chunks = self.executor.stream(counter)
+            first = await chunks.__anext__()
+            await chunks.aclose()
+            await asyncio.sleep(0.1)
+            return first
+
+        self.assertEqual(asyncio.run(main()), 0)
+        self.assertLess(len(produced), 100)
+
+    def test_closed_stream_keeps_slot(self):
+        """Tests that a stream closed early holds its slot until the worker stops."""
+        release = threading.Event()
+
+        def blocking():
+            yield "a"
+            release.wait()
+            yield "b"
+
+        async def main():
+            chunks = self.executor.stream(blocking)
+            await chunks.__anext__()
+            closing = asyncio.ensure_future(chunks.aclose())
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.executor.in_flight, 1)
+            release.set()
+            await closing
+            self.assertEqual(self.executor.in_flight, 0)
+
+        asyncio.run(main())
+
+    def test_closed_stream_logs_worker_error(self):
+        """Tests that a worker error after the stream is closed is logged."""
+        release = threading.Event()
+
+        def failing():
+            yield "a"
+            release.wait()
+            raise ValueError("boom")
+
+        async def main():
+            chunks = self.executor.stream(failing)
+            await chunks.__anext__()
+            closing = asyncio.ensure_future(chunks.aclose())
+            await asyncio.sleep(0.05)
+            release.set()
+            await closing
+
+        with self.assertLogs(level="WARNING") as logs:
+            asyncio.run(main())
+        self.assertIn("boom", logs.output[0])
+
+    def test_invalid_sizes(self):
+        """Tests that non-positive sizes are rejected."""
+        with self.assertRaises(ValueError):
+            InferenceExecutor(num_workers=0, max_in_flight=1)
+        with self.assertRaises(ValueError):
+            InferenceExecutor(num_workers=1, max_in_flight=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
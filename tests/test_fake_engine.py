@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+
+from serving.fake_engine import FakeEngine, LatencyModel, SamplingParams, SimulatedLLM
+
+
+class TestLatencyModel(unittest.TestCase):
+    """Unit tests for LatencyModel."""
+
+    def test_prefill_and_decode_costs(self):
+        """Tests the per-token prefill cost and the batch scaling curve."""
+        latency = LatencyModel(
+            prefill_ms_per_token=2.0, decode_ms_per_token=10.0, batch_exponent=0.5
+        )
+        self.assertAlmostEqual(latency.prefill_time(50), 0.1)
+        self.assertAlmostEqual(latency.step_time(1), 0.01)
+        self.assertAlmostEqual(latency.step_time(4), 0.02)
+
+    def test_jitter_is_bounded_and_seeded(self):
+        """Tests that jitter stays within bounds and repeats for the same seed."""
+        latency = LatencyModel(jitter=0.1, seed=7)
+        first = [latency.noise(latency.rng("prompt")) for _ in range(3)]
+        self.assertEqual(first, [latency.noise(latency.rng("prompt"))] * 3)
+
+        rng = latency.rng("prompt")
+        for _ in range(100):
+            self.assertTrue(0.9 <= latency.noise(rng) <= 1.1)
+        self.assertEqual(LatencyModel().noise(rng), 1.0)
+
+
+class TestFakeEngine(unittest.TestCase):
+    """Unit tests for FakeEngine timing."""
+
+    def test_batched_requests_share_decode_steps(self):
+        """Tests that concurrent requests decode together, not one after another."""
+        engine = FakeEngine(LatencyModel(decode_ms_per_token=10.0))
+
+        async def generate(prompt):
+            params = SamplingParams(max_tokens=5)
+            async for output in engine.generate(prompt, params, prompt):
+                pass
+            return output.outputs[0].text
+
+        async def main():
+            return await asyncio.gather(*(generate(f"p{i}") for i in range(8)))
+
+        t_0 = time.perf_counter()
+        results = asyncio.run(main())
+        elapsed = time.perf_counter() - t_0
+        self.assertEqual(results[0], " p0 p0 p0 p0 p0")
+        self.assertLess(elapsed, 8 * 5 * 0.01)
+
+    def test_abort_forgets_request(self):
+        """Tests that an aborted request stops and its id is not kept."""
+        engine = FakeEngine(LatencyModel(decode_ms_per_token=1.0))
+
+        async def main():
+            outputs = []
+            params = SamplingParams(max_tokens=50)
+            async for output in engine.generate("p", params, "r1"):
+                outputs.append(output)
+                await engine.abort("r1")
+            await engine.abort("r1")  # Already finished
+            return outputs
+
+        self.assertEqual(len(asyncio.run(main())), 1)
+        self.assertEqual(engine.aborted, set())
+        self.assertEqual(engine.num_aborts, 2)
+
+
+class TestSimulatedLLM(unittest.TestCase):
+    """Unit tests for SimulatedLLM."""
+
+    def test_generate_batch(self):
+        """Tests batch completions and that the batch waits for its longest prompt."""
+        llm = SimulatedLLM(LatencyModel(prefill_ms_per_token=10.0), max_tokens=3)
+        t_0 = time.perf_counter()
+        texts = llm.generate_batch(["a b", "c"], stop=[" b"])
+        self.assertGreaterEqual(time.perf_counter() - t_0, 0.03)
+        self.assertEqual(texts, [" a", " c c c"])
+        self.assertEqual(llm("x", max_tokens=1), " x")
+
+    def test_stream(self):
+        """Tests that streaming yields the same completion token by token."""
+        llm = SimulatedLLM(max_tokens=4)
+        chunks = list(llm.stream("a b c", stop=[" c"]))
+        self.assertEqual(chunks, [" a", " b"])
+        self.assertEqual("".join(chunks), llm("a b c", stop=[" c"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
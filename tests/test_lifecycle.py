@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+
+from serving.lifecycle import Drainer, EngineState
+
+
+class TestEngineState(unittest.TestCase):
+    """Unit tests for EngineState."""
+
+    def test_draining_is_live_but_not_ready(self):
+        """Tests that a draining engine fails readiness but not liveness."""
+        state = EngineState()
+        state.set(EngineState.READY)
+        self.assertTrue(state.ready)
+        state.set(EngineState.DRAINING)
+        self.assertFalse(state.ready)
+        self.assertTrue(state.alive)
+
+
+class TestDrainer(unittest.TestCase):
+    """Unit tests for Drainer."""
+
+    def setUp(self):
+        """Creates a drainer over a settable amount of work."""
+        self.busy = 2
+        self.drained = []
+        self.drainer = Drainer(
+            grace_seconds=1.0,
+            busy_fn=lambda: self.busy,
+            on_drained=self.drained.append,
+            poll_interval=0.01,
+        )
+
+    def test_waits_for_in_flight_work(self):
+        """Tests that draining ends as soon as the work is done."""
+
+        async def main():
+            task = self.drainer.start()
+            await asyncio.sleep(0.03)
+            self.assertFalse(task.done())
+            self.busy = 0
+            return await task
+
+        self.assertTrue(asyncio.run(main()))
+        self.assertEqual(self.drained, [True])
+
+    def test_grace_period(self):
+        """Tests that draining gives up once the grace period is over."""
+        self.drainer.grace_seconds = 0.05
+
+        async def main():
+            return await self.drainer.start()
+
+        self.assertFalse(asyncio.run(main()))
+        self.assertEqual(self.drained, [False])
+
+    def test_start_is_idempotent(self):
+        """Tests that starting twice joins the drain already under way."""
+
+        async def main():
+            first = self.drainer.start()
+            self.busy = 0
+            self.assertIs(self.drainer.start(), first)
+            await first
+
+        self.assertFalse(self.drainer.draining)
+        asyncio.run(main())
+        self.assertTrue(self.drainer.draining)
+        self.assertEqual(self.drained, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import re
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+from unittest.mock import MagicMock, patch
+
+from langchain.llms.base import LLM
+from langchain.schema import AgentAction
+
+from tools.prompts import CustomPromptTemplate
+
+# tools.custom_tools does not import with every pydantic/langchain pairing; the
+# agent registers none of its tools, so a stand-in module is enough
+with patch.dict(sys.modules, {"tools.custom_tools": MagicMock()}):
+    from llm_agent.llm_agent import LLMAgent, ThoughtRecorder
+
+
+class QuestionLLM(LLM):
+    """Fake LLM that acts on the user question, then emits unparsable text."""
+
+    @property
+    def _llm_type(self) -> str:
+        """Returns the LLM type."""
+        return "question"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> str:
+        """Answers with an action on the first step and garbage after it."""
+        question = re.search(r"User question: .*`(.*?)`", prompt).group(1)
+        if "Observation:" in prompt.split("User question:")[-1]:
+            return "no idea"
+        return f"Thought: look up {question}\nAction: lookup\nAction Input: {question}"
+
+
+def step(log: str) -> tuple:
+    """Returns an (action, observation) pair whose action has the given log."""
+    return AgentAction(tool="lookup", tool_input="", log=log), "ok"
+
+
+class TestCustomPromptTemplate(unittest.TestCase):
+    """Unit tests for CustomPromptTemplate."""
+
+    def setUp(self):
+        """Builds a template with a scratchpad and no tools."""
+        self.template = CustomPromptTemplate(
+            template="{input}|{agent_scratchpad}",
+            tools=[],
+            input_variables=["input", "intermediate_steps"],
+        )
+
+    def test_format_leaves_template_unchanged(self):
+        """Tests that formatting one run leaves nothing behind for the next."""
+        fields = dict(self.template.__dict__)
+        first = self.template.format(input="a", intermediate_steps=[step("run a")])
+        second = self.template.format(input="b", intermediate_steps=[])
+
+        self.assertIn("run a", first)
+        self.assertEqual(second, "b|")
+        self.assertEqual(self.template.__dict__, fields)
+
+    def test_concurrent_formats_isolated(self):
+        """Tests that concurrent runs only see their own steps."""
+
+        def format_run(i: int) -> str:
+            steps = [step(f"run {i} step {j}") for j in range(3)]
+            return self.template.format(input=str(i), intermediate_steps=steps)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            prompts = list(pool.map(format_run, range(32)))
+
+        for i, prompt in enumerate(prompts):
+            self.assertEqual(re.findall(r"run (\d+)", prompt), [str(i)] * 3)
+
+
+class TestLLMAgent(unittest.TestCase):
+    """Unit tests for LLMAgent run isolation."""
+
+    def test_thought_recorders_separate(self):
+        """Tests that each recorder only keeps its own run's thoughts."""
+        first, second = ThoughtRecorder(), ThoughtRecorder()
+        first.on_agent_action(step("thought a")[0])
+        second.on_agent_action(step("thought b")[0])
+        first.on_tool_end("result a")
+
+        self.assertEqual(first.thoughts, ["thought a\nObservation: result a"])
+        self.assertEqual(second.thoughts, ["thought b"])
+
+    def test_concurrent_runs_keep_own_thoughts(self):
+        """Tests that one agent serves concurrent runs without mixing them up."""
+        agent = LLMAgent(QuestionLLM())
+        executor = agent.agent_executor
+        questions = [f"question{i}" for i in range(8)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(agent.run, questions))
+
+        self.assertIs(agent.agent_executor, executor)
+        for question, response in zip(questions, responses):
+            self.assertEqual(response[-1], "I don't know.")
+            thoughts = " ".join(response[:-1])
+            self.assertIn(f"look up {question}", thoughts)
+            self.assertEqual(set(re.findall(r"question\d+", thoughts)), {question})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from langchain.llms import VLLM
+from semantic_router import Route, RouteLayer
+from semantic_router.schema import Message, RouteChoice
+
+from llm_agent.llm_router import (
+    IVFRouteMatcher,
+    LLMRouter,
+    MatrixRouteLayer,
+    RouteMatcher,
+    build_route_layer,
+)
+from serving.batcher import MicroBatcher
+from serving.embedding_cache import EmbeddingCache
+from serving.semantic_cache import SemanticCache
+
+
+class TestLLMRouter(unittest.TestCase):
+    """Unit tests for LLMRouter with a mocked encoder and route layer."""
+
+    def setUp(self):
+        """Builds a router whose encoder and route layer are mocks."""
+        self.generate_fn = MagicMock(return_value="general answer")
+        self.router = LLMRouter(
+            llm=MagicMock(spec=VLLM),
+            generate_fn=self.generate_fn,
+            semantic_cache=SemanticCache(max_entries=4, threshold=0.9),
+        )
+        self.router.encoder = MagicMock(return_value=[[1.0, 0.0]])
+        self.router.route_layer = MagicMock(return_value=RouteChoice())
+
+    def test_general_route_uses_generate_fn(self):
+        """Tests that unrouted prompts are answered by generate_fn."""
+        result = self.router.run_with_route("hello")
+        self.assertEqual(result.response, "general answer")
+        self.assertIsNone(result.route)
+        self.assertIsNone(result.similarity)
+
+    def test_semantic_cache_hit(self):
+        """Tests that a near-duplicate prompt is served from the semantic cache."""
+        self.router.run_with_route("what is the capital of france?")
+        self.router.encoder.return_value = [[0.99, 0.05]]
+        result = self.router.run_with_route("france's capital city?")
+
+        self.assertEqual(result.response, "general answer")
+        self.assertGreater(result.similarity, 0.9)
+        self.generate_fn.assert_called_once()
+
+    def test_generate_kwargs_skip_semantic_cache(self):
+        """Tests that per-request parameters reach generate_fn, uncached."""
+        self.router.run_with_route("hello")
+        result = self.router.run_with_route("hello", max_tokens=5)
+
+        self.assertIsNone(result.similarity)
+        self.generate_fn.assert_called_with("hello", max_tokens=5)
+        self.assertEqual(len(self.router.semantic_cache), 1)
+
+    def test_embedding_cache_shared(self):
+        """Tests that a repeated prompt is embedded once for routing and cache."""
+        self.router.embedding_cache = EmbeddingCache()
+        self.router.run_with_route("what is the capital of france?")
+        self.router.run_with_route("what is the capital of  france?")
+
+        self.router.encoder.assert_called_once()
+        self.assertEqual(self.router.embedding_cache.hits, 1)
+        self.assertEqual(self.router.semantic_cache.hits, 1)
+
+    def test_concurrent_encodes_batched(self):
+        """Tests that concurrent prompts are embedded in shared encoder calls."""
+        encoder = MagicMock(
+            side_effect=lambda docs: time.sleep(0.02) or [[len(d), 1.0] for d in docs]
+        )
+        self.router.encoder_batcher = MicroBatcher(encoder, 16, max_wait_ms=20)
+        prompts = ["x" * i for i in range(1, 9)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            vectors = list(pool.map(self.router.encode, prompts))
+        self.router.close()
+
+        self.assertEqual([v[0] for v in vectors], list(range(1, 9)))
+        self.assertLess(encoder.call_count, 4)
+        self.router.encoder.assert_not_called()
+
+    def test_argument_extraction_uses_generate_fn(self):
+        """Tests that tool argument extraction goes through generate_fn."""
+        self.generate_fn.return_value = '{"location": "Rome"}'
+        schema = {"name": "get_time", "signature": "(location: str) -> str"}
+
+        inputs = self.router.vllm.extract_function_inputs("time in rome?", schema)
+        self.assertEqual(inputs, {"location": "Rome"})
+        self.generate_fn.assert_called_once()
+        self.router.llm._generate.assert_not_called()
+
+    def test_default_generate_fn_serializes_llm(self):
+        """Tests that without a generate_fn the LLM is called one at a time."""
+        active, overlaps = [], []
+
+        def llm(prompt, **kwargs):
+            active.append(prompt)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.remove(prompt)
+            return prompt
+
+        router = LLMRouter(llm=MagicMock(spec=VLLM, side_effect=llm))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(router.generate_fn, ["a", "b", "c", "d"]))
+            list(pool.map(router.vllm, [[Message(role="user", content="e")]] * 4))
+        self.assertEqual(max(overlaps), 1)
+
+    def test_tool_route(self):
+        """Tests that matched tool routes call the tool, bypassing the cache."""
+        tool = MagicMock()
+        tool.name = "get_time"
+        tool.function.return_value = "12:00"
+        self.router.tools = [tool]
+        self.router.route_layer.return_value = RouteChoice(
+            name="get_time", function_call={"location": "Rome"}
+        )
+
+        result = self.router.run_with_route("time in rome?")
+        self.assertEqual(result, ("12:00", "get_time", None))
+        tool.function.assert_called_once_with(location="Rome")
+        self.assertEqual(len(self.router.semantic_cache), 0)
+
+
+class TestRouteMatcher(unittest.TestCase):
+    """Unit tests for matrix-based route matching."""
+
+    def test_top_routes(self):
+        """Tests that routes are ranked by summed similarity of near utterances."""
+        embeddings = np.array([[1, 0], [0.8, 0.6], [0, 1], [0.6, 0.8]])
+        matcher = RouteMatcher(
+            embeddings, np.array(["a", "a", "b", "b"]), num_neighbours=2
+        )
+
+        matches = matcher.top_routes([1, 0.1], k=2)
+        self.assertEqual([m.name for m in matches], ["a"])
+        self.assertAlmostEqual(matches[0].similarity, 0.995, places=3)
+
+        matcher.num_neighbours = 4
+        matches = matcher.top_routes([0.1, 1], k=2)
+        self.assertEqual([m.name for m in matches], ["b", "a"])
+        self.assertGreater(matches[0].score, matches[1].score)
+
+    def test_unit_rows_used_in_place(self):
+        """Tests that already-normalized float32 rows are not copied."""
+        embeddings = np.eye(3, dtype=np.float32)
+        matcher = RouteMatcher(embeddings, np.array(["a", "b", "c"]))
+        self.assertTrue(np.shares_memory(matcher.matrix, embeddings))
+
+    def test_same_choice_as_route_layer(self):
+        """Tests that MatrixRouteLayer routes exactly like RouteLayer."""
+        rng = np.random.default_rng(0)
+        encoder = MagicMock(score_threshold=0.2)
+        embeddings = rng.normal(size=(40, 8))
+        encoder.return_value = embeddings.tolist()
+
+        def make_routes():
+            return [Route(name=f"r{i}", utterances=[f"u{i}"] * 10) for i in range(4)]
+
+        plain = RouteLayer(encoder=encoder, routes=make_routes())
+        matrix = MatrixRouteLayer(encoder=encoder, routes=make_routes())
+        for query in rng.normal(size=(50, 8)):
+            self.assertEqual(matrix(vector=query).name, plain(vector=query).name)
+            top = matrix.top_routes(query, k=1)
+            self.assertEqual(
+                top[0].name, plain._semantic_classify(plain._retrieve(query))[0]
+            )
+
+
+class TestIVFRouteMatcher(unittest.TestCase):
+    """Unit tests for approximate route matching over partitions."""
+
+    def setUp(self):
+        """Builds a catalog of 50 routes whose utterances cluster together."""
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(50, 1, 16))
+        self.embeddings = (centers + 0.3 * rng.normal(size=(50, 8, 16))).reshape(-1, 16)
+        self.categories = np.repeat([f"r{i}" for i in range(50)], 8)
+        self.queries = self.embeddings[::7] + 0.3 * rng.normal(size=(58, 16))
+
+    def test_all_probes_is_exact(self):
+        """Tests that probing every partition gives exact search's results."""
+        exact = RouteMatcher(self.embeddings, self.categories)
+        ivf = IVFRouteMatcher(self.embeddings, self.categories, num_lists=10)
+        ivf.num_probes = 10
+        for query in self.queries:
+            approximate, expected = ivf.top_routes(query, 3), exact.top_routes(query, 3)
+            self.assertEqual([m.name for m in approximate], [m.name for m in expected])
+            for match, exact_match in zip(approximate, expected):
+                self.assertAlmostEqual(match.score, exact_match.score, places=5)
+
+    def test_few_probes_keep_recall(self):
+        """Tests that a few probes still find the exact top route."""
+        exact = RouteMatcher(self.embeddings, self.categories)
+        ivf = IVFRouteMatcher(self.embeddings, self.categories, num_probes=2)
+        hits = [
+            ivf.top_routes(q)[0].name == exact.top_routes(q)[0].name
+            for q in self.queries
+        ]
+        self.assertGreaterEqual(np.mean(hits), 0.9)
+
+    def test_incremental_add(self):
+        """Tests that added utterances are found without retraining."""
+        ivf = IVFRouteMatcher(self.embeddings, self.categories, num_probes=1)
+        centroids = ivf.centroids.copy()
+        ivf.add(-self.embeddings[:8], np.array(["new"] * 8))
+
+        self.assertEqual(ivf.top_routes(-self.embeddings[0])[0].name, "new")
+        np.testing.assert_array_equal(ivf.centroids, centroids)
+        self.assertEqual(sum(len(rows) for rows in ivf.lists), len(ivf))
+
+    def test_route_layer_add_copies_matcher(self):
+        """Tests that adding a route swaps in an updated copy of the matcher."""
+        encoder = MagicMock(score_threshold=0.2)
+        encoder.return_value = self.embeddings[:8].tolist()
+        factory = MagicMock(side_effect=IVFRouteMatcher)
+        route_layer = MatrixRouteLayer(
+            encoder=encoder,
+            routes=[Route(name="a", utterances=["u"] * 8)],
+            matcher=factory,
+        )
+        matcher = route_layer.matcher
+        lists = list(matcher.lists)
+
+        encoder.return_value = (-self.embeddings[:8]).tolist()
+        route_layer.add(Route(name="b", utterances=["v"] * 8))
+        self.assertEqual(route_layer(vector=-self.embeddings[0]).name, "b")
+        factory.assert_called_once()
+        self.assertEqual(len(route_layer.matcher), 16)
+
+        self.assertEqual(len(matcher), 8)  # Readers of the old matcher unaffected
+        for rows, old_rows in zip(matcher.lists, lists):
+            self.assertIs(rows, old_rows)
+
+    def test_concurrent_first_queries_build_once(self):
+        """Tests that concurrent first queries share one matcher build."""
+        factory = MagicMock(
+            side_effect=lambda *args: time.sleep(0.05) or IVFRouteMatcher(*args)
+        )
+        route_layer = MatrixRouteLayer(
+            encoder=MagicMock(score_threshold=0.2), matcher=factory
+        )
+        route_layer.index, route_layer.categories = self.embeddings, self.categories
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            matches = list(pool.map(route_layer.top_routes, self.queries[:8]))
+
+        factory.assert_called_once()
+        self.assertTrue(all(matches))
+
+    @patch("llm_agent.llm_router.HuggingFaceEncoder")
+    def test_build_route_layer_builds_matcher(self, mock_encoder_cls):
+        """Tests that the matcher is built with the layer, before any query."""
+        mock_encoder_cls.return_value = MagicMock(
+            score_threshold=0.2, side_effect=lambda docs: [[1.0, 0.0] for _ in docs]
+        )
+        tool = MagicMock(route=Route(name="a", utterances=["u", "v"]))
+        built = []
+
+        def factory(*args):
+            built.append(RouteMatcher(*args))
+            return built[-1]
+
+        route_layer = build_route_layer([tool], matcher=factory)
+        self.assertEqual(len(built), 1)
+        self.assertIs(route_layer.matcher, built[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
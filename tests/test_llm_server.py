@@ -1,15 +1,30 @@
 """Note: Run LLM server tests with MemoryLLM."""
 
+import asyncio
+import json
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock, patch
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 from langchain.llms import VLLM
+from langchain.schema import Generation, LLMResult
+
+import llm_server
 
 # from config import DEFAULT_MODEL, NUM_GPUS
-from config import Settings
+from config import LLM, Settings
 from llm_agent.llm_memory import MemoryLLM
-from llm_server import app, create_llm
+from llm_agent.llm_router import LLMRouter, RouteResult
+from llm_server import app, create_llm, response_cache
+from serving.admission import AdmissionController
+from serving.backends import AsyncEngineBackend
+from serving.embedding_cache import EmbeddingCache
+from serving.fake_engine import SimulatedLLM
+from serving.lifecycle import Drainer, EngineState
 
 settings = Settings()
 
@@ -59,7 +74,7 @@ class TestConfig(unittest.TestCase):
 
         llm = create_llm(quantization=None, use_agent=True)
 
-        self.assertIsInstance(llm, MemoryLLM)
+        self.assertIsInstance(llm, LLMRouter)
         self.mock_vllm.assert_called_once()
 
 
@@ -82,6 +97,951 @@ class TestFastAPIEndpoints(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.json(), {"text": "mocked response"})
 
+    def test_generate_endpoint_batches_vllm(self):
+        """Tests that /generate sends VLLM prompts through the micro-batcher."""
+        mock_llm = MagicMock(spec=VLLM)
+        mock_llm._generate.return_value = LLMResult(
+            generations=[[Generation(text="batched response")]]
+        )
+        with patch("llm_server.llm", new=mock_llm):
+            response = self.client.post("/generate", json={"text": "test query"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {"text": "batched response"})
+            mock_llm._generate.assert_called_once_with(prompts=["test query"])
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for response caching in the /generate endpoint."""
+
+    def setUp(self):
+        """Sets up test client and a deterministic, empty cache."""
+        self.client = TestClient(app)
+        response_cache.clear()
+        self.temperature_patcher = patch("llm_server.settings.TEMPERATURE", 0.0)
+        self.temperature_patcher.start()
+
+    def tearDown(self):
+        """Restores settings and empties the cache."""
+        self.temperature_patcher.stop()
+        response_cache.clear()
+
+    def test_cache_miss_then_hit(self):
+        """Tests that a repeated prompt is served from the cache."""
+        mock_llm = MagicMock(return_value="cached response")
+        with patch("llm_server.llm", new=mock_llm):
+            first = self.client.post("/generate", json={"text": "test query"})
+            second = self.client.post("/generate", json={"text": "test  query "})
+
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(second.json(), {"text": "cached response"})
+        mock_llm.assert_called_once()
+
+        stats = self.client.get("/cache/stats").json()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_cache_bypassed_when_nondeterministic(self):
+        """Tests that the cache is skipped when TEMPERATURE > 0."""
+        mock_llm = MagicMock(return_value="fresh response")
+        with patch("llm_server.settings.TEMPERATURE", 0.7), patch(
+            "llm_server.llm", new=mock_llm
+        ):
+            self.client.post("/generate", json={"text": "test query"})
+            response = self.client.post("/generate", json={"text": "test query"})
+
+        self.assertEqual(response.headers["X-Cache"], "BYPASS")
+        self.assertEqual(mock_llm.call_count, 2)
+
+    def test_cache_nondeterministic_opt_in(self):
+        """Tests that CACHE_NONDETERMINISTIC caches sampled responses."""
+        mock_llm = MagicMock(return_value="sampled response")
+        with patch("llm_server.settings.TEMPERATURE", 0.7), patch(
+            "llm_server.settings.CACHE_NONDETERMINISTIC", True
+        ), patch("llm_server.llm", new=mock_llm):
+            self.client.post("/generate", json={"text": "test query"})
+            response = self.client.post("/generate", json={"text": "test query"})
+
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        mock_llm.assert_called_once()
+
+    def test_router_tool_responses_not_cached(self):
+        """Tests that responses from LLMRouter tool routes are never cached."""
+        mock_router = MagicMock(spec=LLMRouter)
+        mock_router.run_with_route.return_value = RouteResult("12:00", "get_time")
+        with patch("llm_server.llm", new=mock_router):
+            self.client.post("/generate", json={"text": "time in rome?"})
+            response = self.client.post("/generate", json={"text": "time in rome?"})
+
+        self.assertEqual(response.headers["X-Cache"], "MISS")
+        self.assertEqual(mock_router.run_with_route.call_count, 2)
+
+    def test_semantic_cache_headers(self):
+        """Tests that semantic cache hits report their similarity."""
+        mock_router = MagicMock(spec=LLMRouter)
+        mock_router.run_with_route.return_value = RouteResult("Paris", similarity=0.97)
+        with patch("llm_server.llm", new=mock_router):
+            response = self.client.post("/generate", json={"text": "capital?"})
+
+        self.assertEqual(response.headers["X-Cache"], "SEMANTIC")
+        self.assertEqual(response.headers["X-Cache-Similarity"], "0.9700")
+
+
+class TestStreamEndpoint(unittest.TestCase):
+    """Test cases for the /generate/stream endpoint."""
+
+    def setUp(self):
+        """Sets up test client before each test."""
+        self.client = TestClient(app)
+
+    def test_stream_endpoint(self):
+        """Tests that /generate/stream emits text chunks and an end event."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post("/generate/stream", json={"text": "test"})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(
+                response.headers["content-type"].startswith("text/event-stream")
+            )
+
+            events = response.text.strip().split("\n\n")
+            self.assertEqual(events[0], 'data: {"text": "mocked response"}')
+            self.assertTrue(events[-1].startswith("event: end"))
+            self.assertIn("time_to_first_token", events[-1])
+
+    def test_stream_endpoint_chunks(self):
+        """Tests that streaming LLMs have each chunk sent as its own event."""
+        mock_llm = MagicMock()
+        mock_llm.stream.return_value = iter(["Hello", " world"])
+        with patch("llm_server.llm", new=mock_llm):
+            response = self.client.post("/generate/stream", json={"text": "test"})
+            self.assertIn('data: {"text": "Hello"}', response.text)
+            self.assertIn('data: {"text": " world"}', response.text)
+
+    def test_stream_endpoint_error_event(self):
+        """Tests that LLM failures are reported as an error event."""
+        mock_llm = MagicMock(side_effect=Exception("LLM Exception"))
+        del mock_llm.stream  # Non-streaming LLM
+        with patch("llm_server.llm", new=mock_llm):
+            response = self.client.post("/generate/stream", json={"text": "test"})
+            self.assertIn("event: error", response.text)
+            self.assertIn("LLM Exception", response.text)
+
+    def test_stream_endpoint_timeout(self):
+        """Tests that a stream past its timeout is stopped and counted."""
+        timeouts = llm_server.CANCELLED.value(
+            endpoint="generate_stream", reason="timeout"
+        )
+        produced = []
+
+        def slow_stream(query, **params):
+            for i in range(20):
+                time.sleep(0.02)
+                produced.append(i)
+                yield f" {i}"
+
+        mock_llm = MagicMock()
+        mock_llm.stream.side_effect = slow_stream
+        with patch("llm_server.llm", new=mock_llm):
+            response = self.client.post(
+                "/generate/stream", json={"text": "test", "timeout": 0.1}
+            )
+
+        self.assertIn("event: error", response.text)
+        self.assertIn("timed out after 0.1s", response.text)
+        self.assertNotIn("event: end", response.text)
+        self.assertLess(len(produced), 20)
+        self.assertEqual(llm_server.executor.in_flight, 0)
+        self.assertEqual(
+            llm_server.CANCELLED.value(endpoint="generate_stream", reason="timeout"),
+            timeouts + 1,
+        )
+
+    def test_stream_endpoint_bad_request(self):
+        """Tests that malformed requests are rejected before streaming."""
+        response = self.client.post("/generate/stream", json={"wrong": "field"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_endpoint_rejects_session(self):
+        """Tests that streaming refuses a session_id instead of ignoring it."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate/stream", json={"text": "test query", "session_id": "s1"}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("session_id", response.json()["detail"])
+
+
+class TestBatchEndpoint(unittest.TestCase):
+    """Test cases for the /generate/batch endpoint."""
+
+    def setUp(self):
+        """Sets up test client before each test."""
+        self.client = TestClient(app)
+
+    def test_batch_endpoint(self):
+        """Tests that /generate/batch returns one NDJSON line per prompt."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate/batch", json={"texts": ["a", "b", "c"]}
+            )
+            self.assertEqual(response.status_code, 200)
+
+            results = [json.loads(line) for line in response.text.splitlines()]
+            self.assertEqual(sorted(r["index"] for r in results), [0, 1, 2])
+            self.assertTrue(all(r["text"] == "mocked response" for r in results))
+
+    def test_batch_endpoint_batches_vllm(self):
+        """Tests that VLLM prompts in one request share a batched call."""
+        mock_llm = MagicMock(spec=VLLM)
+        mock_llm._generate.side_effect = lambda prompts: LLMResult(
+            generations=[[Generation(text=f"out:{p}")] for p in prompts]
+        )
+        with patch("llm_server.llm", new=mock_llm):
+            response = self.client.post("/generate/batch", json={"texts": ["a", "b"]})
+
+            results = [json.loads(line) for line in response.text.splitlines()]
+            texts = {r["index"]: r["text"] for r in results}
+            self.assertEqual(texts, {0: "out:a", 1: "out:b"})
+            mock_llm._generate.assert_called_once()
+
+    def test_batch_endpoint_timeout(self):
+        """Tests that prompts running past the timeout report it on their line."""
+        timeouts = llm_server.CANCELLED.value(
+            endpoint="generate_batch", reason="timeout"
+        )
+        slow_llm = MagicMock(side_effect=lambda query: time.sleep(0.2) or "late")
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=slow_llm
+        ):
+            response = self.client.post(
+                "/generate/batch", json={"texts": ["a", "b"], "timeout": 0.05}
+            )
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all("timed out" in r["detail"] for r in results))
+        self.assertEqual(
+            llm_server.CANCELLED.value(endpoint="generate_batch", reason="timeout"),
+            timeouts + 2,
+        )
+
+    def test_batch_endpoint_per_prompt_error(self):
+        """Tests that a failing prompt reports an error on its own line."""
+        with patch(
+            "llm_server.llm", new=MagicMock(side_effect=Exception("LLM Exception"))
+        ):
+            response = self.client.post("/generate/batch", json={"texts": ["a"]})
+            result = json.loads(response.text)
+            self.assertEqual(result["index"], 0)
+            self.assertIn("LLM Exception", result["detail"])
+
+    def test_batch_endpoint_too_many_prompts(self):
+        """Tests that requests over MAX_BATCH_PROMPTS are rejected."""
+        texts = ["a"] * (settings.MAX_BATCH_PROMPTS + 1)
+        response = self.client.post("/generate/batch", json={"texts": texts})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Test cases for the /metrics endpoint."""
+
+    def setUp(self):
+        """Sets up test client before each test."""
+        self.client = TestClient(app)
+
+    def test_metrics_endpoint(self):
+        """Tests that /metrics exposes request, queue and cache metrics."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            self.client.post("/generate", json={"text": "test query"})
+            response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        body = response.text
+        self.assertIn('llm_requests_total{endpoint="generate",outcome="success"}', body)
+        self.assertIn("llm_request_duration_seconds_bucket", body)
+        self.assertIn("llm_requests_in_flight 0.0", body)
+        self.assertIn("llm_requests_queued 0.0", body)
+        self.assertIn('llm_cache_hit_ratio{cache="exact"}', body)
+        self.assertIn('llm_generated_tokens_total{endpoint="generate"}', body)
+
+    def test_encoder_batches_observed(self):
+        """Tests that the router's encoder batches are measured."""
+        route_layer = MagicMock()
+        route_layer.encoder.side_effect = lambda docs: [[1.0]] * len(docs)
+        with patch("llm_server.settings.ENCODER_BATCH_SIZE", 4):
+            router = llm_server.create_router(MagicMock(spec=VLLM), route_layer)
+        count = llm_server.ENCODER_BATCH_SIZE.count()
+        router.encoder_batcher.map(["a", "b"])
+        router.close()
+
+        self.assertEqual(llm_server.ENCODER_BATCH_SIZE.count(), count + 1)
+
+    def test_embedding_cache_reported(self):
+        """Tests that the router's embedding cache shows in metrics and stats."""
+        router = MagicMock(spec=LLMRouter)
+        router.semantic_cache = None
+        router.embedding_cache = EmbeddingCache()
+        router.embedding_cache.encode(["a", "a"], lambda docs: [[1.0]] * len(docs))
+        with patch("llm_server.llm", new=router):
+            body = self.client.get("/metrics").text
+            stats = self.client.get("/cache/stats").json()
+
+        self.assertIn('llm_cache_lookups_total{cache="embedding",result="hit"}', body)
+        self.assertIn('llm_cache_hit_ratio{cache="embedding"} 0.5', body)
+        self.assertEqual(stats["embedding"]["entries"], 1)
+
+
+class TestSamplingParams(unittest.TestCase):
+    """Test cases for per-request sampling parameters."""
+
+    def setUp(self):
+        """Sets up test client and a VLLM mock that records its calls."""
+        self.client = TestClient(app)
+        self.mock_llm = MagicMock(spec=VLLM)
+        self.mock_llm._generate.side_effect = lambda prompts, **params: LLMResult(
+            generations=[[Generation(text=f"out {i}")] for i in range(len(prompts))]
+        )
+        response_cache.clear()
+
+    def tearDown(self):
+        """Empties the response cache."""
+        response_cache.clear()
+
+    def test_params_passed_to_engine(self):
+        """Tests that sampling fields reach the engine call for that request."""
+        payload = {"text": "label?", "max_tokens": 5, "top_p": 0.9, "stop": ["\n"]}
+        with patch("llm_server.llm", new=self.mock_llm):
+            response = self.client.post("/generate", json=payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.mock_llm._generate.assert_called_once_with(
+            prompts=["label?"], max_tokens=5, top_p=0.9, stop=["\n"]
+        )
+
+    def test_params_part_of_cache_key(self):
+        """Tests that cached responses are not shared across sampling params."""
+        with patch("llm_server.settings.TEMPERATURE", 0.0), patch(
+            "llm_server.llm", new=self.mock_llm
+        ):
+            self.client.post("/generate", json={"text": "q"})
+            response = self.client.post(
+                "/generate", json={"text": "q", "max_tokens": 5}
+            )
+
+        self.assertEqual(response.headers["X-Cache"], "MISS")
+        self.assertEqual(self.mock_llm._generate.call_count, 2)
+
+    def test_n_completions(self):
+        """Tests that n > 1 returns that many completions from one batch."""
+        with patch("llm_server.llm", new=self.mock_llm):
+            response = self.client.post("/generate", json={"text": "q", "n": 3})
+
+        body = response.json()
+        self.assertEqual(body["texts"], ["out 0", "out 1", "out 2"])
+        self.assertEqual(body["text"], "out 0")
+        self.mock_llm._generate.assert_called_once_with(prompts=["q", "q", "q"])
+
+    def test_server_caps(self):
+        """Tests that requests beyond the server caps are rejected."""
+        with patch("llm_server.llm", new=self.mock_llm):
+            for payload in [
+                {"text": "q", "max_tokens": settings.MAX_TOKENS_LIMIT + 1},
+                {"text": "q", "n": settings.MAX_N + 1},
+                {"text": "q", "stop": ["x"] * (settings.MAX_STOP_SEQUENCES + 1)},
+                {"text": "q", "temperature": -1},
+            ]:
+                response = self.client.post("/generate", json=payload)
+                self.assertEqual(response.status_code, 400, payload)
+        self.mock_llm._generate.assert_not_called()
+
+
+class TestModelRegistryEndpoints(unittest.TestCase):
+    """Test cases for requests naming a model and the /models listing."""
+
+    def setUp(self):
+        """Sets up test client and a registry that loads mock models."""
+        self.client = TestClient(app)
+        self.registry = llm_server.ModelRegistry(
+            load_fn=self.load,
+            cost_fn=lambda model: 0.5,
+            budget=1.0,
+        )
+        self.registry_patcher = patch("llm_server.model_registry", new=self.registry)
+        self.registry_patcher.start()
+
+    def tearDown(self):
+        """Restores the server's model registry."""
+        self.registry_patcher.stop()
+
+    async def load(self, model):
+        """Loads a mock LLM that answers with its model name."""
+        return MagicMock(return_value=f"from {model}")
+
+    def test_generate_with_named_model(self):
+        """Tests that a named model is loaded on demand and serves the request."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate", json={"text": "hi", "model": LLM.PHI_2}
+            )
+            listing = self.client.get("/models").json()
+
+        self.assertEqual(response.json(), {"text": f"from {LLM.PHI_2}"})
+        self.assertEqual(listing["default"], settings.DEFAULT_MODEL)
+        self.assertIn(LLM.PHI_2, listing["available"])
+        self.assertEqual(
+            [m["name"] for m in listing["loaded"]], [settings.DEFAULT_MODEL, LLM.PHI_2]
+        )
+
+    def test_models_evicted_least_recently_used(self):
+        """Tests that loading past the budget evicts the least recent model."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            for model in [LLM.PHI_2, LLM.OPT_125M, LLM.PHI_2, LLM.ZEPHYR_7B]:
+                self.client.post("/generate", json={"text": "hi", "model": model})
+
+        self.assertIn(LLM.PHI_2, self.registry)
+        self.assertNotIn(LLM.OPT_125M, self.registry)
+
+    def test_unknown_model(self):
+        """Tests that models outside config.LLM are rejected."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate", json={"text": "hi", "model": "someone/else"}
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_with_named_model_rejected(self):
+        """Tests that /generate/batch refuses a model it would not serve."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate/batch", json={"texts": ["hi"], "model": LLM.PHI_2}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("default model", response.json()["detail"])
+
+    @patch("llm_server.create_backend")
+    def test_load_model_untimed_and_unscheduled(self, mock_create_backend):
+        """Tests that registry loads hold no slot and record no startup timing."""
+        slots = []
+        mock_create_backend.side_effect = lambda model: slots.append(
+            llm_server.executor.in_flight
+        )
+        with patch("llm_server.engine_state", new=EngineState()) as state:
+            asyncio.run(llm_server.load_model(LLM.PHI_2))
+
+        mock_create_backend.assert_called_once_with(LLM.PHI_2)
+        self.assertEqual(slots, [0])
+        self.assertEqual(state.to_dict()["timings"], {})
+
+    def test_model_gpu_utilization(self):
+        """Tests that model budgets follow the *_GPU_UTIL settings."""
+        self.assertEqual(llm_server.model_quantization(LLM.MISTRAL_AWQ), "awq")
+        self.assertEqual(
+            llm_server.gpu_utilization(llm_server.model_quantization(LLM.PHI_2_GPTQ)),
+            settings.GPTQ_GPU_UTIL,
+        )
+        self.assertEqual(
+            llm_server.gpu_utilization(llm_server.model_quantization(LLM.PHI_2)),
+            settings.DEFAULT_GPU_UTIL,
+        )
+
+
+class TestCoalescing(unittest.TestCase):
+    """Test cases for sharing one generation among identical requests."""
+
+    def setUp(self):
+        """Sets up a test client and a slow LLM that counts its calls."""
+        self.client = TestClient(app)
+        self.slow_llm = MagicMock(side_effect=lambda query: time.sleep(0.05) or "ok")
+
+    def generate_duplicates(self, temperature: float = 0.0) -> List[str]:
+        """Sends a batch of identical prompts with the response cache disabled."""
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.settings.TEMPERATURE", temperature
+        ), patch("llm_server.llm", new=self.slow_llm):
+            response = self.client.post(
+                "/generate/batch", json={"texts": ["same prompt"] * 3}
+            )
+        return [json.loads(line)["text"] for line in response.text.splitlines()]
+
+    def test_identical_requests_coalesced(self):
+        """Tests that identical in-flight prompts trigger a single generation."""
+        followers = llm_server.single_flight.followers
+        self.assertEqual(self.generate_duplicates(), ["ok"] * 3)
+        self.assertEqual(self.slow_llm.call_count, 1)
+        self.assertEqual(llm_server.single_flight.followers, followers + 2)
+        metrics = self.client.get("/metrics").text
+        self.assertIn('llm_coalesced_requests_total{role="follower"}', metrics)
+
+    def test_sampled_requests_not_coalesced_by_default(self):
+        """Tests that temperature > 0 prompts each get their own sample."""
+        self.assertEqual(self.generate_duplicates(temperature=0.7), ["ok"] * 3)
+        self.assertEqual(self.slow_llm.call_count, 3)
+
+    def test_sampled_requests_coalesced_when_opted_in(self):
+        """Tests that COALESCE_NONDETERMINISTIC also coalesces sampled prompts."""
+        with patch("llm_server.settings.COALESCE_NONDETERMINISTIC", True):
+            self.assertEqual(self.generate_duplicates(temperature=0.7), ["ok"] * 3)
+        self.assertEqual(self.slow_llm.call_count, 1)
+
+    def test_coalescing_disabled(self):
+        """Tests that every prompt is generated when coalescing is off."""
+        with patch("llm_server.settings.COALESCE_ENABLED", False):
+            self.assertEqual(self.generate_duplicates(), ["ok"] * 3)
+        self.assertEqual(self.slow_llm.call_count, 3)
+
+
+class TestCancellation(unittest.TestCase):
+    """Test cases for request timeouts and client disconnects."""
+
+    def setUp(self):
+        """Sets up test client before each test."""
+        self.client = TestClient(app)
+
+    def cancelled(self, endpoint: str, reason: str) -> float:
+        """Returns the current cancellation count for an endpoint and reason."""
+        return llm_server.CANCELLED.value(endpoint=endpoint, reason=reason)
+
+    def test_generate_timeout(self):
+        """Tests that /generate gives up with 504 once its timeout expires."""
+        before = self.cancelled("generate", "timeout")
+        slow_llm = MagicMock(side_effect=lambda query: time.sleep(0.5) or "late")
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=slow_llm
+        ):
+            response = self.client.post(
+                "/generate", json={"text": "test query", "timeout": 0.05}
+            )
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(self.cancelled("generate", "timeout"), before + 1)
+
+    def test_generate_invalid_timeout(self):
+        """Tests that a non-positive timeout is a bad request."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate", json={"text": "test query", "timeout": 0}
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_disconnect_cancels_generation(self):
+        """Tests that a client disconnect cancels the pending generation."""
+        request = MagicMock()
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        request.receive = receive
+
+        async def main():
+            generation = asyncio.ensure_future(asyncio.sleep(10))
+            with self.assertRaises(llm_server.ClientDisconnected):
+                await llm_server.run_cancellable(request, generation)
+            await asyncio.sleep(0)
+            self.assertTrue(generation.cancelled())
+
+        asyncio.run(main())
+
+
+class TestScheduling(unittest.TestCase):
+    """Test cases for request priorities on the generation endpoints."""
+
+    def setUp(self):
+        """Sets up a test client."""
+        self.client = TestClient(app)
+
+    def test_queue_time_recorded_per_priority(self):
+        """Tests that queue time is reported under the request's priority."""
+        count = llm_server.QUEUE_TIME.count(priority="batch")
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=VLLMMock()
+        ):
+            response = self.client.post(
+                "/generate", json={"text": "test query", "priority": "batch"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(llm_server.QUEUE_TIME.count(priority="batch"), count + 1)
+
+    def test_unknown_priority_rejected(self):
+        """Tests that a priority outside PRIORITY_CLASSES is a bad request."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post(
+                "/generate", json={"text": "test query", "priority": "urgent"}
+            )
+            batch = self.client.post(
+                "/generate/batch", json={"texts": ["a"], "priority": "urgent"}
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown priority", response.json()["detail"])
+        self.assertEqual(batch.status_code, 400)
+
+    def test_expected_cost_uses_route_output_lengths(self):
+        """Tests that a job's cost uses the observed output length, capped."""
+        estimator = llm_server.OutputLengthEstimator()
+        estimator.record(Settings().DEFAULT_MODEL, 20)
+        with patch("llm_server.output_lengths", new=estimator), patch(
+            "llm_server.tp.estimate_tokens", return_value=10
+        ):
+            job = llm_server.make_job(None, "prompt", {"max_tokens": 5})
+            self.assertEqual(job.cost, 10 + 5)
+            job = llm_server.make_job(None, "prompt", {}, timeout=30)
+            self.assertEqual(job.cost, 10 + 20)
+            self.assertLess(job.deadline, float("inf"))
+
+
+class TestDrain(unittest.TestCase):
+    """Test cases for draining the server before shutdown."""
+
+    def setUp(self):
+        """Sets up a test client with a fresh drainer and a ready engine."""
+        self.client = TestClient(app)
+        self.drainer = Drainer(
+            grace_seconds=2.0,
+            busy_fn=lambda: llm_server.admission.depth,
+            poll_interval=0.01,
+        )
+        self.state = EngineState()
+        self.state.set(EngineState.READY)
+        self.patchers = [
+            patch("llm_server.drainer", new=self.drainer),
+            patch("llm_server.engine_state", new=self.state),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Restores the server's drainer and engine state."""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_drain_stops_new_requests(self):
+        """Tests that draining fails readiness and turns requests away."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post("/admin/drain")
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["status"], EngineState.DRAINING)
+
+            self.assertEqual(self.client.get("/health/ready").status_code, 503)
+            self.assertEqual(self.client.get("/health/live").status_code, 200)
+            generate = self.client.post("/generate", json={"text": "test query"})
+            self.assertEqual(generate.status_code, 503)
+            self.assertEqual(generate.headers["Retry-After"], "1")
+
+    def test_in_flight_request_finishes(self):
+        """Tests that a request admitted before the drain still completes."""
+        slow_llm = MagicMock(side_effect=lambda query: time.sleep(0.2) or "done")
+        drained = []
+        self.drainer.on_drained = drained.append
+        # The lifespan keeps one event loop running, so the drain outlives requests
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=slow_llm
+        ), patch("llm_server.load_engine", new=AsyncMock()), TestClient(
+            app
+        ) as client, ThreadPoolExecutor(
+            max_workers=1
+        ) as pool:
+            pending = pool.submit(client.post, "/generate", json={"text": "test query"})
+            for _ in range(100):
+                if llm_server.admission.depth:
+                    break
+                time.sleep(0.005)
+            client.post("/admin/drain")
+            response = pending.result()
+            for _ in range(100):
+                if drained:
+                    break
+                time.sleep(0.01)
+
+        self.assertEqual(response.json(), {"text": "done"})
+        self.assertEqual(drained, [True])
+
+    def test_in_flight_counts_each_request_once(self):
+        """Tests that /admin/drain reports each running request once."""
+        release = threading.Event()
+        slow_llm = MagicMock(side_effect=lambda query: release.wait(5) and "done")
+        self.drainer.busy_fn = llm_server.busy_count
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=slow_llm
+        ), patch("llm_server.load_engine", new=AsyncMock()), TestClient(
+            app
+        ) as client, ThreadPoolExecutor(
+            max_workers=3
+        ) as pool:
+            pending = [
+                pool.submit(client.post, "/generate", json={"text": f"query {i}"})
+                for i in range(3)
+            ]
+            for _ in range(200):
+                if slow_llm.call_count == 3:
+                    break
+                time.sleep(0.005)
+            drain = client.post("/admin/drain")
+            release.set()
+            responses = [future.result() for future in pending]
+
+        self.assertEqual(drain.json()["in_flight"], 3)
+        self.assertEqual([r.json() for r in responses], [{"text": "done"}] * 3)
+
+    def test_admin_token(self):
+        """Tests that /admin/drain requires ADMIN_TOKEN when it is set."""
+        with patch("llm_server.settings.ADMIN_TOKEN", "secret"):
+            denied = self.client.post(
+                "/admin/drain", headers={"X-Admin-Token": "wrong"}
+            )
+            self.assertEqual(denied.status_code, 403)
+            self.assertFalse(self.drainer.draining)
+
+            allowed = self.client.post(
+                "/admin/drain", headers={"X-Admin-Token": "secret"}
+            )
+            self.assertEqual(allowed.status_code, 202)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Test cases for load shedding on the generation endpoints."""
+
+    def setUp(self):
+        """Sets up a test client and a full admission controller."""
+        self.client = TestClient(app)
+        self.admission = AdmissionController(
+            max_queue_depth=2, max_queued_tokens=4096, concurrency=2
+        )
+        self.admission.avg_latency = 2.5
+        self.ticket = self.admission.admit(1, requests=2)
+        self.admission_patcher = patch("llm_server.admission", new=self.admission)
+        self.admission_patcher.start()
+
+    def tearDown(self):
+        """Releases the held ticket and restores the server's controller."""
+        self.admission_patcher.stop()
+        self.ticket.release()
+
+    def test_generate_rejected_when_full(self):
+        """Tests that /generate sheds load with 429 and Retry-After."""
+        rejected = llm_server.REQUESTS.value(endpoint="generate", outcome="rejected")
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=VLLMMock()
+        ):
+            response = self.client.post("/generate", json={"text": "test query"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "3")
+        self.assertEqual(
+            llm_server.REQUESTS.value(endpoint="generate", outcome="rejected"),
+            rejected + 1,
+        )
+
+    def test_generate_admitted_when_capacity_frees(self):
+        """Tests that /generate succeeds and releases its ticket once admitted."""
+        self.ticket.release()
+        with patch("llm_server.llm", new=VLLMMock()):
+            response = self.client.post("/generate", json={"text": "test query"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.admission.depth, 0)
+
+    def test_cache_hits_served_when_full(self):
+        """Tests that exact cache hits bypass admission control."""
+        response_cache.clear()
+        with patch("llm_server.settings.TEMPERATURE", 0.0), patch(
+            "llm_server.llm", new=VLLMMock()
+        ):
+            key = llm_server.get_cache_key("cached query")
+            response_cache.put(key, "cached response")
+            response = self.client.post("/generate", json={"text": "cached query"})
+        response_cache.clear()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+
+    def test_stream_and_batch_rejected_when_full(self):
+        """Tests that the streaming endpoints shed load before streaming."""
+        with patch("llm_server.llm", new=VLLMMock()):
+            stream = self.client.post("/generate/stream", json={"text": "test"})
+            batch = self.client.post("/generate/batch", json={"texts": ["a", "b"]})
+
+        self.assertEqual(stream.status_code, 429)
+        self.assertEqual(batch.status_code, 429)
+        self.assertIn("Retry-After", batch.headers)
+
+    def test_batch_over_limits_refused(self):
+        """Tests that a batch too large to ever be admitted gets 400, not 429."""
+        self.ticket.release()
+        with patch("llm_server.llm", new=VLLMMock()):
+            deep = self.client.post("/generate/batch", json={"texts": ["a"] * 3})
+            costly = self.client.post(
+                "/generate/batch", json={"texts": ["a", "b"], "max_tokens": 2048}
+            )
+
+        self.assertEqual(deep.status_code, 400)
+        self.assertIn("3 requests exceed the limit of 2", deep.json()["detail"])
+        self.assertEqual(costly.status_code, 400)
+        self.assertNotIn("Retry-After", costly.headers)
+        self.assertEqual(self.admission.depth, 0)
+
+    def test_stream_releases_ticket(self):
+        """Tests that a finished stream returns its admission capacity."""
+        self.ticket.release()
+        with patch("llm_server.llm", new=VLLMMock()):
+            self.client.post("/generate/stream", json={"text": "test"})
+            self.client.post("/generate/batch", json={"texts": ["a", "b"]})
+
+        self.assertEqual((self.admission.depth, self.admission.tokens), (0, 0))
+
+
+class TestLifespan(unittest.TestCase):
+    """Test cases for lifespan-managed engine loading and health probes."""
+
+    def setUp(self):
+        """Resets the engine state before each test."""
+        self.state_patcher = patch("llm_server.engine_state", new=EngineState())
+        self.state_patcher.start()
+        self.llm_patcher = patch("llm_server.llm", new=None)
+        self.llm_patcher.start()
+
+    def tearDown(self):
+        """Restores the engine state after each test."""
+        self.llm_patcher.stop()
+        self.state_patcher.stop()
+
+    def wait_for_status(self, client, *statuses):
+        """Polls the readiness probe until the engine reaches a status."""
+        for _ in range(100):
+            body = client.get("/health/ready").json()
+            if body["status"] in statuses:
+                return body
+            time.sleep(0.01)
+        self.fail(f"Engine never reached {statuses}")
+
+    def test_not_ready_before_load(self):
+        """Tests that requests get 503 until the engine is loaded."""
+        client = TestClient(app)  # Lifespan not started, nothing loaded
+        self.assertEqual(client.get("/health/live").status_code, 200)
+        self.assertEqual(client.get("/health/ready").status_code, 503)
+
+        response = client.post("/generate", json={"text": "test query"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("not ready", response.json()["detail"])
+
+    @patch("llm_server.build_route_layer")
+    @patch("llm_server.create_llm")
+    def test_lifespan_loads_engine(self, mock_create_llm, mock_build_route_layer):
+        """Tests that model and router are loaded at startup, then ready."""
+        mock_create_llm.return_value = MagicMock(spec=VLLM)
+        with patch("llm_server.settings.USE_AGENT", True), TestClient(app) as client:
+            body = self.wait_for_status(client, EngineState.READY)
+
+            self.assertIn("load_model", body["timings"])
+            self.assertIn("load_router", body["timings"])
+            self.assertIsInstance(llm_server.llm, LLMRouter)
+            self.assertIs(
+                llm_server.llm.route_layer, mock_build_route_layer.return_value
+            )
+
+    @patch("llm_server.build_route_layer")
+    @patch("llm_server.create_llm")
+    def test_warm_up_before_ready(self, mock_create_llm, mock_build_route_layer):
+        """Tests that every stage is warmed up before readiness is reported."""
+        mock_create_llm.return_value = MagicMock(spec=VLLM)
+        statuses = []
+
+        def route(prompt):
+            statuses.append(llm_server.engine_state.status)
+            return MagicMock(function_call=None)
+
+        with patch("llm_server.settings.USE_AGENT", True), patch(
+            "llm_server.settings.WARMUP_ON_STARTUP", True
+        ), patch("llm_server.settings.WARMUP_PROMPTS", ["a", "b"]), patch(
+            "llm_server.LLMRouter.route", side_effect=route
+        ), patch(
+            "llm_server.run_llm", return_value="warm"
+        ) as mock_run_llm, TestClient(
+            app
+        ) as client:
+            body = self.wait_for_status(client, EngineState.READY)
+
+        self.assertEqual(statuses, [EngineState.WARMING_UP] * 2)
+        self.assertEqual(
+            [c.args[1:] for c in mock_run_llm.call_args_list], [("a",), ("b",)]
+        )
+        self.assertIs(mock_run_llm.call_args.args[0], mock_create_llm.return_value)
+        for stage in ["warm_up", "warm_up:routing", "warm_up:generation"]:
+            self.assertIn(stage, body["timings"])
+
+    @patch("llm_server.create_llm")
+    def test_failed_warm_up_still_ready(self, mock_create_llm):
+        """Tests that a failing warm-up stage does not keep the engine unready."""
+        with patch("llm_server.settings.USE_AGENT", False), patch(
+            "llm_server.settings.WARMUP_ON_STARTUP", True
+        ), patch("llm_server.run_llm", side_effect=RuntimeError("cold")), TestClient(
+            app
+        ) as client:
+            body = self.wait_for_status(client, EngineState.READY)
+
+        self.assertIn("warm_up:generation", body["timings"])
+        self.assertIs(llm_server.llm, mock_create_llm.return_value)
+
+    @patch("llm_server.create_llm", side_effect=RuntimeError("no GPU"))
+    def test_lifespan_load_failure(self, mock_create_llm):
+        """Tests that a failed load is reported by both health probes."""
+        with patch("llm_server.settings.USE_AGENT", False), TestClient(app) as client:
+            body = self.wait_for_status(client, EngineState.FAILED)
+
+            self.assertEqual(body["error"], "no GPU")
+            self.assertEqual(client.get("/health/live").status_code, 503)
+            self.assertEqual(client.get("/health/ready").status_code, 503)
+
+    def test_fake_backend(self):
+        """Tests serving end to end with the fake async engine backend."""
+        with patch("llm_server.settings.BACKEND", "fake"), patch(
+            "llm_server.settings.USE_AGENT", False
+        ), patch("llm_server.settings.CACHE_ENABLED", False), TestClient(app) as client:
+            self.wait_for_status(client, EngineState.READY)
+            self.assertIsInstance(llm_server.llm, AsyncEngineBackend)
+
+            response = client.post("/generate", json={"text": "hi", "max_tokens": 2})
+            self.assertEqual(response.json(), {"text": " hi hi"})
+
+            stream = client.post(
+                "/generate/stream", json={"text": "yo", "max_tokens": 2}
+            )
+            self.assertEqual(stream.text.count('data: {"text": " yo"}'), 2)
+
+    def test_simulated_backend(self):
+        """Tests that the simulated backend is served through the micro-batcher."""
+        with patch("llm_server.settings.BACKEND", "simulated"), patch(
+            "llm_server.settings.USE_AGENT", False
+        ), patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.settings.SIM_DECODE_MS_PER_TOKEN", 1.0
+        ), TestClient(
+            app
+        ) as client:
+            self.wait_for_status(client, EngineState.READY)
+            self.assertIsInstance(llm_server.llm, SimulatedLLM)
+            batches = llm_server.llm.num_batches
+
+            response = client.post(
+                "/generate/batch", json={"texts": ["a", "b"], "max_tokens": 2}
+            )
+            results = [json.loads(line) for line in response.text.splitlines()]
+            texts = {r["index"]: r["text"] for r in results}
+            self.assertEqual(texts, {0: " a a", 1: " b b"})
+            self.assertEqual(llm_server.llm.num_batches, batches + 1)
+
+            stream = client.post(
+                "/generate/stream", json={"text": "yo", "max_tokens": 2}
+            )
+            self.assertEqual(stream.text.count('data: {"text": " yo"}'), 2)
+
+    def test_agent_requires_langchain_backend(self):
+        """Tests that the router cannot be combined with an async backend."""
+        with patch("llm_server.settings.BACKEND", "fake"), patch(
+            "llm_server.settings.USE_AGENT", True
+        ), TestClient(app) as client:
+            body = self.wait_for_status(client, EngineState.FAILED)
+            self.assertIn("BACKEND=langchain", body["error"])
+
 
 class TestConfigCreateLLM(unittest.TestCase):
     """Test cases for the create_llm method in Config class."""
@@ -144,5 +1104,63 @@ class TestGenerateEndpoint(unittest.TestCase):
         self.assertIn("JSON Exception", response.json()["detail"])
 
 
+class TestSessions(unittest.TestCase):
+    """Test cases for conversations continued with a session id."""
+
+    def setUp(self):
+        """Sets up a test client, an empty session store and a recording LLM."""
+        self.client = TestClient(app)
+        self.store = llm_server.SessionStore()
+        self.prompts = []
+        self.llm = MagicMock(
+            side_effect=lambda query: self.prompts.append(query) or "Nice to meet you"
+        )
+
+    def generate(self, text: str, **kwargs):
+        """Sends a /generate request in session s1."""
+        with patch("llm_server.settings.CACHE_ENABLED", False), patch(
+            "llm_server.llm", new=self.llm
+        ), patch("llm_server.memory_llm", new=MemoryLLM(None, store=self.store)):
+            return self.client.post(
+                "/generate", json={"text": text, "session_id": "s1", **kwargs}
+            )
+
+    def test_history_sent_with_next_turn(self):
+        """Tests that a session's earlier turns are part of its next prompt."""
+        self.assertEqual(self.generate("I am Ada").json(), {"text": "Nice to meet you"})
+        self.generate("Who am I?")
+
+        self.assertNotIn("AI:", self.prompts[0])
+        self.assertIn("Human: I am Ada\nAI: Nice to meet you", self.prompts[1])
+        self.assertEqual(len(self.store.history("s1")), 2)
+
+        response = self.client.delete("/sessions/s1")
+        self.assertEqual(response.status_code, 200)
+
+    def test_history_kept_off_event_loop(self):
+        """Tests that history lookups and appends run on the worker pool."""
+        threads = []
+
+        def on_thread(fn):
+            def wrapper(*args):
+                threads.append(threading.current_thread().name)
+                return fn(*args)
+
+            return wrapper
+
+        self.store.history = on_thread(self.store.history)
+        self.store.count_tokens = on_thread(len)
+
+        self.generate("I am Ada")
+        self.assertEqual(len(threads), 3)  # One lookup, two token counts
+        self.assertTrue(all(name.startswith("llm-worker") for name in threads))
+
+    def test_n_rejected_with_session(self):
+        """Tests that several completions cannot continue one session."""
+        response = self.generate("hello", n=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.store.history("s1"), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,95 @@
+import time
+import unittest
+
+from serving.metrics import ROUTER_STAGE_SECONDS, MetricsRegistry, time_stage
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Unit tests for the Prometheus-style metrics registry."""
+
+    def setUp(self):
+        """Creates an empty registry before each test."""
+        self.registry = MetricsRegistry()
+
+    def test_counter_exposition(self):
+        """Tests that counters render HELP, TYPE and labelled samples."""
+        counter = self.registry.counter("requests_total", "Requests.", ["outcome"])
+        counter.inc(outcome="success")
+        counter.inc(2, outcome="success")
+
+        output = self.registry.expose()
+        self.assertIn("# HELP requests_total Requests.", output)
+        self.assertIn("# TYPE requests_total counter", output)
+        self.assertIn('requests_total{outcome="success"} 3.0', output)
+        self.assertEqual(counter.value(outcome="success"), 3.0)
+
+    def test_counter_rejects_decrease_and_bad_labels(self):
+        """Tests that counters only increase and validate label names."""
+        counter = self.registry.counter("requests_total", "Requests.", ["outcome"])
+        with self.assertRaises(ValueError):
+            counter.inc(-1, outcome="success")
+        with self.assertRaises(ValueError):
+            counter.inc(endpoint="generate")
+
+    def test_gauge_function(self):
+        """Tests that gauges can be read from a callback at scrape time."""
+        gauge = self.registry.gauge("queued", "Queued requests.")
+        gauge.set_function(lambda: 7)
+        self.assertIn("queued 7.0", self.registry.expose())
+
+    def test_histogram_buckets(self):
+        """Tests that histogram buckets are cumulative with sum and count."""
+        histogram = self.registry.histogram("latency", "Latency.", buckets=(1, 5))
+        for value in (0.5, 2, 10):
+            histogram.observe(value)
+
+        output = self.registry.expose()
+        self.assertIn('latency_bucket{le="1.0"} 1', output)
+        self.assertIn('latency_bucket{le="5.0"} 2', output)
+        self.assertIn('latency_bucket{le="+Inf"} 3', output)
+        self.assertIn("latency_sum 12.5", output)
+        self.assertIn("latency_count 3", output)
+
+    def test_label_escaping(self):
+        """Tests that label values are escaped."""
+        counter = self.registry.counter("c", "C.", ["name"])
+        counter.inc(name='a"b\nc')
+        self.assertIn('c{name="a\\"b\\nc"} 1.0', self.registry.expose())
+
+    def test_duplicate_names_rejected(self):
+        """Tests that a metric name can only be registered once."""
+        self.registry.counter("c", "C.")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("c", "C.")
+
+
+class TestTimeStage(unittest.TestCase):
+    """Unit tests for router stage timing."""
+
+    def test_nested_stage_excluded_from_parent(self):
+        """Tests that nested stage time is only attributed to the inner stage."""
+        outer_count = ROUTER_STAGE_SECONDS.count(stage="test_outer")
+        with time_stage("test_outer"):
+            with time_stage("test_inner"):
+                time.sleep(0.05)
+
+        self.assertEqual(
+            ROUTER_STAGE_SECONDS.count(stage="test_outer"), outer_count + 1
+        )
+        samples = "\n".join(ROUTER_STAGE_SECONDS.samples())
+        outer_sum = float(
+            samples.split('llm_router_stage_seconds_sum{stage="test_outer"} ')[
+                1
+            ].split()[0]
+        )
+        inner_sum = float(
+            samples.split('llm_router_stage_seconds_sum{stage="test_inner"} ')[
+                1
+            ].split()[0]
+        )
+        self.assertLess(outer_sum, 0.02)
+        self.assertGreaterEqual(inner_sum, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
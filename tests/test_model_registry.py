@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from serving.model_registry import ModelBudgetExceeded, ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Unit tests for ModelRegistry."""
+
+    def setUp(self):
+        """Creates a registry with fake models costing 0.4 of the GPU each."""
+        self.loaded = []
+        self.unloaded = []
+        self.registry = ModelRegistry(
+            load_fn=self.load,
+            cost_fn=lambda name: 0.4,
+            budget=1.0,
+            unload_fn=lambda name, model: self.unloaded.append(name),
+            reserved=0.2,
+        )
+
+    async def load(self, name):
+        """Fake model loader that records each load."""
+        await asyncio.sleep(0.01)
+        self.loaded.append(name)
+        return f"model:{name}"
+
+    def test_lazy_load_once(self):
+        """Tests that a model is loaded on first use and then reused."""
+
+        async def main():
+            async with self.registry.use("a") as first:
+                pass
+            async with self.registry.use("a") as second:
+                pass
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), ("model:a", "model:a"))
+        self.assertEqual(self.loaded, ["a"])
+        self.assertAlmostEqual(self.registry.used, 0.6)
+
+    def test_concurrent_requests_share_load(self):
+        """Tests that concurrent requests for a loading model share one load."""
+
+        async def main():
+            return await asyncio.gather(*(self.registry.acquire("a") for _ in range(3)))
+
+        self.assertEqual(asyncio.run(main()), ["model:a"] * 3)
+        self.assertEqual(self.loaded, ["a"])
+        self.assertEqual(self.registry.models()[0]["in_use"], 3)
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used model is evicted for a new one."""
+
+        async def main():
+            for name in ["a", "b", "a", "c"]:
+                async with self.registry.use(name):
+                    pass
+
+        asyncio.run(main())
+        self.assertEqual(self.unloaded, ["b"])
+        self.assertEqual([m["name"] for m in self.registry.models()], ["a", "c"])
+        self.assertEqual(self.registry.evictions, 1)
+
+    def test_models_in_use_not_evicted(self):
+        """Tests that pinned models are kept and the new model is refused."""
+
+        async def main():
+            await self.registry.acquire("a")
+            await self.registry.acquire("b")
+            with self.assertRaises(ModelBudgetExceeded):
+                await self.registry.acquire("c")
+
+        asyncio.run(main())
+        self.assertEqual(self.unloaded, [])
+        self.assertAlmostEqual(self.registry.used, 1.0)
+
+    def test_oversized_model_evicts_nothing(self):
+        """Tests that a model that can never fit is refused before any eviction."""
+
+        async def main():
+            async with self.registry.use("a"):
+                pass
+            self.registry.cost_fn = lambda name: 0.9
+            with self.assertRaises(ModelBudgetExceeded):
+                await self.registry.acquire("big")
+
+        asyncio.run(main())
+        self.assertEqual(self.unloaded, [])
+        self.assertEqual([m["name"] for m in self.registry.models()], ["a"])
+        self.assertAlmostEqual(self.registry.used, 0.6)
+
+    def test_failed_load_frees_budget(self):
+        """Tests that a failed load releases its reserved budget."""
+
+        async def failing_load(name):
+            raise RuntimeError("no such model")
+
+        self.registry.load_fn = failing_load
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.registry.acquire("a"))
+        self.assertAlmostEqual(self.registry.used, 0.2)
+        self.assertEqual(self.registry.models(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from semantic_router import Route, RouteLayer
+
+from llm_agent.route_index import RouteIndex, content_hash, load_or_build
+
+
+class FakeEncoder:
+    """Encoder that embeds a text by its length and counts the texts encoded."""
+
+    type = "fake"
+    name = "length"
+    score_threshold = 0.5
+
+    def __init__(self):
+        """Initializes the encoder with no texts encoded."""
+        self.encoded = 0
+
+    def __call__(self, docs):
+        """Embeds each text as [1, its length]."""
+        self.encoded += len(docs)
+        return [[1.0, float(len(doc))] for doc in docs]
+
+
+class TestRouteIndex(unittest.TestCase):
+    """Unit tests for the persisted route embedding index."""
+
+    def setUp(self):
+        """Creates a temporary index path and two routes."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "route_index.bin")
+        self.encoder = FakeEncoder()
+        self.routes = [
+            Route(name="short", utterances=["a", "bb"]),
+            Route(name="long", utterances=["x" * 40]),
+        ]
+
+    def tearDown(self):
+        """Removes the temporary index."""
+        self.tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped(self):
+        """Tests that a saved index loads back as a read-only memory map."""
+        RouteIndex.build(self.encoder, self.routes).save(self.path)
+        index = RouteIndex.load(self.path)
+
+        self.assertIsInstance(index.embeddings, np.memmap)
+        self.assertEqual(index.embeddings.dtype, np.float32)
+        np.testing.assert_array_equal(index.embeddings[:, 1], [1, 2, 40])
+        self.assertEqual(index.categories.tolist(), ["short", "short", "long"])
+        self.assertEqual(index.hash, content_hash(self.encoder, self.routes))
+
+    def test_rebuilt_only_when_hash_changes(self):
+        """Tests that utterances are re-encoded only after they change."""
+        load_or_build(self.path, self.encoder, self.routes)
+        load_or_build(self.path, self.encoder, self.routes)
+        self.assertEqual(self.encoder.encoded, 3)
+
+        self.routes[0].utterances.append("ccc")
+        index = load_or_build(self.path, self.encoder, self.routes)
+        self.assertEqual(self.encoder.encoded, 7)
+        self.assertEqual(len(index), 4)
+
+    def test_unreadable_file_rebuilt(self):
+        """Tests that a file that is not an index is replaced."""
+        with open(self.path, "wb") as f:
+            f.write(b"not an index")
+        index = load_or_build(self.path, self.encoder, self.routes)
+        self.assertEqual(len(index), 3)
+
+    def test_attach_subset(self):
+        """Tests that a RouteLayer routes over the chosen routes' rows only."""
+        index = load_or_build(self.path, self.encoder, self.routes)
+        route_layer = RouteLayer(encoder=self.encoder)
+        index.attach(route_layer, self.routes[:1])
+
+        self.assertEqual(route_layer.categories.tolist(), ["short", "short"])
+        self.assertEqual(route_layer(vector=[1.0, 1.5]).name, "short")
+        self.assertEqual(self.encoder.encoded, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
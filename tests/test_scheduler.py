@@ -0,0 +1,143 @@
+import asyncio
+import unittest
+
+from serving.scheduler import (
+    Job,
+    OutputLengthEstimator,
+    Scheduler,
+    current_job,
+    scheduled_as,
+)
+
+
+class TestScheduler(unittest.TestCase):
+    """Unit tests for Scheduler policies."""
+
+    def order(self, policy, jobs):
+        """Returns the order in which jobs queued behind a busy slot are served."""
+        scheduler = Scheduler(1, policy)
+        served = []
+
+        async def worker(name, job):
+            async with scheduler.slot(job):
+                served.append(name)
+
+        async def main():
+            await scheduler.acquire()
+            tasks = [asyncio.ensure_future(worker(n, j)) for n, j in jobs]
+            await asyncio.sleep(0.01)
+            scheduler.release()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(main())
+        return served
+
+    def test_fifo(self):
+        """Tests that FIFO serves jobs in arrival order."""
+        jobs = [("long", Job(cost=500)), ("short", Job(cost=10))]
+        self.assertEqual(self.order("fifo", jobs), ["long", "short"])
+
+    def test_shortest_job_first(self):
+        """Tests that SJF serves the cheapest job first, ties in arrival order."""
+        jobs = [("long", Job(cost=500)), ("short", Job(cost=10)), ("b", Job(cost=10))]
+        self.assertEqual(self.order("sjf", jobs), ["short", "b", "long"])
+
+    def test_earliest_deadline_first(self):
+        """Tests that EDF serves the nearest deadline first, no deadline last."""
+        jobs = [("none", Job()), ("late", Job(deadline=20)), ("soon", Job(deadline=5))]
+        self.assertEqual(self.order("edf", jobs), ["soon", "late", "none"])
+
+    def test_priority_classes(self):
+        """Tests that higher priority classes go first and unknown ones last."""
+        jobs = [
+            ("batch", Job(priority="batch")),
+            ("other", Job(priority="other")),
+            ("interactive", Job(priority="interactive")),
+        ]
+        self.assertEqual(
+            self.order("priority", jobs), ["interactive", "batch", "other"]
+        )
+
+    def test_unknown_policy(self):
+        """Tests that an unknown policy is rejected."""
+        with self.assertRaises(ValueError):
+            Scheduler(1, "random")
+
+    def test_capacity_and_queue_time(self):
+        """Tests the slot limit and the queue times reported per class."""
+        waits = []
+        scheduler = Scheduler(2, on_wait=lambda p, s: waits.append((p, s)))
+        peak = 0
+
+        async def worker():
+            nonlocal peak
+            async with scheduler.slot(Job(priority="batch")):
+                peak = max(peak, scheduler.in_use)
+                await asyncio.sleep(0.02)
+
+        async def main():
+            await asyncio.gather(*(worker() for _ in range(4)))
+
+        asyncio.run(main())
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.in_use, 0)
+        self.assertEqual([p for p, _ in waits], ["batch"] * 4)
+        self.assertGreaterEqual(max(s for _, s in waits), 0.02)
+
+    def test_cancelled_waiter_is_skipped(self):
+        """Tests that a cancelled waiter never takes a slot."""
+        scheduler = Scheduler(1)
+        served = []
+
+        async def worker(name):
+            async with scheduler.slot():
+                served.append(name)
+
+        async def main():
+            await scheduler.acquire()
+            cancelled = asyncio.ensure_future(worker("cancelled"))
+            queued = asyncio.ensure_future(worker("queued"))
+            await asyncio.sleep(0.01)
+            self.assertEqual(scheduler.waiting, 2)
+            cancelled.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(scheduler.waiting, 1)
+            scheduler.release()
+            await queued
+
+        asyncio.run(main())
+        self.assertEqual(served, ["queued"])
+        self.assertEqual(scheduler.in_use, 0)
+
+    def test_current_job(self):
+        """Tests that slots default to the job set with scheduled_as."""
+        scheduler = Scheduler(1, "priority")
+        waits = []
+        scheduler.on_wait = lambda priority, seconds: waits.append(priority)
+
+        async def main():
+            with scheduled_as(Job(priority="batch")):
+                await asyncio.ensure_future(scheduler.acquire())
+            scheduler.release()
+
+        asyncio.run(main())
+        self.assertEqual(waits, ["batch"])
+        self.assertIsNone(current_job.get())
+
+
+class TestOutputLengthEstimator(unittest.TestCase):
+    """Unit tests for OutputLengthEstimator."""
+
+    def test_moving_average_per_route(self):
+        """Tests per-route averages and the default for unseen routes."""
+        estimator = OutputLengthEstimator(alpha=0.5)
+        estimator.record("llm", 100)
+        estimator.record("llm", 50)
+        estimator.record("weather", 10)
+        self.assertEqual(estimator.estimate("llm", default=512), 75)
+        self.assertEqual(estimator.estimate("weather", default=512), 10)
+        self.assertEqual(estimator.estimate("stocks", default=512), 512)
+
+
+if __name__ == "__main__":
+    unittest.main()
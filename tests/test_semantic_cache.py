@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from serving.semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Unit tests for SemanticCache."""
+
+    def setUp(self):
+        """Creates a small cache before each test."""
+        self.cache = SemanticCache(max_entries=2, threshold=0.9)
+
+    def test_lookup_empty(self):
+        """Tests that lookups on an empty cache miss."""
+        self.assertIsNone(self.cache.lookup([1.0, 0.0]))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_similar_vector_hits(self):
+        """Tests that a nearby embedding returns the cached response."""
+        self.cache.add([1.0, 0.0], "answer")
+        response, similarity = self.cache.lookup([0.99, 0.05])
+
+        self.assertEqual(response, "answer")
+        self.assertGreater(similarity, 0.9)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_dissimilar_vector_misses(self):
+        """Tests that embeddings below the threshold miss."""
+        self.cache.add([1.0, 0.0], "answer")
+        self.assertIsNone(self.cache.lookup([0.0, 1.0]))
+
+    def test_nearest_entry_wins(self):
+        """Tests that the most similar cached entry is returned."""
+        cache = SemanticCache(max_entries=4, threshold=0.5)
+        cache.add([1.0, 0.0, 0.0], "x")
+        cache.add([0.7, 0.7, 0.0], "xy")
+        self.assertEqual(cache.lookup([0.6, 0.8, 0.0])[0], "xy")
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used entry is overwritten when full."""
+        self.cache.add([1.0, 0.0, 0.0], "a")
+        self.cache.add([0.0, 1.0, 0.0], "b")
+        self.cache.lookup([1.0, 0.0, 0.0])  # "b" is now least recently used
+        self.cache.add([0.0, 0.0, 1.0], "c")
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.lookup([0.0, 1.0, 0.0]))
+        self.assertEqual(self.cache.lookup([1.0, 0.0, 0.0])[0], "a")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_dimension_mismatch(self):
+        """Tests that embeddings of a different size are rejected."""
+        self.cache.add(np.ones(3), "a")
+        with self.assertRaises(ValueError):
+            self.cache.add(np.ones(4), "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from llm_agent.llm_memory import MemoryLLM
+from serving.session_store import SessionStore
+
+
+def count_words(text: str) -> int:
+    """Counts tokens as whitespace-separated words."""
+    return len(text.split())
+
+
+class TestSessionStore(unittest.TestCase):
+    """Unit tests for SessionStore."""
+
+    def test_history_in_order(self):
+        """Tests that turns are returned oldest first, per session."""
+        store = SessionStore(count_tokens=count_words)
+        store.append("a", "hi", "hello")
+        store.append("a", "how are you", "fine")
+        store.append("b", "other", "session")
+        self.assertEqual([t.human for t in store.history("a")], ["hi", "how are you"])
+        self.assertEqual(store.history("new"), [])
+
+    def test_token_budget_trims_oldest(self):
+        """Tests that old turns are dropped to fit the budget, keeping the newest."""
+        store = SessionStore(max_tokens=5, count_tokens=count_words)
+        store.append("a", "one", "two")
+        store.append("a", "three", "four")
+        store.append("a", "five six", "seven")
+        self.assertEqual([t.human for t in store.history("a")], ["three", "five six"])
+
+        store.append("a", "far too many words", "for the budget")
+        self.assertEqual([t.human for t in store.history("a")], ["far too many words"])
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used session is evicted."""
+        store = SessionStore(max_sessions=2, count_tokens=count_words)
+        store.append("a", "q", "r")
+        store.append("b", "q", "r")
+        store.history("a")
+        store.append("c", "q", "r")
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.history("b"), [])
+        self.assertEqual(len(store.history("a")), 1)
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_spill_and_restore(self):
+        """Tests that evicted sessions are kept in SQLite and restored on use."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sessions.db")
+            store = SessionStore(
+                max_sessions=1, spill_path=path, count_tokens=count_words
+            )
+            store.append("a", "first", "turn")
+            store.append("b", "other", "session")
+            self.assertEqual(store.stats()["spilled"], 1)
+
+            store.append("a", "second", "turn")
+            self.assertEqual([t.human for t in store.history("a")], ["first", "second"])
+            self.assertEqual(store.history("a")[0].tokens, 2)
+            self.assertEqual(store.restores, 1)
+
+            store.clear("b")
+            self.assertEqual(store.history("b"), [])
+            self.assertEqual(store.stats()["spilled"], 0)
+
+
+class TestMemoryLLM(unittest.TestCase):
+    """Unit tests for MemoryLLM."""
+
+    def test_history_carried_across_turns(self):
+        """Tests that earlier turns of a session appear in the next prompt."""
+        prompts = []
+        memory_llm = MemoryLLM(
+            llm=lambda prompt: prompts.append(prompt) or f"answer {len(prompts)}"
+        )
+        self.assertEqual(memory_llm("My name is Ada", session_id="s1"), "answer 1")
+        memory_llm("What is my name?", session_id="s1")
+        memory_llm("Who am I?", session_id="s2")
+
+        self.assertIn("Human: My name is Ada\nAI: answer 1", prompts[1])
+        self.assertTrue(prompts[1].endswith("Human: What is my name?\nAssistant:"))
+        self.assertNotIn("Ada", prompts[2])
+
+    def test_run_without_llm(self):
+        """Tests that a prompt-only MemoryLLM refuses to run and records nothing."""
+        memory_llm = MemoryLLM(llm=None)
+        self.assertIn("Human: hi", memory_llm.build_prompt("hi", "s1"))
+        with self.assertRaises(RuntimeError):
+            memory_llm("hi", session_id="s1")
+        self.assertEqual(memory_llm.store.history("s1"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
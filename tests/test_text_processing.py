@@ -25,6 +25,19 @@ class TestTextProcessing(unittest.TestCase):
             result = tp.num_tokens("")
             self.assertEqual(result, 0)
 
+    def test_estimate_tokens(self):
+        """Test estimate_tokens uses num_tokens when the encoding loads."""
+        with patch("tiktoken.get_encoding") as mock_encoding:
+            mock_encoding.return_value.encode.return_value = ["tok_1", "tok_2"]
+            self.assertEqual(tp.estimate_tokens("Test", "test_encoding"), 2)
+
+    def test_estimate_tokens_fallback(self):
+        """Test estimate_tokens falls back to a character estimate on failure."""
+        with patch("tiktoken.get_encoding", side_effect=Exception("offline")) as m:
+            self.assertEqual(tp.estimate_tokens("12345678", "missing_encoding"), 2)
+            self.assertEqual(tp.estimate_tokens("123456789", "missing_encoding"), 3)
+            m.assert_called_once()  # Failure is remembered
+
     def test_clean_text_normal(self):
         """Test clean_text with a typical string."""
         result = tp.clean_text("  Hello, World!  ")
@@ -1,5 +1,6 @@
+import logging
 import re
-from typing import List, Union
+from typing import List, Set, Union
 
 import tiktoken
 
@@ -16,6 +17,24 @@ class TextProcessing:
         encoding = tiktoken.get_encoding(encoding_name)
         return len(encoding.encode(string))
 
+    _unavailable_encodings: Set[str] = set()
+
+    @staticmethod
+    def estimate_tokens(string: str, encoding_name: str = "cl100k_base") -> int:
+        """Counts tokens like num_tokens, but never fails.
+
+        Falls back to ~4 characters per token if the encoding cannot be loaded
+        (e.g. no network access to fetch it); the failure is remembered so later
+        calls do not retry the download.
+        """
+        if encoding_name not in TextProcessing._unavailable_encodings:
+            try:
+                return TextProcessing.num_tokens(string, encoding_name)
+            except Exception as e:
+                logging.warning(f"Falling back to estimated token counts: {e}")
+                TextProcessing._unavailable_encodings.add(encoding_name)
+        return (len(string) + 3) // 4
+
     @staticmethod
     def preprocess_prompt(prompt: str) -> str:
         """Cleans prompts before being sent to LLM."""
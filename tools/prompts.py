@@ -9,15 +9,14 @@ class CustomPromptTemplate(StringPromptTemplate):
     template: str
     # The list of available tools
     tools: List[Tool]
-    agent_thoughts: list
     
     def format(self, **kwargs) -> str:
         # Get the intermediate steps (AgentAction, Observation tuples)
-        # Formats them in a particular way
+        # Formats them in a particular way. Steps belong to the calling run
+        # only, so one template can serve concurrent runs.
         intermediate_steps = kwargs.pop("intermediate_steps")
         thoughts = ""
         for action, observation in intermediate_steps:
-            self.agent_thoughts += [str(action.log) + "\nObservation: " + str(observation)]
             thoughts += action.log
             thoughts += f"\nObservation: {observation}\nThought: "
         